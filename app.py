@@ -6,11 +6,29 @@ Online Caregivers Platform
 Flask web application providing CRUD operations for all database tables.
 """
 
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify
-from sqlalchemy import create_engine, text
+from flask import (
+    Flask, Response, g, has_request_context, render_template, stream_template, request, redirect,
+    url_for, flash, jsonify, stream_with_context, session as flask_session
+)
+from sqlalchemy import create_engine, event, exc, text
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
+from werkzeug.http import is_resource_modified
+from functools import wraps
+import click
+import hashlib
+import io
 import os
-from datetime import date, datetime
+import threading
+from time import monotonic, perf_counter
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal, InvalidOperation
+
+import bulk_import
+import export
+import migrate
+import replicas
+import statements
 
 app = Flask(__name__)
 app.secret_key = os.getenv('SECRET_KEY', 'your-secret-key-change-in-production')
@@ -34,474 +52,913 @@ else:
     DB_NAME = os.getenv('DB_NAME', 'caregivers_db')
     DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
+# Schema version this code expects: the newest file in migrations/
+SCHEMA_VERSION = migrate.latest_version()
+
+# PostgreSQL SQLSTATE for "relation does not exist"
+UNDEFINED_TABLE = '42P01'
+
+# PostgreSQL SQLSTATE raised by exclusion constraints (appointment_no_overlap)
+EXCLUSION_VIOLATION = '23P01'
+
+# ============================================================================
+# CONNECTION POOL
+# ============================================================================
+
+# Pool settings per worker process. When DB_POOL_SIZE is not set but
+# DB_MAX_CONNECTIONS is, the PostgreSQL connection budget is split across the
+# WEB_CONCURRENCY gunicorn workers (pool_size + max_overflow per worker).
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '10'))
+if os.getenv('DB_POOL_SIZE'):
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE'))
+elif os.getenv('DB_MAX_CONNECTIONS'):
+    per_worker = int(os.getenv('DB_MAX_CONNECTIONS')) // max(1, int(os.getenv('WEB_CONCURRENCY', '1')))
+    DB_POOL_SIZE = max(1, per_worker - DB_MAX_OVERFLOW)
+    DB_MAX_OVERFLOW = max(0, min(DB_MAX_OVERFLOW, per_worker - DB_POOL_SIZE))
+else:
+    DB_POOL_SIZE = 5
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '30'))
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '1800'))
+
+# "always" pings on every checkout, "idle" only when the connection has sat in
+# the pool longer than DB_POOL_PING_IDLE seconds, "never" skips the ping
+DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'idle')
+DB_POOL_PING_IDLE = float(os.getenv('DB_POOL_PING_IDLE', '30'))
+
+
+class PoolMetrics:
+    """Counters describing this worker's connection pool usage"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.checkout_wait_total = 0.0
+        self.checkout_wait_max = 0.0
+        self.timeouts = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.pings = 0
+
+    def record_wait(self, seconds, timed_out=False):
+        with self._lock:
+            self.checkouts += 1
+            self.checkout_wait_total += seconds
+            self.checkout_wait_max = max(self.checkout_wait_max, seconds)
+            if timed_out:
+                self.timeouts += 1
+
+    def increment(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+
+pool_metrics = PoolMetrics()
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection"""
+
+    def _do_get(self):
+        start = perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            pool_metrics.record_wait(perf_counter() - start, timed_out=True)
+            raise
+        pool_metrics.record_wait(perf_counter() - start)
+        return connection
+
+
+def instrument_pool(engine):
+    """Attach the pool event listeners used for metrics and idle pre-ping"""
+
+    @event.listens_for(engine, 'connect')
+    def on_connect(dbapi_connection, connection_record):
+        pool_metrics.increment('connects')
+
+    @event.listens_for(engine, 'invalidate')
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        pool_metrics.increment('invalidations')
+
+    @event.listens_for(engine, 'checkin')
+    def on_checkin(dbapi_connection, connection_record):
+        connection_record.info['checked_in_at'] = monotonic()
+
+    if DB_POOL_PRE_PING == 'idle':
+        @event.listens_for(engine, 'checkout')
+        def ping_idle_connection(dbapi_connection, connection_record, connection_proxy):
+            checked_in_at = connection_record.info.get('checked_in_at')
+            if checked_in_at is None or monotonic() - checked_in_at < DB_POOL_PING_IDLE:
+                return
+            pool_metrics.increment('pings')
+            cursor = dbapi_connection.cursor()
+            try:
+                cursor.execute('SELECT 1')
+            except Exception:
+                # The pool discards this connection and retries with a new one
+                raise exc.DisconnectionError()
+            finally:
+                cursor.close()
+
+
+def pool_status():
+    """Current pool occupancy plus the cumulative counters for this worker"""
+    pool = engine.pool
+    checkouts = pool_metrics.checkouts
+    return {
+        'pid': os.getpid(),
+        'pool_size': pool.size(),
+        'max_overflow': DB_MAX_OVERFLOW,
+        'checked_out': pool.checkedout(),
+        'checked_in': pool.checkedin(),
+        'overflow': pool.overflow(),
+        'checkouts': checkouts,
+        'checkout_wait_avg_ms': round(pool_metrics.checkout_wait_total / checkouts * 1000, 3) if checkouts else 0.0,
+        'checkout_wait_max_ms': round(pool_metrics.checkout_wait_max * 1000, 3),
+        'checkout_timeouts': pool_metrics.timeouts,
+        'connects': pool_metrics.connects,
+        'invalidations': pool_metrics.invalidations,
+        'idle_pings': pool_metrics.pings,
+        'pre_ping': DB_POOL_PRE_PING,
+        'recycle': DB_POOL_RECYCLE,
+        'timeout': DB_POOL_TIMEOUT,
+        'replicas': replica_set.status(),
+    }
+
+
 # Create engine with connection pooling for Heroku
 try:
-    engine = create_engine(DATABASE_URL, echo=False, pool_pre_ping=True)
+    engine = create_engine(
+        DATABASE_URL,
+        echo=False,
+        poolclass=TimedQueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING == 'always',
+    )
+    instrument_pool(engine)
     Session = sessionmaker(bind=engine)
-    
-    # Auto-initialize database if tables don't exist
-    def init_db():
-        """Initialize database tables if they don't exist"""
-        print("=== INIT_DB CALLED ===")
-        try:
-            # Check if user table exists first
-            with engine.connect() as check_conn:
-                try:
-                    result = check_conn.execute(text("""
-                        SELECT EXISTS (
-                            SELECT FROM information_schema.tables 
-                            WHERE table_schema = 'public' 
-                            AND table_name = 'user'
-                        );
-                    """))
-                    table_exists = result.fetchone()[0]
-                    print(f"Table 'user' exists: {table_exists}")
-                except Exception as e:
-                    # If we can't check, assume tables don't exist
-                    print(f"Could not check if tables exist: {e}")
-                    table_exists = False
-            
-            if not table_exists:
-                print("Creating tables...")
-                # Use autocommit mode for DDL statements
-                with engine.connect() as conn:
-                    # DDL statements need to be committed immediately
-                    conn = conn.execution_options(autocommit=True)
-                    print("Database tables not found. Creating tables...")
-                    
-                    # Create tables - SQL embedded in code
-                    create_tables_sql = """
-                    -- Create USER table
-                    CREATE TABLE IF NOT EXISTS "user" (
-                        user_id SERIAL PRIMARY KEY,
-                        email VARCHAR(255) UNIQUE NOT NULL,
-                        given_name VARCHAR(100) NOT NULL,
-                        surname VARCHAR(100) NOT NULL,
-                        city VARCHAR(100) NOT NULL,
-                        phone_number VARCHAR(20) NOT NULL,
-                        profile_description TEXT,
-                        password VARCHAR(255) NOT NULL
-                    );
-                    
-                    -- Create CAREGIVER table
-                    CREATE TABLE IF NOT EXISTS caregiver (
-                        caregiver_user_id INTEGER PRIMARY KEY,
-                        photo VARCHAR(500),
-                        gender VARCHAR(20) NOT NULL,
-                        caregiving_type VARCHAR(50) NOT NULL CHECK (caregiving_type IN ('babysitter', 'elderly care', 'playmate')),
-                        hourly_rate DECIMAL(10, 2) NOT NULL CHECK (hourly_rate > 0),
-                        FOREIGN KEY (caregiver_user_id) REFERENCES "user"(user_id) ON DELETE CASCADE
-                    );
-                    
-                    -- Create MEMBER table
-                    CREATE TABLE IF NOT EXISTS member (
-                        member_user_id INTEGER PRIMARY KEY,
-                        house_rules TEXT,
-                        dependent_description TEXT,
-                        FOREIGN KEY (member_user_id) REFERENCES "user"(user_id) ON DELETE CASCADE
-                    );
-                    
-                    -- Create ADDRESS table
-                    CREATE TABLE IF NOT EXISTS address (
-                        member_user_id INTEGER PRIMARY KEY,
-                        house_number VARCHAR(20) NOT NULL,
-                        street VARCHAR(200) NOT NULL,
-                        town VARCHAR(100) NOT NULL,
-                        FOREIGN KEY (member_user_id) REFERENCES member(member_user_id) ON DELETE CASCADE
-                    );
-                    
-                    -- Create JOB table
-                    CREATE TABLE IF NOT EXISTS job (
-                        job_id SERIAL PRIMARY KEY,
-                        member_user_id INTEGER NOT NULL,
-                        required_caregiving_type VARCHAR(50) NOT NULL CHECK (required_caregiving_type IN ('babysitter', 'elderly care', 'playmate')),
-                        other_requirements TEXT,
-                        date_posted DATE NOT NULL DEFAULT CURRENT_DATE,
-                        FOREIGN KEY (member_user_id) REFERENCES member(member_user_id) ON DELETE CASCADE
-                    );
-                    
-                    -- Create JOB_APPLICATION table
-                    CREATE TABLE IF NOT EXISTS job_application (
-                        caregiver_user_id INTEGER NOT NULL,
-                        job_id INTEGER NOT NULL,
-                        date_applied DATE NOT NULL DEFAULT CURRENT_DATE,
-                        PRIMARY KEY (caregiver_user_id, job_id),
-                        FOREIGN KEY (caregiver_user_id) REFERENCES caregiver(caregiver_user_id) ON DELETE CASCADE,
-                        FOREIGN KEY (job_id) REFERENCES job(job_id) ON DELETE CASCADE
-                    );
-                    
-                    -- Create APPOINTMENT table
-                    CREATE TABLE IF NOT EXISTS appointment (
-                        appointment_id SERIAL PRIMARY KEY,
-                        caregiver_user_id INTEGER NOT NULL,
-                        member_user_id INTEGER NOT NULL,
-                        appointment_date DATE NOT NULL,
-                        appointment_time TIME NOT NULL,
-                        work_hours DECIMAL(4, 2) NOT NULL CHECK (work_hours > 0),
-                        status VARCHAR(20) NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'confirmed', 'declined')),
-                        FOREIGN KEY (caregiver_user_id) REFERENCES caregiver(caregiver_user_id) ON DELETE CASCADE,
-                        FOREIGN KEY (member_user_id) REFERENCES member(member_user_id) ON DELETE CASCADE
-                    );
-                    
-                    -- Create indexes
-                    CREATE INDEX IF NOT EXISTS idx_caregiver_type ON caregiver(caregiving_type);
-                    CREATE INDEX IF NOT EXISTS idx_job_type ON job(required_caregiving_type);
-                    CREATE INDEX IF NOT EXISTS idx_appointment_status ON appointment(status);
-                    CREATE INDEX IF NOT EXISTS idx_appointment_date ON appointment(appointment_date);
-                    CREATE INDEX IF NOT EXISTS idx_user_city ON "user"(city);
-                    """
-                    
-                    # Execute table creation statements one by one
-                    statements = [s.strip() for s in create_tables_sql.split(';') if s.strip() and not s.strip().startswith('--')]
-                    
-                    for i, statement in enumerate(statements):
-                        if statement:
-                            try:
-                                print(f"Executing statement {i+1}/{len(statements)}: {statement[:80]}...")
-                                conn.execute(text(statement))
-                                print(f"Statement {i+1} executed successfully")
-                            except Exception as e:
-                                error_msg = str(e).lower()
-                                if "already exists" not in error_msg and "duplicate" not in error_msg:
-                                    print(f"ERROR creating table: {str(e)[:200]}")
-                                    print(f"Statement was: {statement[:150]}")
-                                    # Don't stop on errors, continue creating other tables
-                                else:
-                                    print(f"Statement {i+1} skipped (already exists)")
-                    
-                    # Verify all tables were created
-                    required_tables = ['user', 'caregiver', 'member', 'address', 'job', 'job_application', 'appointment']
-                    missing_tables = []
-                    for table_name in required_tables:
-                        check_query = text(f"""
-                            SELECT EXISTS (
-                                SELECT FROM information_schema.tables 
-                                WHERE table_schema = 'public' 
-                                AND table_name = '{table_name}'
-                            );
-                        """)
-                        result = conn.execute(check_query)
-                        if not result.fetchone()[0]:
-                            missing_tables.append(table_name)
-                    
-                    if missing_tables:
-                        print(f"ERROR: Some tables were not created: {missing_tables}")
-                        print("Attempting to create missing tables individually...")
-                        # Try to create missing tables individually
-                        for table_name in missing_tables:
-                            if table_name == 'caregiver':
-                                try:
-                                    conn.execute(text("""
-                                        CREATE TABLE IF NOT EXISTS caregiver (
-                                            caregiver_user_id INTEGER PRIMARY KEY,
-                                            photo VARCHAR(500),
-                                            gender VARCHAR(20) NOT NULL,
-                                            caregiving_type VARCHAR(50) NOT NULL CHECK (caregiving_type IN ('babysitter', 'elderly care', 'playmate')),
-                                            hourly_rate DECIMAL(10, 2) NOT NULL CHECK (hourly_rate > 0),
-                                            FOREIGN KEY (caregiver_user_id) REFERENCES "user"(user_id) ON DELETE CASCADE
-                                        );
-                                    """))
-                                    conn.commit()
-                                    print(f"Created table: {table_name}")
-                                except Exception as e:
-                                    print(f"Failed to create {table_name}: {e}")
-                            elif table_name == 'member':
-                                try:
-                                    conn.execute(text("""
-                                        CREATE TABLE IF NOT EXISTS member (
-                                            member_user_id INTEGER PRIMARY KEY,
-                                            house_rules TEXT,
-                                            dependent_description TEXT,
-                                            FOREIGN KEY (member_user_id) REFERENCES "user"(user_id) ON DELETE CASCADE
-                                        );
-                                    """))
-                                    conn.commit()
-                                    print(f"Created table: {table_name}")
-                                except Exception as e:
-                                    print(f"Failed to create {table_name}: {e}")
-                            elif table_name == 'address':
-                                try:
-                                    conn.execute(text("""
-                                        CREATE TABLE IF NOT EXISTS address (
-                                            member_user_id INTEGER PRIMARY KEY,
-                                            house_number VARCHAR(20) NOT NULL,
-                                            street VARCHAR(200) NOT NULL,
-                                            town VARCHAR(100) NOT NULL,
-                                            FOREIGN KEY (member_user_id) REFERENCES member(member_user_id) ON DELETE CASCADE
-                                        );
-                                    """))
-                                    conn.commit()
-                                    print(f"Created table: {table_name}")
-                                except Exception as e:
-                                    print(f"Failed to create {table_name}: {e}")
-                            elif table_name == 'job':
-                                try:
-                                    conn.execute(text("""
-                                        CREATE TABLE IF NOT EXISTS job (
-                                            job_id SERIAL PRIMARY KEY,
-                                            member_user_id INTEGER NOT NULL,
-                                            required_caregiving_type VARCHAR(50) NOT NULL CHECK (required_caregiving_type IN ('babysitter', 'elderly care', 'playmate')),
-                                            other_requirements TEXT,
-                                            date_posted DATE NOT NULL DEFAULT CURRENT_DATE,
-                                            FOREIGN KEY (member_user_id) REFERENCES member(member_user_id) ON DELETE CASCADE
-                                        );
-                                    """))
-                                    conn.commit()
-                                    print(f"Created table: {table_name}")
-                                except Exception as e:
-                                    print(f"Failed to create {table_name}: {e}")
-                            elif table_name == 'job_application':
-                                try:
-                                    conn.execute(text("""
-                                        CREATE TABLE IF NOT EXISTS job_application (
-                                            caregiver_user_id INTEGER NOT NULL,
-                                            job_id INTEGER NOT NULL,
-                                            date_applied DATE NOT NULL DEFAULT CURRENT_DATE,
-                                            PRIMARY KEY (caregiver_user_id, job_id),
-                                            FOREIGN KEY (caregiver_user_id) REFERENCES caregiver(caregiver_user_id) ON DELETE CASCADE,
-                                            FOREIGN KEY (job_id) REFERENCES job(job_id) ON DELETE CASCADE
-                                        );
-                                    """))
-                                    conn.commit()
-                                    print(f"Created table: {table_name}")
-                                except Exception as e:
-                                    print(f"Failed to create {table_name}: {e}")
-                            elif table_name == 'appointment':
-                                try:
-                                    conn.execute(text("""
-                                        CREATE TABLE IF NOT EXISTS appointment (
-                                            appointment_id SERIAL PRIMARY KEY,
-                                            caregiver_user_id INTEGER NOT NULL,
-                                            member_user_id INTEGER NOT NULL,
-                                            appointment_date DATE NOT NULL,
-                                            appointment_time TIME NOT NULL,
-                                            work_hours DECIMAL(4, 2) NOT NULL CHECK (work_hours > 0),
-                                            status VARCHAR(20) NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'confirmed', 'declined')),
-                                            FOREIGN KEY (caregiver_user_id) REFERENCES caregiver(caregiver_user_id) ON DELETE CASCADE,
-                                            FOREIGN KEY (member_user_id) REFERENCES member(member_user_id) ON DELETE CASCADE
-                                        );
-                                    """))
-                                    conn.commit()
-                                    print(f"Created table: {table_name}")
-                                except Exception as e:
-                                    print(f"Failed to create {table_name}: {e}")
-                    else:
-                        print("Database tables created successfully!")
-                    
-                    # Insert sample data if tables are empty
-                    try:
-                        # Check if data already exists
-                        result = conn.execute(text("SELECT COUNT(*) FROM \"user\""))
-                        user_count = result.fetchone()[0]
-                        
-                        if user_count == 0:
-                            print("Inserting sample data...")
-                            
-                            # Insert Users
-                            insert_users = """
-                            INSERT INTO "user" (email, given_name, surname, city, phone_number, profile_description, password) VALUES
-                            ('sarah.johnson@email.com', 'Sarah', 'Johnson', 'Astana', '+1234567890', 'Experienced babysitter with 5 years of experience', 'pass123'),
-                            ('michael.chen@email.com', 'Michael', 'Chen', 'Almaty', '+1234567891', 'Professional elderly care specialist', 'pass123'),
-                            ('emily.davis@email.com', 'Emily', 'Davis', 'Astana', '+1234567892', 'Creative playmate for children', 'pass123'),
-                            ('david.wilson@email.com', 'David', 'Wilson', 'Shymkent', '+1234567893', 'Certified babysitter with first aid training', 'pass123'),
-                            ('lisa.anderson@email.com', 'Lisa', 'Anderson', 'Astana', '+1234567894', 'Compassionate elderly caregiver', 'pass123'),
-                            ('james.brown@email.com', 'James', 'Brown', 'Almaty', '+1234567895', 'Fun and energetic playmate', 'pass123'),
-                            ('maria.garcia@email.com', 'Maria', 'Garcia', 'Astana', '+1234567896', 'Experienced with special needs children', 'pass123'),
-                            ('robert.martinez@email.com', 'Robert', 'Martinez', 'Karaganda', '+1234567897', 'Professional elderly care with medical background', 'pass123'),
-                            ('jennifer.taylor@email.com', 'Jennifer', 'Taylor', 'Astana', '+1234567898', 'Creative activities for children', 'pass123'),
-                            ('william.thomas@email.com', 'William', 'Thomas', 'Almaty', '+1234567899', 'Reliable babysitter available weekends', 'pass123'),
-                            ('arman.armanov@email.com', 'Arman', 'Armanov', 'Astana', '+77771234567', 'Looking for caregiver for my elderly mother', 'pass123'),
-                            ('amina.aminova@email.com', 'Amina', 'Aminova', 'Almaty', '+77771234568', 'Need babysitter for my 5-year-old son', 'pass123'),
-                            ('nurbol.nurbolov@email.com', 'Nurbol', 'Nurbolov', 'Astana', '+77771234569', 'Seeking playmate for my daughter', 'pass123'),
-                            ('ayzhan.ayzhanova@email.com', 'Ayzhan', 'Ayzhanova', 'Shymkent', '+77771234570', 'Elderly care needed for father', 'pass123'),
-                            ('daniyar.daniyarov@email.com', 'Daniyar', 'Daniyarov', 'Astana', '+77771234571', 'Babysitter for twins', 'pass123'),
-                            ('madina.madinova@email.com', 'Madina', 'Madinova', 'Almaty', '+77771234572', 'Playmate for active 7-year-old', 'pass123'),
-                            ('bekzhan.bekzhanov@email.com', 'Bekzhan', 'Bekzhanov', 'Astana', '+77771234573', 'Elderly care with medical needs', 'pass123'),
-                            ('aigerim.aigerimova@email.com', 'Aigerim', 'Aigerimova', 'Karaganda', '+77771234574', 'Babysitter for weekend events', 'pass123'),
-                            ('aslan.aslanov@email.com', 'Aslan', 'Aslanov', 'Astana', '+77771234575', 'Regular babysitting services needed', 'pass123'),
-                            ('zhuldyz.zhuldyzova@email.com', 'Zhuldyz', 'Zhuldyzova', 'Almaty', '+77771234576', 'Elderly care with house rules', 'pass123'),
-                            ('nazira.nazirova@email.com', 'Nazira', 'Nazirova', 'Astana', '+77771234577', 'Need elderly care for my mother', 'pass123');
-                            """
-                            
-                            conn.execute(text(insert_users))
-                            conn.commit()
-                            
-                            # Insert Caregivers
-                            insert_caregivers = """
-                            INSERT INTO caregiver (caregiver_user_id, photo, gender, caregiving_type, hourly_rate) VALUES
-                            (1, 'photo1.jpg', 'Female', 'babysitter', 15.00),
-                            (2, 'photo2.jpg', 'Male', 'elderly care', 20.00),
-                            (3, 'photo3.jpg', 'Female', 'playmate', 12.00),
-                            (4, 'photo4.jpg', 'Male', 'babysitter', 18.00),
-                            (5, 'photo5.jpg', 'Female', 'elderly care', 22.00),
-                            (6, 'photo6.jpg', 'Male', 'playmate', 14.00),
-                            (7, 'photo7.jpg', 'Female', 'babysitter', 16.00),
-                            (8, 'photo8.jpg', 'Male', 'elderly care', 25.00),
-                            (9, 'photo9.jpg', 'Female', 'playmate', 13.00),
-                            (10, 'photo10.jpg', 'Male', 'babysitter', 17.00);
-                            """
-                            
-                            conn.execute(text(insert_caregivers))
-                            conn.commit()
-                            
-                            # Insert Members
-                            insert_members = """
-                            INSERT INTO member (member_user_id, house_rules, dependent_description) VALUES
-                            (11, 'No pets. Please maintain hygiene.', 'I have a 5-year-old son who likes painting and needs supervision'),
-                            (12, 'No smoking. Soft-spoken caregiver preferred.', 'Elderly mother, 75 years old, needs assistance with daily activities'),
-                            (13, 'Pets allowed. Creative activities welcome.', '7-year-old daughter who loves outdoor activities'),
-                            (14, 'Strict hygiene rules. No pets.', 'Father, 80 years old, requires medical assistance'),
-                            (15, 'No pets. Quiet environment needed.', 'Twin boys, 4 years old, need constant supervision'),
-                            (16, 'Flexible rules. Soft-spoken preferred.', 'Active 7-year-old boy who loves sports'),
-                            (17, 'Medical equipment present. No pets.', 'Elderly father with diabetes, needs medication management'),
-                            (18, 'Weekend availability required. No pets.', '6-year-old daughter, needs occasional weekend care'),
-                            (19, 'Regular schedule. No pets.', '8-year-old son, needs after-school care'),
-                            (20, 'No pets. House rules must be followed strictly.', 'Elderly grandmother, 78 years old, needs companionship'),
-                            (21, 'No pets. Clean environment required.', 'Elderly mother, 82 years old, needs daily assistance');
-                            """
-                            
-                            conn.execute(text(insert_members))
-                            conn.commit()
-                            
-                            # Insert Addresses
-                            insert_addresses = """
-                            INSERT INTO address (member_user_id, house_number, street, town) VALUES
-                            (11, '15', 'Kabanbay Batyr', 'Astana'),
-                            (12, '23', 'Abay Avenue', 'Almaty'),
-                            (13, '7', 'Nazarbayev Street', 'Astana'),
-                            (14, '42', 'Turan Avenue', 'Shymkent'),
-                            (15, '9', 'Kabanbay Batyr', 'Astana'),
-                            (16, '31', 'Satpayev Street', 'Almaty'),
-                            (17, '18', 'Kabanbay Batyr', 'Astana'),
-                            (18, '55', 'Bukhar Zhyrau Avenue', 'Karaganda'),
-                            (19, '12', 'Kabanbay Batyr', 'Astana'),
-                            (20, '28', 'Raiymbek Avenue', 'Almaty'),
-                            (21, '33', 'Nazarbayev Street', 'Astana');
-                            """
-                            
-                            conn.execute(text(insert_addresses))
-                            conn.commit()
-                            
-                            # Insert Jobs
-                            insert_jobs = """
-                            INSERT INTO job (member_user_id, required_caregiving_type, other_requirements, date_posted) VALUES
-                            (11, 'babysitter', 'Must be soft-spoken and patient with children', '2025-01-15'),
-                            (12, 'elderly care', 'Experience with medication management required', '2025-01-16'),
-                            (13, 'playmate', 'Creative activities and outdoor games preferred', '2025-01-17'),
-                            (14, 'elderly care', 'Medical background preferred, soft-spoken caregiver needed', '2025-01-18'),
-                            (15, 'babysitter', 'Experience with multiple children required', '2025-01-19'),
-                            (16, 'playmate', 'Sports activities and energetic personality', '2025-01-20'),
-                            (17, 'elderly care', 'Diabetes management experience, soft-spoken preferred', '2025-01-21'),
-                            (18, 'babysitter', 'Weekend availability essential', '2025-01-22'),
-                            (19, 'babysitter', 'After-school hours, soft-spoken and reliable', '2025-01-23'),
-                            (20, 'elderly care', 'Companionship and light housekeeping, soft-spoken caregiver', '2025-01-24'),
-                            (11, 'playmate', 'Art and craft activities preferred', '2025-01-25'),
-                            (12, 'elderly care', 'Physical therapy assistance needed', '2025-01-26'),
-                            (21, 'elderly care', 'Daily care and medication assistance needed', '2025-01-27');
-                            """
-                            
-                            conn.execute(text(insert_jobs))
-                            conn.commit()
-                            
-                            # Insert Job Applications
-                            insert_applications = """
-                            INSERT INTO job_application (caregiver_user_id, job_id, date_applied) VALUES
-                            (1, 1, '2025-01-20'),
-                            (2, 2, '2025-01-21'),
-                            (3, 3, '2025-01-22'),
-                            (4, 1, '2025-01-23'),
-                            (5, 2, '2025-01-24'),
-                            (6, 3, '2025-01-25'),
-                            (7, 4, '2025-01-26'),
-                            (8, 5, '2025-01-27'),
-                            (9, 6, '2025-01-28'),
-                            (10, 7, '2025-01-29'),
-                            (1, 8, '2025-01-30'),
-                            (2, 9, '2025-02-01'),
-                            (3, 10, '2025-02-02'),
-                            (4, 11, '2025-02-03'),
-                            (5, 12, '2025-02-04');
-                            """
-                            
-                            conn.execute(text(insert_applications))
-                            conn.commit()
-                            
-                            # Insert Appointments
-                            insert_appointments = """
-                            INSERT INTO appointment (caregiver_user_id, member_user_id, appointment_date, appointment_time, work_hours, status) VALUES
-                            (1, 11, '2025-02-10', '09:00:00', 3.0, 'confirmed'),
-                            (2, 12, '2025-02-11', '10:00:00', 4.0, 'confirmed'),
-                            (3, 13, '2025-02-12', '14:00:00', 2.5, 'confirmed'),
-                            (4, 15, '2025-02-13', '08:00:00', 5.0, 'confirmed'),
-                            (5, 14, '2025-02-14', '09:00:00', 6.0, 'confirmed'),
-                            (6, 16, '2025-02-15', '15:00:00', 3.5, 'confirmed'),
-                            (7, 19, '2025-02-16', '16:00:00', 2.0, 'confirmed'),
-                            (8, 17, '2025-02-17', '10:00:00', 4.5, 'confirmed'),
-                            (9, 18, '2025-02-18', '11:00:00', 3.0, 'pending'),
-                            (10, 20, '2025-02-19', '09:00:00', 5.0, 'declined'),
-                            (1, 11, '2025-02-20', '13:00:00', 4.0, 'confirmed'),
-                            (2, 12, '2025-02-21', '14:00:00', 3.5, 'confirmed'),
-                            (3, 13, '2025-02-22', '10:00:00', 2.0, 'pending');
-                            """
-                            
-                            conn.execute(text(insert_appointments))
-                            conn.commit()
-                            
-                            print("Sample data inserted successfully!")
-                        else:
-                            print(f"Database already contains {user_count} users. Skipping data insertion.")
-                    except Exception as e:
-                        print(f"Warning inserting data: {str(e)[:200]}")
-                        import traceback
-                        traceback.print_exc()
-        except Exception as e:
-            print(f"Error initializing database: {e}")
-            import traceback
-            traceback.print_exc()
-    
-    # Initialize on startup (always, but only create tables if they don't exist)
-    # This ensures tables are created on Heroku
-    print("Starting database initialization...")
-    try:
-        init_db()
-        print("Database initialization completed.")
-    except Exception as e:
-        print(f"ERROR: Could not initialize database on startup: {e}")
-        import traceback
-        traceback.print_exc()
-        # Don't fail the app startup, but log the error
-        # Try to initialize again on first request
-        print("Will retry initialization on first database access...")
-    
+
+    # Read engines for GET pages, see replicas.py
+    replica_engines = [
+        create_engine(
+            url,
+            echo=False,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+            pool_pre_ping=DB_POOL_PRE_PING != 'never',
+            connect_args={'connect_timeout': replicas.REPLICA_CONNECT_TIMEOUT},
+        )
+        for url in replicas.replica_urls()
+    ]
+    replica_set = replicas.ReplicaSet(replica_engines)
+
 except Exception as e:
     print(f"Database connection error: {e}")
     print(f"DATABASE_URL present: {bool(os.getenv('DATABASE_URL'))}")
     raise
 
 
-def get_session():
-    """Get a new database session"""
-    # Check if tables exist before returning session
+# ============================================================================
+# SCHEMA READINESS
+# ============================================================================
+
+class SchemaReadiness:
+    """Process-wide record of whether the schema has been verified.
+
+    Workers never create or alter tables; `flask migrate` does that once per
+    deploy. Each worker only reads the schema_version stamp on its first
+    session and logs a warning if the database is behind the code. The
+    cached result is only dropped when a statement actually fails with
+    "relation does not exist".
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ready = False
+
+    @property
+    def ready(self):
+        return self._ready
+
+    def ensure(self):
+        """Check the schema version if this process has not done so yet"""
+        if self._ready:
+            return
+        with self._lock:
+            if self._ready:
+                return
+            try:
+                with engine.connect() as conn:
+                    version = conn.execute(text("SELECT MAX(version) FROM schema_version")).scalar() or 0
+            except exc.DBAPIError as e:
+                print(f"Warning checking schema: {str(e.orig).strip().splitlines()[0]}. Run `flask --app app migrate`.")
+                return
+            if version < SCHEMA_VERSION:
+                print(f"Warning: database schema is at version {version}, the code expects {SCHEMA_VERSION}. "
+                      f"Run `flask --app app migrate`.")
+                return
+            self._ready = True
+
+    def invalidate(self):
+        """Force the next session to re-check the schema"""
+        self._ready = False
+
+
+schema_readiness = SchemaReadiness()
+
+
+@event.listens_for(engine, 'handle_error')
+def _invalidate_schema_on_missing_relation(context):
+    """Re-probe the schema after a real "relation does not exist" error"""
+    if getattr(context.original_exception, 'pgcode', None) == UNDEFINED_TABLE:
+        schema_readiness.invalidate()
+
+
+# ============================================================================
+# READ REPLICAS
+# ============================================================================
+
+# Seconds a client's reads stay on the primary after it wrote, so the pages it
+# is redirected to show its own change even on a lagging replica
+READ_YOUR_WRITES_SECONDS = float(os.getenv('READ_YOUR_WRITES_SECONDS', str(replicas.REPLICA_MAX_LAG)))
+
+
+def read_replica():
+    """The replica for this request's reads, or None to stay on the primary"""
+    if not replica_set or not has_request_context() or request.method not in ('GET', 'HEAD'):
+        return None
+    if flask_session.get('_primary_until', 0) > datetime.now().timestamp():
+        return None
+    # One replica per request, so a page and its ETag come from the same snapshot source
+    if 'read_replica' not in g:
+        g.read_replica = replica_set.choose()
+    return g.read_replica
+
+
+def wrote_to_primary():
+    """Keep this client's reads on the primary for READ_YOUR_WRITES_SECONDS"""
+    if replica_set and has_request_context():
+        flask_session['_primary_until'] = datetime.now().timestamp() + READ_YOUR_WRITES_SECONDS
+
+
+def get_session(read_only=False):
+    """Get a new database session; read_only ones go to a replica when one is usable"""
+    schema_readiness.ensure()
+    replica = read_replica() if read_only else None
+    return Session(bind=replica.engine) if replica else Session()
+
+
+# ============================================================================
+# SQL STATEMENTS
+# ============================================================================
+
+# Every statement the routes run per request, named and prepared once per
+# pooled connection (see statements.py). Statements whose SQL is assembled
+# from the request, such as page cursors and filters, get ad hoc names.
+# Streamed lists and exports stay plain text(): server-side cursors cannot
+# run a prepared statement, and planning is no cost next to a full scan.
+statement_registry = statements.StatementRegistry(logger=app.logger)
+
+
+# ============================================================================
+# KEYSET PAGINATION
+# ============================================================================
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+class SeekKey:
+    """One column of a keyset (seek) ordering"""
+
+    def __init__(self, expression, name, parse=int, descending=False):
+        self.expression = expression  # SQL expression used in WHERE/ORDER BY
+        self.name = name              # column name in the result rows
+        self.parse = parse            # converts the cursor text back to a value
+        self.descending = descending
+
+
+class Page:
+    """One page of rows from a keyset-paginated query"""
+
+    def __init__(self, rows, per_page, next_cursor=None, prev_cursor=None):
+        self.rows = rows
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    def _url(self, **cursor):
+        args = {k: v for k, v in request.args.items() if k not in ('after', 'before')}
+        args.update(cursor)
+        return url_for(request.endpoint, **(request.view_args or {}), **args)
+
+    @property
+    def next_url(self):
+        return self._url(after=self.next_cursor) if self.next_cursor else None
+
+    @property
+    def prev_url(self):
+        return self._url(before=self.prev_cursor) if self.prev_cursor else None
+
+
+def get_page_size():
+    """Read ?per_page= from the request, clamped to MAX_PAGE_SIZE"""
     try:
-        with engine.connect() as conn:
-            result = conn.execute(text("""
-                SELECT EXISTS (
-                    SELECT FROM information_schema.tables 
-                    WHERE table_schema = 'public' 
-                    AND table_name = 'user'
-                );
-            """))
-            if not result.fetchone()[0]:
-                print("Tables not found during session creation. Initializing...")
-                init_db()
+        per_page = int(request.args.get('per_page', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        per_page = DEFAULT_PAGE_SIZE
+    return max(1, min(per_page, MAX_PAGE_SIZE))
+
+
+def _encode_cursor(row, keys):
+    return ','.join(str(row[key.name]) for key in keys)
+
+
+def _decode_cursor(cursor, keys):
+    parts = cursor.split(',')
+    if len(parts) != len(keys):
+        raise ValueError('Invalid page cursor')
+    try:
+        return {f'seek_{i}': key.parse(part) for i, (key, part) in enumerate(zip(keys, parts))}
+    except (ValueError, InvalidOperation):
+        raise ValueError('Invalid page cursor')
+
+
+def _seek_condition(keys, backwards):
+    """Build the predicate selecting rows that come after the cursor in scan order"""
+    def op(key, inclusive=False):
+        ascending = key.descending == backwards
+        return ('>' if ascending else '<') + ('=' if inclusive else '')
+
+    if len({key.descending for key in keys}) == 1:
+        if len(keys) == 1:
+            return f"{keys[0].expression} {op(keys[0])} :seek_0"
+        columns = ', '.join(key.expression for key in keys)
+        values = ', '.join(f':seek_{i}' for i in range(len(keys)))
+        return f"({columns}) {op(keys[0])} ({values})"
+
+    # Mixed directions cannot use a row comparison; expand it lexicographically
+    # and bound the leading column so the index scan still starts at the cursor
+    terms = []
+    for i, key in enumerate(keys):
+        equal = [f"{k.expression} = :seek_{j}" for j, k in enumerate(keys[:i])]
+        terms.append(' AND '.join(equal + [f"{key.expression} {op(key)} :seek_{i}"]))
+    lead = keys[0]
+    return f"{lead.expression} {op(lead, inclusive=True)} :seek_0 AND ({' OR '.join(f'({t})' for t in terms)})"
+
+
+def _ordered_query(query, keys, conditions, backwards=False):
+    """Append the WHERE conditions and the seek-key ORDER BY to query"""
+    order = ', '.join(
+        f"{key.expression} {'DESC' if key.descending != backwards else 'ASC'}" for key in keys
+    )
+    sql = query
+    if conditions:
+        sql += ' WHERE ' + ' AND '.join(f'({c})' for c in conditions)
+    return sql + f' ORDER BY {order}'
+
+
+class PageRequest:
+    """The SQL for one page of a keyset-paginated query, built from the request's cursors"""
+
+    def __init__(self, query, keys, where=None, params=None):
+        self.keys = keys
+        self.per_page = get_page_size()
+        after = request.args.get('after')
+        before = request.args.get('before')
+        self.backwards = bool(before) and not after
+        self.cursor = before if self.backwards else after
+        conditions = list(where or [])
+        self.params = dict(params or {})
+        if self.cursor:
+            self.params.update(_decode_cursor(self.cursor, keys))
+            conditions.append(_seek_condition(keys, self.backwards))
+
+        self.sql = _ordered_query(query, keys, conditions, self.backwards) + ' LIMIT :page_limit'
+        self.params['page_limit'] = self.per_page + 1
+
+    def page(self, rows):
+        """Build the Page from the fetched rows (up to per_page + 1 of them)"""
+        keys = self.keys
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if self.backwards:
+            rows.reverse()
+
+        page = Page(rows, self.per_page)
+        if rows:
+            if self.backwards:
+                # We came from the following page, so there is always a next one
+                page.next_cursor = _encode_cursor(rows[-1], keys)
+                if has_more:
+                    page.prev_cursor = _encode_cursor(rows[0], keys)
+            else:
+                if has_more:
+                    page.next_cursor = _encode_cursor(rows[-1], keys)
+                if self.cursor:
+                    page.prev_cursor = _encode_cursor(rows[0], keys)
+        return page
+
+
+def paginate(session, query, keys, where=None, params=None):
+    """
+    Run one page of a keyset-paginated query.
+
+    query is a SELECT without WHERE/ORDER BY/LIMIT; extra filter conditions are
+    passed in where. The page position comes from ?after= or ?before= cursors
+    built from the seek keys of the last/first row of the neighbouring page.
+    """
+    page_request = PageRequest(query, keys, where, params)
+    statement = statement_registry.adhoc('page', page_request.sql)
+    rows = [dict(row._mapping) for row in statement.execute(session, page_request.params)]
+    return page_request.page(rows)
+
+
+# ============================================================================
+# REFERENCE DATA CACHE
+# ============================================================================
+
+# Upper bound on how stale another worker's cached options may get, since
+# version bumps are only visible inside the worker that made the write
+REFERENCE_CACHE_TTL = float(os.getenv('REFERENCE_CACHE_TTL', '60'))
+
+# Tables whose rows are removed by ON DELETE CASCADE when a parent row goes
+CASCADES = {
+    'user': ('caregiver', 'member'),
+    'caregiver': ('job_application', 'appointment'),
+    'member': ('address', 'job', 'appointment'),
+    'job': ('job_application',),
+}
+
+
+class ReferenceCache:
+    """
+    In-process cache of dropdown options for the form pages.
+
+    Each entry remembers the version of every table it was built from; the
+    write routes bump those versions through table_changed(), so an entry is
+    reloaded as soon as one of its tables changes in this worker.
+    """
+
+    def __init__(self, ttl=REFERENCE_CACHE_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._versions = {}
+        self._entries = {}
+
+    def bump(self, *tables):
+        with self._lock:
+            pending = list(tables)
+            while pending:
+                table = pending.pop()
+                self._versions[table] = self._versions.get(table, 0) + 1
+                pending.extend(CASCADES.get(table, ()))
+
+    def version(self, table):
+        return self._versions.get(table, 0)
+
+    def get(self, name, tables, loader):
+        """Return the cached value for name, calling loader() if it is stale"""
+        versions = tuple(self.version(table) for table in tables)
+        entry = self._entries.get(name)
+        if entry and entry[0] == versions and monotonic() - entry[1] < self.ttl:
+            return entry[2]
+        value = loader()
+        self._entries[name] = (versions, monotonic(), value)
+        return value
+
+
+reference_cache = ReferenceCache()
+
+
+def table_changed(*tables):
+    """Record a committed write so cached data built from these tables is reloaded"""
+    reference_cache.bump(*tables)
+    wrote_to_primary()
+
+
+CAREGIVER_OPTIONS = statement_registry.register('caregiver_options', """
+    SELECT c.caregiver_user_id, u.given_name || ' ' || u.surname AS name
+    FROM caregiver c
+    JOIN "user" u ON c.caregiver_user_id = u.user_id
+    ORDER BY u.surname
+""")
+
+MEMBER_OPTIONS = statement_registry.register('member_options', """
+    SELECT m.member_user_id, u.given_name || ' ' || u.surname AS name
+    FROM member m
+    JOIN "user" u ON m.member_user_id = u.user_id
+    ORDER BY u.surname
+""")
+
+JOB_OPTIONS = statement_registry.register('job_options', """
+    SELECT j.job_id, j.required_caregiving_type, u.given_name || ' ' || u.surname AS member_name
+    FROM job j
+    JOIN member m ON j.member_user_id = m.member_user_id
+    JOIN "user" u ON m.member_user_id = u.user_id
+    ORDER BY j.job_id
+""")
+
+
+def caregiver_options(session):
+    """Caregivers for dropdowns, ordered by surname"""
+    return reference_cache.get('caregiver_options', ('caregiver', 'user'), lambda: [
+        dict(row._mapping) for row in CAREGIVER_OPTIONS.execute(session)
+    ])
+
+
+def member_options(session):
+    """Members for dropdowns, ordered by surname"""
+    return reference_cache.get('member_options', ('member', 'user'), lambda: [
+        dict(row._mapping) for row in MEMBER_OPTIONS.execute(session)
+    ])
+
+
+def job_options(session):
+    """Jobs with their member's name for dropdowns, ordered by job id"""
+    return reference_cache.get('job_options', ('job', 'member', 'user'), lambda: [
+        dict(row._mapping) for row in JOB_OPTIONS.execute(session)
+    ])
+
+
+# ============================================================================
+# STREAMED LIST RENDERING
+# ============================================================================
+
+# Rows fetched per round trip from the server-side cursor
+STREAM_BATCH_SIZE = 1000
+
+# Rendered HTML is sent to the client in chunks of at least this many characters
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def wants_stream():
+    """True when a list page is requested in full with ?stream=1"""
+    return request.args.get('stream') in ('1', 'true', 'yes')
+
+
+def stream_rows(query, keys, where=None, params=None):
+    """
+    Yield every row of query in seek-key order from a server-side cursor.
+
+    The session is opened when iteration starts and closed when it ends, so
+    the generator can outlive the view function that created it.
+    """
+    session = get_session(read_only=True)
+    try:
+        result = session.execute(
+            text(_ordered_query(query, keys, where)),
+            params or {},
+            execution_options={'yield_per': STREAM_BATCH_SIZE}
+        )
+        for row in result:
+            yield dict(row._mapping)
     except Exception as e:
-        print(f"Warning checking tables: {e}")
-        # Try to initialize anyway
-        try:
-            init_db()
-        except:
-            pass
-    return Session()
+        print(f"Error streaming rows: {e}")
+        raise
+    finally:
+        session.close()
+
+
+def _coalesce(chunks, size=STREAM_CHUNK_SIZE):
+    """Join the small fragments Jinja yields into larger writes"""
+    buffer = []
+    buffered = 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        buffered += len(chunk)
+        if buffered >= size:
+            yield ''.join(buffer)
+            buffer = []
+            buffered = 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def stream_list(template, name, query, keys, where=None, params=None):
+    """Render a whole list page incrementally instead of materializing every row"""
+    rows = stream_rows(query, keys, where, params)
+    return Response(_coalesce(stream_template(template, page=None, **{name: rows})), mimetype='text/html')
+
+
+# ============================================================================
+# LIST PAGES
+# ============================================================================
+
+class ListPage:
+    """
+    A keyset-paginated HTML list: its query, seek keys and template.
+
+    Shared by the WSGI views below and the async views in asgi.py.
+    """
+
+    def __init__(self, template, name, query, keys):
+        self.template = template  # Jinja template rendering the list
+        self.name = name          # template variable holding the rows
+        self.query = query        # SELECT without WHERE/ORDER BY/LIMIT
+        self.keys = keys          # seek keys for pagination
+
+    def render(self, page):
+        return render_template(self.template, page=page, **{self.name: page.rows})
+
+    def render_error(self, error):
+        flash(f'Error: {error}', 'error')
+        return render_template(self.template, page=None, **{self.name: []})
+
+
+def render_list(listing):
+    """Render one page of a list (or all of it with ?stream=1)"""
+    if wants_stream():
+        return stream_list(listing.template, listing.name, listing.query, listing.keys)
+
+    session = get_session(read_only=True)
+    try:
+        return listing.render(paginate(session, listing.query, listing.keys))
+    except Exception as e:
+        return listing.render_error(e)
+    finally:
+        session.close()
+
+
+# ============================================================================
+# INSTRUMENTATION
+# ============================================================================
+
+# Upper bounds (seconds) of the request latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class RouteMetrics:
+    """Latency histogram, status counts and database time per route, for this worker"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._routes = {}
+        self._statuses = {}
+
+    def record(self, route, method, status, seconds, db_queries, db_seconds):
+        with self._lock:
+            stats = self._routes.get((route, method))
+            if stats is None:
+                stats = self._routes[(route, method)] = {
+                    'buckets': [0] * len(self.buckets), 'count': 0, 'sum': 0.0,
+                    'db_queries': 0, 'db_seconds': 0.0,
+                }
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    stats['buckets'][i] += 1
+            stats['count'] += 1
+            stats['sum'] += seconds
+            stats['db_queries'] += db_queries
+            stats['db_seconds'] += db_seconds
+            key = (route, method, status)
+            self._statuses[key] = self._statuses.get(key, 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            routes = {key: dict(stats, buckets=list(stats['buckets'])) for key, stats in self._routes.items()}
+            return routes, dict(self._statuses)
+
+
+route_metrics = RouteMetrics()
+
+
+@app.before_request
+def _start_request_timer():
+    g.request_started = perf_counter()
+    g.db_queries = 0
+    g.db_seconds = 0.0
+
+
+@app.after_request
+def _remember_status(response):
+    g.response_status = response.status_code
+    return response
+
+
+@app.teardown_request
+def _record_request_metrics(error=None):
+    # Runs after a streamed body has been fully sent, so its queries count too
+    started = g.pop('request_started', None)
+    if started is None:
+        return
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    status = g.pop('response_status', 500 if error else 0)
+    route_metrics.record(
+        route, request.method, status, perf_counter() - started,
+        g.pop('db_queries', 0), g.pop('db_seconds', 0.0)
+    )
+
+
+@event.listens_for(engine, 'before_cursor_execute')
+def _start_statement_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('statement_started', []).append(perf_counter())
+
+
+@event.listens_for(engine, 'after_cursor_execute')
+def _record_statement_time(conn, cursor, statement, parameters, context, executemany):
+    elapsed = perf_counter() - conn.info['statement_started'].pop()
+    if has_request_context() and 'request_started' in g:
+        g.db_queries += 1
+        g.db_seconds += elapsed
+
+
+@event.listens_for(engine, 'handle_error')
+def _discard_statement_timer(context):
+    started = context.connection.info.get('statement_started') if context.connection else None
+    if started:
+        started.pop()
+
+
+# Statements on the read replicas count towards the same per-route database time
+for replica_engine in replica_engines:
+    event.listen(replica_engine, 'before_cursor_execute', _start_statement_timer)
+    event.listen(replica_engine, 'after_cursor_execute', _record_statement_time)
+    event.listen(replica_engine, 'handle_error', _discard_statement_timer)
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"')
+
+
+def prometheus_metrics():
+    """Render this worker's route, database and pool metrics in Prometheus text format"""
+    routes, statuses = route_metrics.snapshot()
+    lines = [
+        '# HELP http_request_duration_seconds Request latency by route.',
+        '# TYPE http_request_duration_seconds histogram',
+    ]
+    for (route, method), stats in sorted(routes.items()):
+        labels = f'route="{_label(route)}",method="{method}"'
+        for bound, count in zip(route_metrics.buckets, stats['buckets']):
+            lines.append(f'http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+        lines.append(f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} {stats["count"]}')
+        lines.append(f'http_request_duration_seconds_sum{{{labels}}} {stats["sum"]:.6f}')
+        lines.append(f'http_request_duration_seconds_count{{{labels}}} {stats["count"]}')
+
+    lines += ['# HELP http_requests_total Requests by route and status.', '# TYPE http_requests_total counter']
+    for (route, method, status), count in sorted(statuses.items()):
+        lines.append(f'http_requests_total{{route="{_label(route)}",method="{method}",status="{status}"}} {count}')
+
+    lines += ['# HELP db_queries_total SQL statements executed by route.', '# TYPE db_queries_total counter']
+    for (route, method), stats in sorted(routes.items()):
+        lines.append(f'db_queries_total{{route="{_label(route)}",method="{method}"}} {stats["db_queries"]}')
+
+    lines += ['# HELP db_query_seconds_total Time spent in SQL statements by route.',
+              '# TYPE db_query_seconds_total counter']
+    for (route, method), stats in sorted(routes.items()):
+        lines.append(f'db_query_seconds_total{{route="{_label(route)}",method="{method}"}} {stats["db_seconds"]:.6f}')
+
+    statement_stats = statement_registry.stats()
+    for metric, key, kind, help_text, scale in (
+        ('db_statement_calls_total', 'calls', 'counter', 'Executions of each named SQL statement.', 1),
+        ('db_statement_errors_total', 'errors', 'counter', 'Failed executions of each named SQL statement.', 1),
+        ('db_statement_prepares_total', 'prepares', 'counter', 'PREPAREs sent for each named SQL statement.', 1),
+        ('db_statement_prepare_failures_total', 'prepare_failures', 'counter',
+         'Failed PREPAREs of each named SQL statement, which then runs unprepared.', 1),
+        ('db_statement_rows_total', 'rows', 'counter', 'Rows returned or changed by each named SQL statement.', 1),
+        ('db_statement_seconds_total', 'total_ms', 'counter', 'Time spent in each named SQL statement.', 1000),
+        ('db_statement_max_seconds', 'max_ms', 'gauge', 'Slowest execution of each named SQL statement.', 1000),
+    ):
+        lines += [f'# HELP {metric} {help_text}', f'# TYPE {metric} {kind}']
+        for stats in statement_stats:
+            value = stats[key] / scale if scale != 1 else stats[key]
+            lines.append(f'{metric}{{statement="{stats["statement"]}"}} {value}')
+
+    pool = pool_status()
+    lines += [
+        '# TYPE db_pool_checked_out gauge', f'db_pool_checked_out {pool["checked_out"]}',
+        '# TYPE db_pool_overflow gauge', f'db_pool_overflow {pool["overflow"]}',
+        '# TYPE db_pool_checkouts_total counter', f'db_pool_checkouts_total {pool["checkouts"]}',
+        '# TYPE db_pool_checkout_wait_seconds_total counter',
+        f'db_pool_checkout_wait_seconds_total {pool_metrics.checkout_wait_total:.6f}',
+        '# TYPE db_pool_checkout_timeouts_total counter', f'db_pool_checkout_timeouts_total {pool["checkout_timeouts"]}',
+        '# TYPE db_pool_invalidations_total counter', f'db_pool_invalidations_total {pool["invalidations"]}',
+    ]
+    return '\n'.join(lines) + '\n'
+
+
+# ============================================================================
+# CONDITIONAL GET
+# ============================================================================
+
+def source_fingerprint():
+    """Hash of the templates and this module, the same in every worker of a deploy"""
+    digest = hashlib.sha1()
+    paths = [os.path.abspath(__file__)]
+    for root, dirs, files in os.walk(os.path.join(app.root_path, app.template_folder)):
+        dirs.sort()
+        paths.extend(os.path.join(root, name) for name in sorted(files))
+    for path in paths:
+        digest.update(os.path.relpath(path, app.root_path).encode('utf-8'))
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:12]
+
+
+# Part of every ETag so a deploy (new templates) invalidates cached pages even
+# when no data changed. Without a release id the code itself identifies the
+# deploy, so a tag issued by one worker still matches on the others.
+CACHE_RELEASE = os.getenv('HEROKU_RELEASE_VERSION') or os.getenv('RELEASE_VERSION') or source_fingerprint()
+
+
+# Change counters and last write time of tables: the compacted table_version
+# rows plus the table_change rows appended by triggers since
+TABLE_VERSIONS_QUERY = """
+    SELECT t.table_name, t.version + COUNT(c.id) AS version,
+           GREATEST(t.modified_at, MAX(c.changed_at)) AS modified_at
+    FROM table_version t
+    LEFT JOIN table_change c ON c.table_name = t.table_name
+    WHERE t.table_name = ANY(:tables)
+    GROUP BY t.table_name
+"""
+
+TABLE_VERSIONS = statement_registry.register('table_versions', TABLE_VERSIONS_QUERY)
+
+
+def table_versions(tables, read_only=True):
+    """{table: (version, modified_at)} for tables"""
+    session = get_session(read_only=read_only)
+    try:
+        rows = TABLE_VERSIONS.execute(session, {'tables': list(tables)})
+        return {row.table_name: (row.version, row.modified_at) for row in rows}
+    finally:
+        session.close()
+
+
+def cached_tables(tables, view_args):
+    """Tables the current request depends on, or () when it must not be answered from cache"""
+    # Pages carrying a flash message are never served from cache
+    if request.method != 'GET' or '_flashes' in flask_session:
+        return ()
+    names = tables[0](**view_args) if len(tables) == 1 and callable(tables[0]) else tables
+    return sorted(names)
+
+
+def cache_validators(versions):
+    """Weak ETag and Last-Modified of the current request from its tables' versions"""
+    stamp = repr((CACHE_RELEASE, SCHEMA_VERSION, request.full_path, sorted(
+        (name, version) for name, (version, _) in versions.items()
+    )))
+    etag = hashlib.sha1(stamp.encode('utf-8')).hexdigest()
+    last_modified = max((modified_at for _, modified_at in versions.values()), default=None)
+    return etag, last_modified
+
+
+def not_modified(etag, last_modified):
+    """The 304 response when the client's copy is current, else None"""
+    if is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        return None
+    return add_validators(Response(status=304), etag, last_modified)
+
+
+def add_validators(response, etag, last_modified):
+    # Error pages and redirects are not worth revalidating
+    if response.status_code not in (200, 304) or '_flashes' in flask_session:
+        return response
+    response.set_etag(etag, weak=True)
+    response.last_modified = last_modified
+    response.cache_control.no_cache = True
+    return response
+
+
+def conditional(*tables, replica=True):
+    """
+    Answer GETs of a page with 304 Not Modified while none of its tables changed.
+
+    tables are the table names the page reads, or a single callable that gets
+    the view arguments and returns them. The ETag covers the versions of those
+    tables plus the URL with its query string, so only the small table_version
+    and table_change tables are read for a revalidation. Pass replica=False for pages that read
+    from the primary, so their versions come from the same database.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(**kwargs):
+            names = cached_tables(tables, kwargs)
+            if not names:
+                return view(**kwargs)
+            try:
+                versions = table_versions(names, read_only=replica)
+            except exc.DBAPIError as e:
+                print(f"Error reading table versions: {e}")
+                return view(**kwargs)
+
+            etag, last_modified = cache_validators(versions)
+            response = not_modified(etag, last_modified)
+            if response is None:
+                response = add_validators(app.make_response(view(**kwargs)), etag, last_modified)
+            return response
+        # Read by asgi.py, whose async views answer the same URLs
+        wrapper.cached_tables = tables
+        return wrapper
+    return decorator
 
 
 # ============================================================================
@@ -514,77 +971,69 @@ def index():
     return render_template('index.html')
 
 
+@app.route('/metrics')
+def metrics():
+    """Prometheus metrics for the worker that serves the request"""
+    return Response(prometheus_metrics(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/metrics/pool')
+def metrics_pool():
+    """Connection pool metrics for the worker that serves the request"""
+    return jsonify(pool_status())
+
+
+@app.route('/metrics/statements')
+def metrics_statements():
+    """Per-statement execution statistics for the worker that serves the request"""
+    return jsonify(statements=statement_registry.stats(), prepared=statements.PREPARED_STATEMENTS)
+
+
 # ============================================================================
 # USER CRUD OPERATIONS
 # ============================================================================
 
+USER_LIST = ListPage(
+    'users/list.html', 'users',
+    """
+    SELECT user_id, email, given_name, surname, city, phone_number, profile_description, password
+    FROM "user"
+    """,
+    (SeekKey('user_id', 'user_id'),),
+)
+
+INSERT_USER = statement_registry.register('insert_user', """
+    INSERT INTO "user" (email, given_name, surname, city, phone_number, profile_description, password)
+    VALUES (:email, :given_name, :surname, :city, :phone_number, :profile_description, :password)
+""")
+
+UPDATE_USER = statement_registry.register('update_user', """
+    UPDATE "user"
+    SET email = :email, given_name = :given_name, surname = :surname,
+        city = :city, phone_number = :phone_number,
+        profile_description = :profile_description, password = :password
+    WHERE user_id = :user_id
+""")
+
+SELECT_USER = statement_registry.register('select_user', 'SELECT * FROM "user" WHERE user_id = :user_id')
+
+DELETE_USER = statement_registry.register('delete_user', 'DELETE FROM "user" WHERE user_id = :user_id')
+
+
 @app.route('/users')
+@conditional('user')
 def list_users():
-    """List all users"""
-    # Ensure tables exist before proceeding
-    try:
-        with engine.connect() as conn:
-            result = conn.execute(text("""
-                SELECT EXISTS (
-                    SELECT FROM information_schema.tables 
-                    WHERE table_schema = 'public' 
-                    AND table_name = 'user'
-                );
-            """))
-            if not result.fetchone()[0]:
-                print("Tables missing in list_users. Initializing...")
-                init_db()
-    except Exception as e:
-        print(f"Error checking tables in list_users: {e}")
-        try:
-            init_db()
-        except:
-            pass
-    
-    session = get_session()
-    try:
-        query = text("SELECT * FROM \"user\" ORDER BY user_id")
-        result = session.execute(query)
-        users = [dict(row._mapping) for row in result]
-        return render_template('users/list.html', users=users)
-    except Exception as e:
-        flash(f'Error: {e}', 'error')
-        return render_template('users/list.html', users=[])
-    finally:
-        session.close()
+    """List users, one page at a time (or all of them with ?stream=1)"""
+    return render_list(USER_LIST)
 
 
 @app.route('/users/create', methods=['GET', 'POST'])
 def create_user():
     """Create a new user"""
-    # Ensure tables exist before proceeding
-    try:
-        with engine.connect() as conn:
-            result = conn.execute(text("""
-                SELECT EXISTS (
-                    SELECT FROM information_schema.tables 
-                    WHERE table_schema = 'public' 
-                    AND table_name = 'user'
-                );
-            """))
-            if not result.fetchone()[0]:
-                print("Tables missing in create_user. Initializing...")
-                init_db()
-    except Exception as e:
-        print(f"Error checking tables in create_user: {e}")
-        try:
-            init_db()
-        except:
-            pass
-    
     if request.method == 'POST':
         session = get_session()
         try:
-            query = text("""
-                INSERT INTO "user" (email, given_name, surname, city, phone_number, profile_description, password)
-                VALUES (:email, :given_name, :surname, :city, :phone_number, :profile_description, :password)
-            """)
-            session.execute(query, {
+            INSERT_USER.execute(session, {
                 'email': request.form['email'],
                 'given_name': request.form['given_name'],
                 'surname': request.form['surname'],
@@ -594,6 +1043,7 @@ def create_user():
                 'password': request.form['password']
             })
             session.commit()
+            table_changed('user')
             flash('User created successfully!', 'success')
             return redirect(url_for('list_users'))
         except Exception as e:
@@ -605,19 +1055,13 @@ def create_user():
 
 
 @app.route('/users/<int:user_id>/update', methods=['GET', 'POST'])
+@conditional('user', replica=False)
 def update_user(user_id):
     """Update a user"""
     session = get_session()
     if request.method == 'POST':
         try:
-            query = text("""
-                UPDATE "user"
-                SET email = :email, given_name = :given_name, surname = :surname,
-                    city = :city, phone_number = :phone_number,
-                    profile_description = :profile_description, password = :password
-                WHERE user_id = :user_id
-            """)
-            session.execute(query, {
+            UPDATE_USER.execute(session, {
                 'user_id': user_id,
                 'email': request.form['email'],
                 'given_name': request.form['given_name'],
@@ -628,6 +1072,7 @@ def update_user(user_id):
                 'password': request.form['password']
             })
             session.commit()
+            table_changed('user')
             flash('User updated successfully!', 'success')
             return redirect(url_for('list_users'))
         except Exception as e:
@@ -638,8 +1083,7 @@ def update_user(user_id):
     
     # GET: Fetch user data
     try:
-        query = text("SELECT * FROM \"user\" WHERE user_id = :user_id")
-        result = session.execute(query, {'user_id': user_id})
+        result = SELECT_USER.execute(session, {'user_id': user_id})
         user = dict(result.fetchone()._mapping)
         return render_template('users/update.html', user=user)
     except Exception as e:
@@ -654,9 +1098,9 @@ def delete_user(user_id):
     """Delete a user"""
     session = get_session()
     try:
-        query = text("DELETE FROM \"user\" WHERE user_id = :user_id")
-        session.execute(query, {'user_id': user_id})
+        DELETE_USER.execute(session, {'user_id': user_id})
         session.commit()
+        table_changed('user')
         flash('User deleted successfully!', 'success')
     except Exception as e:
         session.rollback()
@@ -670,23 +1114,258 @@ def delete_user(user_id):
 # CAREGIVER CRUD OPERATIONS
 # ============================================================================
 
+CAREGIVER_LIST = ListPage(
+    'caregivers/list.html', 'caregivers',
+    """
+    SELECT c.caregiver_user_id, c.photo, c.gender, c.caregiving_type, c.hourly_rate,
+           u.given_name, u.surname, u.email, u.city, u.phone_number
+    FROM caregiver c
+    JOIN "user" u ON c.caregiver_user_id = u.user_id
+    """,
+    (SeekKey('c.caregiver_user_id', 'caregiver_user_id'),),
+)
+
+# Caregiver writes touch "user" and caregiver in one statement each, and
+# RETURNING gives back the written row instead of a second query
+CREATE_CAREGIVER = statement_registry.register('create_caregiver', """
+    WITH new_user AS (
+        INSERT INTO "user" (email, given_name, surname, city, phone_number, profile_description, password)
+        VALUES (:email, :given_name, :surname, :city, :phone_number, :profile_description, :password)
+        RETURNING *
+    ), new_caregiver AS (
+        INSERT INTO caregiver (caregiver_user_id, photo, gender, caregiving_type, hourly_rate)
+        SELECT user_id, CAST(:photo AS VARCHAR), CAST(:gender AS VARCHAR), CAST(:caregiving_type AS VARCHAR),
+               CAST(:hourly_rate AS NUMERIC)
+        FROM new_user
+        RETURNING *
+    )
+    SELECT c.*, u.email, u.given_name, u.surname, u.phone_number, u.profile_description, u.password
+    FROM new_caregiver c
+    JOIN new_user u ON c.caregiver_user_id = u.user_id
+""")
+
+UPDATE_CAREGIVER = statement_registry.register('update_caregiver', """
+    WITH updated_user AS (
+        UPDATE "user" u
+        SET email = :email, given_name = :given_name, surname = :surname, city = :city,
+            phone_number = :phone_number, profile_description = :profile_description, password = :password
+        FROM caregiver c
+        WHERE u.user_id = :user_id AND c.caregiver_user_id = u.user_id
+        RETURNING u.*
+    ), updated_caregiver AS (
+        -- user_city_caregiver copies a new city only after the statement, too
+        -- late for RETURNING, so the city is set here as well
+        UPDATE caregiver c
+        SET photo = :photo, gender = :gender, caregiving_type = :caregiving_type,
+            hourly_rate = :hourly_rate, city = u.city
+        FROM updated_user u
+        WHERE c.caregiver_user_id = u.user_id
+        RETURNING c.*
+    )
+    SELECT c.*, u.email, u.given_name, u.surname, u.phone_number, u.profile_description, u.password
+    FROM updated_caregiver c
+    JOIN updated_user u ON c.caregiver_user_id = u.user_id
+""")
+
+SELECT_CAREGIVER = statement_registry.register('select_caregiver', """
+    SELECT c.*, u.email, u.given_name, u.surname, u.city, u.phone_number, u.profile_description, u.password
+    FROM caregiver c
+    JOIN "user" u ON c.caregiver_user_id = u.user_id
+    WHERE c.caregiver_user_id = :caregiver_id
+""")
+
+
 @app.route('/caregivers')
+@conditional('caregiver', 'user')
 def list_caregivers():
-    """List all caregivers"""
-    session = get_session()
+    """List caregivers, one page at a time (or all of them with ?stream=1)"""
+    return render_list(CAREGIVER_LIST)
+
+
+def caregiver_search_request():
+    """
+    Query, seek keys, filter conditions and params of a /caregivers/search
+    request; raises ValueError for invalid filters.
+    """
+    conditions = []
+    params = {}
+    for name in ('caregiving_type', 'city', 'gender'):
+        value = request.args.get(name, '').strip()
+        if value:
+            conditions.append(f"c.{name} = :{name}")
+            params[name] = value
+    if params.get('caregiving_type') and params['caregiving_type'] not in bulk_import.CAREGIVING_TYPES:
+        raise ValueError(f"caregiving_type must be one of {', '.join(bulk_import.CAREGIVING_TYPES)}")
+    for name, op in (('min_rate', '>='), ('max_rate', '<=')):
+        value = request.args.get(name, '').strip()
+        if value:
+            try:
+                params[name] = Decimal(value)
+            except InvalidOperation:
+                raise ValueError(f'{name} must be a number')
+            conditions.append(f"c.hourly_rate {op} :{name}")
+
+    # c.city is a synced copy of "user".city, so every filter and the sort are
+    # served by idx_caregiver_search; "user" is only joined for the page rows
+    query = """
+        SELECT c.caregiver_user_id, u.given_name, u.surname, c.city, c.gender, c.caregiving_type,
+               c.hourly_rate, c.photo
+        FROM caregiver c
+        JOIN "user" u ON c.caregiver_user_id = u.user_id
+    """
+    descending = request.args.get('order') == 'desc'
+    keys = (
+        SeekKey('c.hourly_rate', 'hourly_rate', parse=Decimal, descending=descending),
+        SeekKey('c.caregiver_user_id', 'caregiver_user_id', descending=descending),
+    )
+    return query, keys, conditions, params
+
+
+@app.route('/caregivers/search')
+@conditional('caregiver', 'user')
+def search_caregivers():
+    """
+    JSON search over caregivers, filtered by caregiving_type, city, gender and
+    min_rate/max_rate, sorted by hourly rate (?order=desc for highest first).
+    """
     try:
-        query = text("""
-            SELECT c.*, u.given_name, u.surname, u.email, u.city, u.phone_number
-            FROM caregiver c
-            JOIN "user" u ON c.caregiver_user_id = u.user_id
-            ORDER BY c.caregiver_user_id
-        """)
-        result = session.execute(query)
-        caregivers = [dict(row._mapping) for row in result]
-        return render_template('caregivers/list.html', caregivers=caregivers)
+        query, keys, conditions, params = caregiver_search_request()
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    session = get_session(read_only=True)
+    try:
+        page = paginate(session, query, keys, where=conditions, params=params)
+        return jsonify(caregivers=page.rows, next=page.next_url, prev=page.prev_url)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
     except Exception as e:
-        flash(f'Error: {e}', 'error')
-        return render_template('caregivers/list.html', caregivers=[])
+        return jsonify(error=str(e)), 500
+    finally:
+        session.close()
+
+
+# Bookable hours per caregiver per day, for the free capacity in calendars
+CALENDAR_DAY_HOURS = float(os.getenv('CALENDAR_DAY_HOURS', '8'))
+MAX_CALENDAR_DAYS = 92
+
+# One row per caregiver, plus a first row with caregiver_user_id NULL holding
+# the group totals, each with per-day arrays over the window. Appointments are
+# read per caregiver through idx_appointment_caregiver_date and split at
+# midnight by intersecting booked_during with every day they touch;
+# appointment_date is bounded 5 days early because work_hours
+# (DECIMAL(4,2)) goes up to 99.99 hours, 4 days and 3.99 hours, so a late
+# start 5 days before the window still reaches into its first day. Only
+# booked days are aggregated, so empty days cost nothing beyond filling in
+# the arrays.
+CALENDAR_QUERY = """
+    WITH days AS (
+        SELECT CAST(d AS DATE) AS day
+        FROM generate_series(CAST(:start AS DATE), CAST(:end AS DATE), INTERVAL '1 day') AS d
+    ),
+    caregivers AS MATERIALIZED (
+        SELECT c.caregiver_user_id
+        FROM caregiver c
+        WHERE {where}
+    ),
+    booked AS MATERIALIZED (
+        SELECT a.caregiver_user_id, CAST(d AS DATE) AS day,
+               ROUND(SUM(EXTRACT(EPOCH FROM upper(a.booked_during * tsrange(d, d + INTERVAL '1 day'))
+                                          - lower(a.booked_during * tsrange(d, d + INTERVAL '1 day')))) / 3600, 2)
+                   AS hours,
+               COUNT(*) AS appointments
+        FROM caregivers cg
+        JOIN appointment a ON a.caregiver_user_id = cg.caregiver_user_id
+        CROSS JOIN LATERAL generate_series(
+            date_trunc('day', lower(a.booked_during)), upper(a.booked_during) - INTERVAL '1 microsecond',
+            INTERVAL '1 day'
+        ) AS d
+        WHERE a.status <> 'declined'
+          AND a.appointment_date BETWEEN CAST(:start AS DATE) - 5 AND CAST(:end AS DATE)
+          AND d BETWEEN CAST(:start AS DATE) AND CAST(:end AS DATE)
+        GROUP BY a.caregiver_user_id, CAST(d AS DATE)
+    ),
+    daily AS (
+        SELECT day, SUM(hours) AS hours, SUM(LEAST(hours, CAST(:capacity AS NUMERIC))) AS capped,
+               SUM(appointments) AS appointments
+        FROM booked
+        GROUP BY day
+    )
+    SELECT NULL AS caregiver_user_id, NULL AS name,
+           array_agg(CAST(COALESCE(t.hours, 0) AS FLOAT) ORDER BY d.day) AS booked_hours,
+           array_agg(CAST((SELECT COUNT(*) FROM caregivers) * CAST(:capacity AS NUMERIC) - COALESCE(t.capped, 0)
+                          AS FLOAT) ORDER BY d.day) AS free_hours,
+           array_agg(CAST(COALESCE(t.appointments, 0) AS INTEGER) ORDER BY d.day) AS appointments
+    FROM days d
+    LEFT JOIN daily t ON t.day = d.day
+    UNION ALL
+    SELECT * FROM (
+        SELECT cg.caregiver_user_id, u.given_name || ' ' || u.surname AS name,
+               array_agg(CAST(COALESCE(b.hours, 0) AS FLOAT) ORDER BY d.day) AS booked_hours,
+               array_agg(CAST(GREATEST(CAST(:capacity AS NUMERIC) - COALESCE(b.hours, 0), 0) AS FLOAT)
+                         ORDER BY d.day) AS free_hours,
+               array_agg(CAST(COALESCE(b.appointments, 0) AS INTEGER) ORDER BY d.day) AS appointments
+        FROM caregivers cg
+        JOIN "user" u ON u.user_id = cg.caregiver_user_id
+        CROSS JOIN days d
+        LEFT JOIN booked b ON b.caregiver_user_id = cg.caregiver_user_id AND b.day = d.day
+        GROUP BY cg.caregiver_user_id, u.given_name, u.surname
+        ORDER BY cg.caregiver_user_id
+    ) AS per_caregiver
+"""
+
+
+def availability_tables(**kwargs):
+    # Without ?start= the window follows today's date, which no table version
+    # reflects, so such calendars are never answered with 304
+    return ('caregiver', 'appointment', 'user') if request.args.get('start') else ()
+
+
+@app.route('/caregivers/availability')
+@app.route('/caregivers/<int:caregiver_id>/availability')
+@conditional(availability_tables)
+def caregiver_availability(caregiver_id=None):
+    """
+    JSON calendar of booked hours and free capacity per day between ?start=
+    and ?end= (default: the next 31 days), for one caregiver or for every
+    caregiver matching ?caregiving_type= and ?city=.
+    """
+    try:
+        start = date.fromisoformat(request.args['start']) if request.args.get('start') else date.today()
+        end = date.fromisoformat(request.args['end']) if request.args.get('end') else start + timedelta(days=30)
+    except ValueError:
+        return jsonify(error='start and end must be dates (YYYY-MM-DD)'), 400
+    if end < start or (end - start).days >= MAX_CALENDAR_DAYS:
+        return jsonify(error=f'end must be on or after start and at most {MAX_CALENDAR_DAYS} days later'), 400
+
+    params = {'start': start, 'end': end, 'capacity': CALENDAR_DAY_HOURS}
+    if caregiver_id is not None:
+        conditions = ['c.caregiver_user_id = :caregiver_id']
+        params['caregiver_id'] = caregiver_id
+    else:
+        conditions = []
+        for name in ('caregiving_type', 'city'):
+            value = request.args.get(name, '').strip()
+            if not value:
+                return jsonify(error='caregiving_type and city are required'), 400
+            conditions.append(f"c.{name} = :{name}")
+            params[name] = value
+
+    session = get_session(read_only=True)
+    try:
+        statement = statement_registry.adhoc('calendar', CALENDAR_QUERY.format(where=' AND '.join(conditions)))
+        rows = statement.execute(session, params).mappings().all()
+        if caregiver_id is not None and len(rows) < 2:
+            return jsonify(error='Caregiver not found'), 404
+        totals = rows[0]
+        return jsonify(
+            start=start.isoformat(),
+            end=end.isoformat(),
+            day_capacity_hours=CALENDAR_DAY_HOURS,
+            totals={key: totals[key] for key in ('booked_hours', 'free_hours', 'appointments')},
+            caregivers=[dict(row) for row in rows[1:]],
+        )
+    except Exception as e:
+        return jsonify(error=str(e)), 500
     finally:
         session.close()
 
@@ -697,36 +1376,23 @@ def create_caregiver():
     session = get_session()
     if request.method == 'POST':
         try:
-            # First create user, then caregiver
-            user_query = text("""
-                INSERT INTO "user" (email, given_name, surname, city, phone_number, profile_description, password)
-                VALUES (:email, :given_name, :surname, :city, :phone_number, :profile_description, :password)
-                RETURNING user_id
-            """)
-            result = session.execute(user_query, {
+            # User and caregiver rows in one statement
+            caregiver = CREATE_CAREGIVER.execute(session, {
                 'email': request.form['email'],
                 'given_name': request.form['given_name'],
                 'surname': request.form['surname'],
                 'city': request.form['city'],
                 'phone_number': request.form['phone_number'],
                 'profile_description': request.form.get('profile_description', ''),
-                'password': request.form['password']
-            })
-            user_id = result.fetchone()[0]
-            
-            caregiver_query = text("""
-                INSERT INTO caregiver (caregiver_user_id, photo, gender, caregiving_type, hourly_rate)
-                VALUES (:user_id, :photo, :gender, :caregiving_type, :hourly_rate)
-            """)
-            session.execute(caregiver_query, {
-                'user_id': user_id,
+                'password': request.form['password'],
                 'photo': request.form.get('photo', ''),
                 'gender': request.form['gender'],
                 'caregiving_type': request.form['caregiving_type'],
                 'hourly_rate': float(request.form['hourly_rate'])
-            })
+            }).fetchone()
             session.commit()
-            flash('Caregiver created successfully!', 'success')
+            table_changed('user', 'caregiver')
+            flash(f'Caregiver {caregiver.given_name} {caregiver.surname} created successfully!', 'success')
             return redirect(url_for('list_caregivers'))
         except Exception as e:
             session.rollback()
@@ -739,20 +1405,14 @@ def create_caregiver():
 
 
 @app.route('/caregivers/<int:caregiver_id>/update', methods=['GET', 'POST'])
+@conditional('caregiver', 'user', replica=False)
 def update_caregiver(caregiver_id):
     """Update a caregiver"""
     session = get_session()
     if request.method == 'POST':
         try:
-            # Update user info
-            user_query = text("""
-                UPDATE "user"
-                SET email = :email, given_name = :given_name, surname = :surname,
-                    city = :city, phone_number = :phone_number,
-                    profile_description = :profile_description, password = :password
-                WHERE user_id = :user_id
-            """)
-            session.execute(user_query, {
+            # User and caregiver rows in one statement; no row means no such caregiver
+            caregiver = UPDATE_CAREGIVER.execute(session, {
                 'user_id': caregiver_id,
                 'email': request.form['email'],
                 'given_name': request.form['given_name'],
@@ -760,25 +1420,19 @@ def update_caregiver(caregiver_id):
                 'city': request.form['city'],
                 'phone_number': request.form['phone_number'],
                 'profile_description': request.form.get('profile_description', ''),
-                'password': request.form['password']
-            })
-            
-            # Update caregiver info
-            caregiver_query = text("""
-                UPDATE caregiver
-                SET photo = :photo, gender = :gender, caregiving_type = :caregiving_type,
-                    hourly_rate = :hourly_rate
-                WHERE caregiver_user_id = :user_id
-            """)
-            session.execute(caregiver_query, {
-                'user_id': caregiver_id,
+                'password': request.form['password'],
                 'photo': request.form.get('photo', ''),
                 'gender': request.form['gender'],
                 'caregiving_type': request.form['caregiving_type'],
                 'hourly_rate': float(request.form['hourly_rate'])
-            })
+            }).fetchone()
+            if caregiver is None:
+                session.rollback()
+                flash('Caregiver not found', 'error')
+                return redirect(url_for('list_caregivers'))
             session.commit()
-            flash('Caregiver updated successfully!', 'success')
+            table_changed('user', 'caregiver')
+            flash(f'Caregiver {caregiver.given_name} {caregiver.surname} updated successfully!', 'success')
             return redirect(url_for('list_caregivers'))
         except Exception as e:
             session.rollback()
@@ -788,13 +1442,7 @@ def update_caregiver(caregiver_id):
     
     # GET: Fetch caregiver data
     try:
-        query = text("""
-            SELECT c.*, u.email, u.given_name, u.surname, u.city, u.phone_number, u.profile_description, u.password
-            FROM caregiver c
-            JOIN "user" u ON c.caregiver_user_id = u.user_id
-            WHERE c.caregiver_user_id = :caregiver_id
-        """)
-        result = session.execute(query, {'caregiver_id': caregiver_id})
+        result = SELECT_CAREGIVER.execute(session, {'caregiver_id': caregiver_id})
         caregiver = dict(result.fetchone()._mapping)
         return render_template('caregivers/update.html', caregiver=caregiver)
     except Exception as e:
@@ -809,9 +1457,9 @@ def delete_caregiver(caregiver_id):
     """Delete a caregiver"""
     session = get_session()
     try:
-        query = text("DELETE FROM \"user\" WHERE user_id = :user_id")
-        session.execute(query, {'user_id': caregiver_id})
+        DELETE_USER.execute(session, {'user_id': caregiver_id})
         session.commit()
+        table_changed('user')
         flash('Caregiver deleted successfully!', 'success')
     except Exception as e:
         session.rollback()
@@ -825,25 +1473,67 @@ def delete_caregiver(caregiver_id):
 # MEMBER CRUD OPERATIONS
 # ============================================================================
 
+MEMBER_LIST = ListPage(
+    'members/list.html', 'members',
+    """
+    SELECT m.member_user_id, m.house_rules, m.dependent_description,
+           u.given_name, u.surname, u.email, u.city, u.phone_number
+    FROM member m
+    JOIN "user" u ON m.member_user_id = u.user_id
+    """,
+    (SeekKey('m.member_user_id', 'member_user_id'),),
+)
+
+# Like the caregiver writes: "user" and member in one statement, returning the row
+CREATE_MEMBER = statement_registry.register('create_member', """
+    WITH new_user AS (
+        INSERT INTO "user" (email, given_name, surname, city, phone_number, profile_description, password)
+        VALUES (:email, :given_name, :surname, :city, :phone_number, :profile_description, :password)
+        RETURNING *
+    ), new_member AS (
+        INSERT INTO member (member_user_id, house_rules, dependent_description)
+        SELECT user_id, CAST(:house_rules AS TEXT), CAST(:dependent_description AS TEXT)
+        FROM new_user
+        RETURNING *
+    )
+    SELECT m.*, u.email, u.given_name, u.surname, u.city, u.phone_number, u.profile_description, u.password
+    FROM new_member m
+    JOIN new_user u ON m.member_user_id = u.user_id
+""")
+
+UPDATE_MEMBER = statement_registry.register('update_member', """
+    WITH updated_user AS (
+        UPDATE "user" u
+        SET email = :email, given_name = :given_name, surname = :surname, city = :city,
+            phone_number = :phone_number, profile_description = :profile_description, password = :password
+        FROM member m
+        WHERE u.user_id = :user_id AND m.member_user_id = u.user_id
+        RETURNING u.*
+    ), updated_member AS (
+        UPDATE member m
+        SET house_rules = :house_rules, dependent_description = :dependent_description
+        FROM updated_user u
+        WHERE m.member_user_id = u.user_id
+        RETURNING m.*
+    )
+    SELECT m.*, u.email, u.given_name, u.surname, u.city, u.phone_number, u.profile_description, u.password
+    FROM updated_member m
+    JOIN updated_user u ON m.member_user_id = u.user_id
+""")
+
+SELECT_MEMBER = statement_registry.register('select_member', """
+    SELECT m.*, u.email, u.given_name, u.surname, u.city, u.phone_number, u.profile_description, u.password
+    FROM member m
+    JOIN "user" u ON m.member_user_id = u.user_id
+    WHERE m.member_user_id = :member_id
+""")
+
+
 @app.route('/members')
+@conditional('member', 'user')
 def list_members():
-    """List all members"""
-    session = get_session()
-    try:
-        query = text("""
-            SELECT m.*, u.given_name, u.surname, u.email, u.city, u.phone_number
-            FROM member m
-            JOIN "user" u ON m.member_user_id = u.user_id
-            ORDER BY m.member_user_id
-        """)
-        result = session.execute(query)
-        members = [dict(row._mapping) for row in result]
-        return render_template('members/list.html', members=members)
-    except Exception as e:
-        flash(f'Error: {e}', 'error')
-        return render_template('members/list.html', members=[])
-    finally:
-        session.close()
+    """List members, one page at a time (or all of them with ?stream=1)"""
+    return render_list(MEMBER_LIST)
 
 
 @app.route('/members/create', methods=['GET', 'POST'])
@@ -852,34 +1542,21 @@ def create_member():
     session = get_session()
     if request.method == 'POST':
         try:
-            # First create user, then member
-            user_query = text("""
-                INSERT INTO "user" (email, given_name, surname, city, phone_number, profile_description, password)
-                VALUES (:email, :given_name, :surname, :city, :phone_number, :profile_description, :password)
-                RETURNING user_id
-            """)
-            result = session.execute(user_query, {
+            # User and member rows in one statement
+            member = CREATE_MEMBER.execute(session, {
                 'email': request.form['email'],
                 'given_name': request.form['given_name'],
                 'surname': request.form['surname'],
                 'city': request.form['city'],
                 'phone_number': request.form['phone_number'],
                 'profile_description': request.form.get('profile_description', ''),
-                'password': request.form['password']
-            })
-            user_id = result.fetchone()[0]
-            
-            member_query = text("""
-                INSERT INTO member (member_user_id, house_rules, dependent_description)
-                VALUES (:user_id, :house_rules, :dependent_description)
-            """)
-            session.execute(member_query, {
-                'user_id': user_id,
+                'password': request.form['password'],
                 'house_rules': request.form.get('house_rules', ''),
                 'dependent_description': request.form.get('dependent_description', '')
-            })
+            }).fetchone()
             session.commit()
-            flash('Member created successfully!', 'success')
+            table_changed('user', 'member')
+            flash(f'Member {member.given_name} {member.surname} created successfully!', 'success')
             return redirect(url_for('list_members'))
         except Exception as e:
             session.rollback()
@@ -891,20 +1568,14 @@ def create_member():
 
 
 @app.route('/members/<int:member_id>/update', methods=['GET', 'POST'])
+@conditional('member', 'user', replica=False)
 def update_member(member_id):
     """Update a member"""
     session = get_session()
     if request.method == 'POST':
         try:
-            # Update user info
-            user_query = text("""
-                UPDATE "user"
-                SET email = :email, given_name = :given_name, surname = :surname,
-                    city = :city, phone_number = :phone_number,
-                    profile_description = :profile_description, password = :password
-                WHERE user_id = :user_id
-            """)
-            session.execute(user_query, {
+            # User and member rows in one statement; no row means no such member
+            member = UPDATE_MEMBER.execute(session, {
                 'user_id': member_id,
                 'email': request.form['email'],
                 'given_name': request.form['given_name'],
@@ -912,22 +1583,17 @@ def update_member(member_id):
                 'city': request.form['city'],
                 'phone_number': request.form['phone_number'],
                 'profile_description': request.form.get('profile_description', ''),
-                'password': request.form['password']
-            })
-            
-            # Update member info
-            member_query = text("""
-                UPDATE member
-                SET house_rules = :house_rules, dependent_description = :dependent_description
-                WHERE member_user_id = :user_id
-            """)
-            session.execute(member_query, {
-                'user_id': member_id,
+                'password': request.form['password'],
                 'house_rules': request.form.get('house_rules', ''),
                 'dependent_description': request.form.get('dependent_description', '')
-            })
+            }).fetchone()
+            if member is None:
+                session.rollback()
+                flash('Member not found', 'error')
+                return redirect(url_for('list_members'))
             session.commit()
-            flash('Member updated successfully!', 'success')
+            table_changed('user', 'member')
+            flash(f'Member {member.given_name} {member.surname} updated successfully!', 'success')
             return redirect(url_for('list_members'))
         except Exception as e:
             session.rollback()
@@ -937,13 +1603,7 @@ def update_member(member_id):
     
     # GET: Fetch member data
     try:
-        query = text("""
-            SELECT m.*, u.email, u.given_name, u.surname, u.city, u.phone_number, u.profile_description, u.password
-            FROM member m
-            JOIN "user" u ON m.member_user_id = u.user_id
-            WHERE m.member_user_id = :member_id
-        """)
-        result = session.execute(query, {'member_id': member_id})
+        result = SELECT_MEMBER.execute(session, {'member_id': member_id})
         member = dict(result.fetchone()._mapping)
         return render_template('members/update.html', member=member)
     except Exception as e:
@@ -958,9 +1618,9 @@ def delete_member(member_id):
     """Delete a member"""
     session = get_session()
     try:
-        query = text("DELETE FROM \"user\" WHERE user_id = :user_id")
-        session.execute(query, {'user_id': member_id})
+        DELETE_USER.execute(session, {'user_id': member_id})
         session.commit()
+        table_changed('user')
         flash('Member deleted successfully!', 'success')
     except Exception as e:
         session.rollback()
@@ -974,26 +1634,38 @@ def delete_member(member_id):
 # ADDRESS CRUD OPERATIONS
 # ============================================================================
 
+ADDRESS_LIST = ListPage(
+    'addresses/list.html', 'addresses',
+    """
+    SELECT a.*, u.given_name, u.surname
+    FROM address a
+    JOIN member m ON a.member_user_id = m.member_user_id
+    JOIN "user" u ON m.member_user_id = u.user_id
+    """,
+    (SeekKey('a.member_user_id', 'member_user_id'),),
+)
+
+INSERT_ADDRESS = statement_registry.register('insert_address', """
+    INSERT INTO address (member_user_id, house_number, street, town)
+    VALUES (:member_user_id, :house_number, :street, :town)
+""")
+
+UPDATE_ADDRESS = statement_registry.register('update_address', """
+    UPDATE address
+    SET house_number = :house_number, street = :street, town = :town
+    WHERE member_user_id = :member_user_id
+""")
+
+SELECT_ADDRESS = statement_registry.register('select_address', 'SELECT * FROM address WHERE member_user_id = :member_id')
+
+DELETE_ADDRESS = statement_registry.register('delete_address', 'DELETE FROM address WHERE member_user_id = :member_id')
+
+
 @app.route('/addresses')
+@conditional('address', 'member', 'user')
 def list_addresses():
-    """List all addresses"""
-    session = get_session()
-    try:
-        query = text("""
-            SELECT a.*, u.given_name, u.surname
-            FROM address a
-            JOIN member m ON a.member_user_id = m.member_user_id
-            JOIN "user" u ON m.member_user_id = u.user_id
-            ORDER BY a.member_user_id
-        """)
-        result = session.execute(query)
-        addresses = [dict(row._mapping) for row in result]
-        return render_template('addresses/list.html', addresses=addresses)
-    except Exception as e:
-        flash(f'Error: {e}', 'error')
-        return render_template('addresses/list.html', addresses=[])
-    finally:
-        session.close()
+    """List addresses, one page at a time (or all of them with ?stream=1)"""
+    return render_list(ADDRESS_LIST)
 
 
 @app.route('/addresses/create', methods=['GET', 'POST'])
@@ -1002,17 +1674,14 @@ def create_address():
     session = get_session()
     if request.method == 'POST':
         try:
-            query = text("""
-                INSERT INTO address (member_user_id, house_number, street, town)
-                VALUES (:member_user_id, :house_number, :street, :town)
-            """)
-            session.execute(query, {
+            INSERT_ADDRESS.execute(session, {
                 'member_user_id': int(request.form['member_user_id']),
                 'house_number': request.form['house_number'],
                 'street': request.form['street'],
                 'town': request.form['town']
             })
             session.commit()
+            table_changed('address')
             flash('Address created successfully!', 'success')
             return redirect(url_for('list_addresses'))
         except Exception as e:
@@ -1023,14 +1692,7 @@ def create_address():
     
     # GET: Fetch members for dropdown
     try:
-        query = text("""
-            SELECT m.member_user_id, u.given_name || ' ' || u.surname AS name
-            FROM member m
-            JOIN "user" u ON m.member_user_id = u.user_id
-            ORDER BY u.surname
-        """)
-        result = session.execute(query)
-        members = [dict(row._mapping) for row in result]
+        members = member_options(session)
         return render_template('addresses/create.html', members=members)
     except Exception as e:
         flash(f'Error: {e}', 'error')
@@ -1040,23 +1702,20 @@ def create_address():
 
 
 @app.route('/addresses/<int:member_id>/update', methods=['GET', 'POST'])
+@conditional('address', replica=False)
 def update_address(member_id):
     """Update an address"""
     session = get_session()
     if request.method == 'POST':
         try:
-            query = text("""
-                UPDATE address
-                SET house_number = :house_number, street = :street, town = :town
-                WHERE member_user_id = :member_user_id
-            """)
-            session.execute(query, {
+            UPDATE_ADDRESS.execute(session, {
                 'member_user_id': member_id,
                 'house_number': request.form['house_number'],
                 'street': request.form['street'],
                 'town': request.form['town']
             })
             session.commit()
+            table_changed('address')
             flash('Address updated successfully!', 'success')
             return redirect(url_for('list_addresses'))
         except Exception as e:
@@ -1067,8 +1726,7 @@ def update_address(member_id):
     
     # GET: Fetch address data
     try:
-        query = text("SELECT * FROM address WHERE member_user_id = :member_id")
-        result = session.execute(query, {'member_id': member_id})
+        result = SELECT_ADDRESS.execute(session, {'member_id': member_id})
         address = dict(result.fetchone()._mapping)
         return render_template('addresses/update.html', address=address)
     except Exception as e:
@@ -1083,9 +1741,9 @@ def delete_address(member_id):
     """Delete an address"""
     session = get_session()
     try:
-        query = text("DELETE FROM address WHERE member_user_id = :member_id")
-        session.execute(query, {'member_id': member_id})
+        DELETE_ADDRESS.execute(session, {'member_id': member_id})
         session.commit()
+        table_changed('address')
         flash('Address deleted successfully!', 'success')
     except Exception as e:
         session.rollback()
@@ -1099,26 +1757,40 @@ def delete_address(member_id):
 # JOB CRUD OPERATIONS
 # ============================================================================
 
+JOB_LIST = ListPage(
+    'jobs/list.html', 'jobs',
+    """
+    SELECT j.job_id, j.member_user_id, j.required_caregiving_type, j.other_requirements, j.date_posted,
+           u.given_name || ' ' || u.surname AS member_name
+    FROM job j
+    JOIN member m ON j.member_user_id = m.member_user_id
+    JOIN "user" u ON m.member_user_id = u.user_id
+    """,
+    (SeekKey('j.job_id', 'job_id'),),
+)
+
+INSERT_JOB = statement_registry.register('insert_job', """
+    INSERT INTO job (member_user_id, required_caregiving_type, other_requirements, date_posted)
+    VALUES (:member_user_id, :required_caregiving_type, :other_requirements, :date_posted)
+""")
+
+UPDATE_JOB = statement_registry.register('update_job', """
+    UPDATE job
+    SET member_user_id = :member_user_id, required_caregiving_type = :required_caregiving_type,
+        other_requirements = :other_requirements, date_posted = :date_posted
+    WHERE job_id = :job_id
+""")
+
+SELECT_JOB = statement_registry.register('select_job', 'SELECT * FROM job WHERE job_id = :job_id')
+
+DELETE_JOB = statement_registry.register('delete_job', 'DELETE FROM job WHERE job_id = :job_id')
+
+
 @app.route('/jobs')
+@conditional('job', 'member', 'user')
 def list_jobs():
-    """List all jobs"""
-    session = get_session()
-    try:
-        query = text("""
-            SELECT j.*, u.given_name || ' ' || u.surname AS member_name
-            FROM job j
-            JOIN member m ON j.member_user_id = m.member_user_id
-            JOIN "user" u ON m.member_user_id = u.user_id
-            ORDER BY j.job_id
-        """)
-        result = session.execute(query)
-        jobs = [dict(row._mapping) for row in result]
-        return render_template('jobs/list.html', jobs=jobs)
-    except Exception as e:
-        flash(f'Error: {e}', 'error')
-        return render_template('jobs/list.html', jobs=[])
-    finally:
-        session.close()
+    """List jobs, one page at a time (or all of them with ?stream=1)"""
+    return render_list(JOB_LIST)
 
 
 @app.route('/jobs/create', methods=['GET', 'POST'])
@@ -1127,17 +1799,14 @@ def create_job():
     session = get_session()
     if request.method == 'POST':
         try:
-            query = text("""
-                INSERT INTO job (member_user_id, required_caregiving_type, other_requirements, date_posted)
-                VALUES (:member_user_id, :required_caregiving_type, :other_requirements, :date_posted)
-            """)
-            session.execute(query, {
+            INSERT_JOB.execute(session, {
                 'member_user_id': int(request.form['member_user_id']),
                 'required_caregiving_type': request.form['required_caregiving_type'],
                 'other_requirements': request.form.get('other_requirements', ''),
                 'date_posted': request.form.get('date_posted', date.today())
             })
             session.commit()
+            table_changed('job')
             flash('Job created successfully!', 'success')
             return redirect(url_for('list_jobs'))
         except Exception as e:
@@ -1148,14 +1817,7 @@ def create_job():
     
     # GET: Fetch members for dropdown
     try:
-        query = text("""
-            SELECT m.member_user_id, u.given_name || ' ' || u.surname AS name
-            FROM member m
-            JOIN "user" u ON m.member_user_id = u.user_id
-            ORDER BY u.surname
-        """)
-        result = session.execute(query)
-        members = [dict(row._mapping) for row in result]
+        members = member_options(session)
         return render_template('jobs/create.html', members=members)
     except Exception as e:
         flash(f'Error: {e}', 'error')
@@ -1165,18 +1827,13 @@ def create_job():
 
 
 @app.route('/jobs/<int:job_id>/update', methods=['GET', 'POST'])
+@conditional('job', 'member', 'user', replica=False)
 def update_job(job_id):
     """Update a job"""
     session = get_session()
     if request.method == 'POST':
         try:
-            query = text("""
-                UPDATE job
-                SET member_user_id = :member_user_id, required_caregiving_type = :required_caregiving_type,
-                    other_requirements = :other_requirements, date_posted = :date_posted
-                WHERE job_id = :job_id
-            """)
-            session.execute(query, {
+            UPDATE_JOB.execute(session, {
                 'job_id': job_id,
                 'member_user_id': int(request.form['member_user_id']),
                 'required_caregiving_type': request.form['required_caregiving_type'],
@@ -1184,6 +1841,7 @@ def update_job(job_id):
                 'date_posted': request.form.get('date_posted')
             })
             session.commit()
+            table_changed('job')
             flash('Job updated successfully!', 'success')
             return redirect(url_for('list_jobs'))
         except Exception as e:
@@ -1194,19 +1852,11 @@ def update_job(job_id):
     
     # GET: Fetch job data
     try:
-        query = text("SELECT * FROM job WHERE job_id = :job_id")
-        result = session.execute(query, {'job_id': job_id})
+        result = SELECT_JOB.execute(session, {'job_id': job_id})
         job = dict(result.fetchone()._mapping)
         
         # Get members for dropdown
-        members_query = text("""
-            SELECT m.member_user_id, u.given_name || ' ' || u.surname AS name
-            FROM member m
-            JOIN "user" u ON m.member_user_id = u.user_id
-            ORDER BY u.surname
-        """)
-        members_result = session.execute(members_query)
-        members = [dict(row._mapping) for row in members_result]
+        members = member_options(session)
         
         return render_template('jobs/update.html', job=job, members=members)
     except Exception as e:
@@ -1221,9 +1871,9 @@ def delete_job(job_id):
     """Delete a job"""
     session = get_session()
     try:
-        query = text("DELETE FROM job WHERE job_id = :job_id")
-        session.execute(query, {'job_id': job_id})
+        DELETE_JOB.execute(session, {'job_id': job_id})
         session.commit()
+        table_changed('job')
         flash('Job deleted successfully!', 'success')
     except Exception as e:
         session.rollback()
@@ -1233,54 +1883,108 @@ def delete_job(job_id):
     return redirect(url_for('list_jobs'))
 
 
-# ============================================================================
-# JOB APPLICATION CRUD OPERATIONS
-# ============================================================================
+SELECT_JOB_FOR_MATCHES = statement_registry.register('select_job_for_matches', """
+    SELECT j.job_id, j.required_caregiving_type, j.city, j.other_requirements,
+           u.given_name || ' ' || u.surname AS member_name
+    FROM job j
+    JOIN "user" u ON j.member_user_id = u.user_id
+    WHERE j.job_id = :job_id
+""")
 
-@app.route('/job_applications')
-def list_job_applications():
-    """List all job applications"""
-    session = get_session()
+
+@app.route('/jobs/<int:job_id>/matches')
+@conditional('job', 'job_application', 'caregiver', 'user')
+def job_matches(job_id):
+    """Caregivers of the job's type in the member's city, cheapest first"""
+    session = get_session(read_only=True)
     try:
-        query = text("""
-            SELECT ja.*, 
-                   u_cg.given_name || ' ' || u_cg.surname AS caregiver_name,
-                   u_m.given_name || ' ' || u_m.surname AS member_name,
-                   j.required_caregiving_type
-            FROM job_application ja
-            JOIN caregiver c ON ja.caregiver_user_id = c.caregiver_user_id
-            JOIN "user" u_cg ON c.caregiver_user_id = u_cg.user_id
-            JOIN job j ON ja.job_id = j.job_id
-            JOIN member m ON j.member_user_id = m.member_user_id
-            JOIN "user" u_m ON m.member_user_id = u_m.user_id
-            ORDER BY ja.job_id, ja.date_applied
-        """)
-        result = session.execute(query)
-        applications = [dict(row._mapping) for row in result]
-        return render_template('job_applications/list.html', applications=applications)
+        job = SELECT_JOB_FOR_MATCHES.execute(session, {'job_id': job_id}).fetchone()
+        if not job:
+            flash('Job not found', 'error')
+            return redirect(url_for('list_jobs'))
+
+        # Type and city are passed as values rather than joined from job, so
+        # the candidates come straight off idx_caregiver_search in rate order
+        query = """
+            SELECT c.caregiver_user_id, u.given_name || ' ' || u.surname AS caregiver_name,
+                   c.city, c.gender, c.hourly_rate, ja.date_applied
+            FROM caregiver c
+            JOIN "user" u ON c.caregiver_user_id = u.user_id
+            LEFT JOIN job_application ja ON ja.caregiver_user_id = c.caregiver_user_id AND ja.job_id = :job_id
+        """
+        keys = (
+            SeekKey('c.hourly_rate', 'hourly_rate', parse=Decimal),
+            SeekKey('c.caregiver_user_id', 'caregiver_user_id'),
+        )
+        page = paginate(
+            session, query, keys,
+            where=['c.caregiving_type = :caregiving_type', 'c.city = :city'],
+            params={'job_id': job_id, 'caregiving_type': job.required_caregiving_type, 'city': job.city},
+        )
+        return render_template('jobs/matches.html', job=job, candidates=page.rows, page=page)
     except Exception as e:
         flash(f'Error: {e}', 'error')
-        return render_template('job_applications/list.html', applications=[])
+        return redirect(url_for('list_jobs'))
     finally:
         session.close()
 
 
+# ============================================================================
+# JOB APPLICATION CRUD OPERATIONS
+# ============================================================================
+
+JOB_APPLICATION_LIST = ListPage(
+    'job_applications/list.html', 'applications',
+    """
+    SELECT ja.*, 
+           u_cg.given_name || ' ' || u_cg.surname AS caregiver_name,
+           u_m.given_name || ' ' || u_m.surname AS member_name,
+           j.required_caregiving_type
+    FROM job_application ja
+    JOIN caregiver c ON ja.caregiver_user_id = c.caregiver_user_id
+    JOIN "user" u_cg ON c.caregiver_user_id = u_cg.user_id
+    JOIN job j ON ja.job_id = j.job_id
+    JOIN member m ON j.member_user_id = m.member_user_id
+    JOIN "user" u_m ON m.member_user_id = u_m.user_id
+    """,
+    (
+        SeekKey('ja.job_id', 'job_id'),
+        SeekKey('ja.date_applied', 'date_applied', parse=date.fromisoformat),
+        SeekKey('ja.caregiver_user_id', 'caregiver_user_id'),
+    ),
+)
+
+INSERT_JOB_APPLICATION = statement_registry.register('insert_job_application', """
+    INSERT INTO job_application (caregiver_user_id, job_id, date_applied)
+    VALUES (:caregiver_user_id, :job_id, :date_applied)
+""")
+
+DELETE_JOB_APPLICATION = statement_registry.register('delete_job_application', """
+    DELETE FROM job_application
+    WHERE caregiver_user_id = :caregiver_id AND job_id = :job_id
+""")
+
+
+@app.route('/job_applications')
+@conditional('job_application', 'caregiver', 'job', 'member', 'user')
+def list_job_applications():
+    """List job applications, one page at a time (or all of them with ?stream=1)"""
+    return render_list(JOB_APPLICATION_LIST)
+
+
 @app.route('/job_applications/create', methods=['GET', 'POST'])
 def create_job_application():
     """Create a new job application"""
     session = get_session()
     if request.method == 'POST':
         try:
-            query = text("""
-                INSERT INTO job_application (caregiver_user_id, job_id, date_applied)
-                VALUES (:caregiver_user_id, :job_id, :date_applied)
-            """)
-            session.execute(query, {
+            INSERT_JOB_APPLICATION.execute(session, {
                 'caregiver_user_id': int(request.form['caregiver_user_id']),
                 'job_id': int(request.form['job_id']),
                 'date_applied': request.form.get('date_applied', date.today())
             })
             session.commit()
+            table_changed('job_application')
             flash('Job application created successfully!', 'success')
             return redirect(url_for('list_job_applications'))
         except Exception as e:
@@ -1291,21 +1995,8 @@ def create_job_application():
     
     # GET: Fetch caregivers and jobs for dropdowns
     try:
-        caregivers_query = text("""
-            SELECT c.caregiver_user_id, u.given_name || ' ' || u.surname AS name
-            FROM caregiver c
-            JOIN "user" u ON c.caregiver_user_id = u.user_id
-            ORDER BY u.surname
-        """)
-        jobs_query = text("""
-            SELECT j.job_id, j.required_caregiving_type, u.given_name || ' ' || u.surname AS member_name
-            FROM job j
-            JOIN member m ON j.member_user_id = m.member_user_id
-            JOIN "user" u ON m.member_user_id = u.user_id
-            ORDER BY j.job_id
-        """)
-        caregivers = [dict(row._mapping) for row in session.execute(caregivers_query)]
-        jobs = [dict(row._mapping) for row in session.execute(jobs_query)]
+        caregivers = caregiver_options(session)
+        jobs = job_options(session)
         return render_template('job_applications/create.html', caregivers=caregivers, jobs=jobs)
     except Exception as e:
         flash(f'Error: {e}', 'error')
@@ -1319,12 +2010,9 @@ def delete_job_application(caregiver_id, job_id):
     """Delete a job application"""
     session = get_session()
     try:
-        query = text("""
-            DELETE FROM job_application
-            WHERE caregiver_user_id = :caregiver_id AND job_id = :job_id
-        """)
-        session.execute(query, {'caregiver_id': caregiver_id, 'job_id': job_id})
+        DELETE_JOB_APPLICATION.execute(session, {'caregiver_id': caregiver_id, 'job_id': job_id})
         session.commit()
+        table_changed('job_application')
         flash('Job application deleted successfully!', 'success')
     except Exception as e:
         session.rollback()
@@ -1338,30 +2026,48 @@ def delete_job_application(caregiver_id, job_id):
 # APPOINTMENT CRUD OPERATIONS
 # ============================================================================
 
+APPOINTMENT_LIST = ListPage(
+    'appointments/list.html', 'appointments',
+    """
+    SELECT a.*,
+           u_cg.given_name || ' ' || u_cg.surname AS caregiver_name,
+           u_m.given_name || ' ' || u_m.surname AS member_name
+    FROM appointment a
+    JOIN caregiver c ON a.caregiver_user_id = c.caregiver_user_id
+    JOIN "user" u_cg ON c.caregiver_user_id = u_cg.user_id
+    JOIN member m ON a.member_user_id = m.member_user_id
+    JOIN "user" u_m ON m.member_user_id = u_m.user_id
+    """,
+    (
+        SeekKey('a.appointment_date', 'appointment_date', parse=date.fromisoformat, descending=True),
+        SeekKey('a.appointment_time', 'appointment_time', parse=time.fromisoformat),
+        SeekKey('a.appointment_id', 'appointment_id'),
+    ),
+)
+
+INSERT_APPOINTMENT = statement_registry.register('insert_appointment', """
+    INSERT INTO appointment (caregiver_user_id, member_user_id, appointment_date, appointment_time, work_hours, status)
+    VALUES (:caregiver_user_id, :member_user_id, :appointment_date, :appointment_time, :work_hours, :status)
+""")
+
+UPDATE_APPOINTMENT = statement_registry.register('update_appointment', """
+    UPDATE appointment
+    SET caregiver_user_id = :caregiver_user_id, member_user_id = :member_user_id,
+        appointment_date = :appointment_date, appointment_time = :appointment_time,
+        work_hours = :work_hours, status = :status
+    WHERE appointment_id = :appointment_id
+""")
+
+SELECT_APPOINTMENT = statement_registry.register('select_appointment', 'SELECT * FROM appointment WHERE appointment_id = :appointment_id')
+
+DELETE_APPOINTMENT = statement_registry.register('delete_appointment', 'DELETE FROM appointment WHERE appointment_id = :appointment_id')
+
+
 @app.route('/appointments')
+@conditional('appointment', 'caregiver', 'member', 'user')
 def list_appointments():
-    """List all appointments"""
-    session = get_session()
-    try:
-        query = text("""
-            SELECT a.*,
-                   u_cg.given_name || ' ' || u_cg.surname AS caregiver_name,
-                   u_m.given_name || ' ' || u_m.surname AS member_name
-            FROM appointment a
-            JOIN caregiver c ON a.caregiver_user_id = c.caregiver_user_id
-            JOIN "user" u_cg ON c.caregiver_user_id = u_cg.user_id
-            JOIN member m ON a.member_user_id = m.member_user_id
-            JOIN "user" u_m ON m.member_user_id = u_m.user_id
-            ORDER BY a.appointment_date DESC, a.appointment_time
-        """)
-        result = session.execute(query)
-        appointments = [dict(row._mapping) for row in result]
-        return render_template('appointments/list.html', appointments=appointments)
-    except Exception as e:
-        flash(f'Error: {e}', 'error')
-        return render_template('appointments/list.html', appointments=[])
-    finally:
-        session.close()
+    """List appointments, newest date first, one page at a time (or all of them with ?stream=1)"""
+    return render_list(APPOINTMENT_LIST)
 
 
 @app.route('/appointments/create', methods=['GET', 'POST'])
@@ -1370,11 +2076,7 @@ def create_appointment():
     session = get_session()
     if request.method == 'POST':
         try:
-            query = text("""
-                INSERT INTO appointment (caregiver_user_id, member_user_id, appointment_date, appointment_time, work_hours, status)
-                VALUES (:caregiver_user_id, :member_user_id, :appointment_date, :appointment_time, :work_hours, :status)
-            """)
-            session.execute(query, {
+            INSERT_APPOINTMENT.execute(session, {
                 'caregiver_user_id': int(request.form['caregiver_user_id']),
                 'member_user_id': int(request.form['member_user_id']),
                 'appointment_date': request.form['appointment_date'],
@@ -1383,30 +2085,22 @@ def create_appointment():
                 'status': request.form.get('status', 'pending')
             })
             session.commit()
+            table_changed('appointment')
             flash('Appointment created successfully!', 'success')
             return redirect(url_for('list_appointments'))
         except Exception as e:
             session.rollback()
-            flash(f'Error creating appointment: {e}', 'error')
+            if getattr(getattr(e, 'orig', None), 'pgcode', None) == EXCLUSION_VIOLATION:
+                flash('Error creating appointment: the caregiver already has an appointment at that time', 'error')
+            else:
+                flash(f'Error creating appointment: {e}', 'error')
         finally:
             session.close()
     
     # GET: Fetch caregivers and members for dropdowns
     try:
-        caregivers_query = text("""
-            SELECT c.caregiver_user_id, u.given_name || ' ' || u.surname AS name
-            FROM caregiver c
-            JOIN "user" u ON c.caregiver_user_id = u.user_id
-            ORDER BY u.surname
-        """)
-        members_query = text("""
-            SELECT m.member_user_id, u.given_name || ' ' || u.surname AS name
-            FROM member m
-            JOIN "user" u ON m.member_user_id = u.user_id
-            ORDER BY u.surname
-        """)
-        caregivers = [dict(row._mapping) for row in session.execute(caregivers_query)]
-        members = [dict(row._mapping) for row in session.execute(members_query)]
+        caregivers = caregiver_options(session)
+        members = member_options(session)
         return render_template('appointments/create.html', caregivers=caregivers, members=members)
     except Exception as e:
         flash(f'Error: {e}', 'error')
@@ -1416,19 +2110,13 @@ def create_appointment():
 
 
 @app.route('/appointments/<int:appointment_id>/update', methods=['GET', 'POST'])
+@conditional('appointment', 'caregiver', 'member', 'user', replica=False)
 def update_appointment(appointment_id):
     """Update an appointment"""
     session = get_session()
     if request.method == 'POST':
         try:
-            query = text("""
-                UPDATE appointment
-                SET caregiver_user_id = :caregiver_user_id, member_user_id = :member_user_id,
-                    appointment_date = :appointment_date, appointment_time = :appointment_time,
-                    work_hours = :work_hours, status = :status
-                WHERE appointment_id = :appointment_id
-            """)
-            session.execute(query, {
+            UPDATE_APPOINTMENT.execute(session, {
                 'appointment_id': appointment_id,
                 'caregiver_user_id': int(request.form['caregiver_user_id']),
                 'member_user_id': int(request.form['member_user_id']),
@@ -1438,35 +2126,26 @@ def update_appointment(appointment_id):
                 'status': request.form['status']
             })
             session.commit()
+            table_changed('appointment')
             flash('Appointment updated successfully!', 'success')
             return redirect(url_for('list_appointments'))
         except Exception as e:
             session.rollback()
-            flash(f'Error updating appointment: {e}', 'error')
+            if getattr(getattr(e, 'orig', None), 'pgcode', None) == EXCLUSION_VIOLATION:
+                flash('Error updating appointment: the caregiver already has an appointment at that time', 'error')
+            else:
+                flash(f'Error updating appointment: {e}', 'error')
         finally:
             session.close()
     
     # GET: Fetch appointment data
     try:
-        query = text("SELECT * FROM appointment WHERE appointment_id = :appointment_id")
-        result = session.execute(query, {'appointment_id': appointment_id})
+        result = SELECT_APPOINTMENT.execute(session, {'appointment_id': appointment_id})
         appointment = dict(result.fetchone()._mapping)
         
         # Get caregivers and members for dropdowns
-        caregivers_query = text("""
-            SELECT c.caregiver_user_id, u.given_name || ' ' || u.surname AS name
-            FROM caregiver c
-            JOIN "user" u ON c.caregiver_user_id = u.user_id
-            ORDER BY u.surname
-        """)
-        members_query = text("""
-            SELECT m.member_user_id, u.given_name || ' ' || u.surname AS name
-            FROM member m
-            JOIN "user" u ON m.member_user_id = u.user_id
-            ORDER BY u.surname
-        """)
-        caregivers = [dict(row._mapping) for row in session.execute(caregivers_query)]
-        members = [dict(row._mapping) for row in session.execute(members_query)]
+        caregivers = caregiver_options(session)
+        members = member_options(session)
         
         return render_template('appointments/update.html', appointment=appointment, caregivers=caregivers, members=members)
     except Exception as e:
@@ -1481,9 +2160,9 @@ def delete_appointment(appointment_id):
     """Delete an appointment"""
     session = get_session()
     try:
-        query = text("DELETE FROM appointment WHERE appointment_id = :appointment_id")
-        session.execute(query, {'appointment_id': appointment_id})
+        DELETE_APPOINTMENT.execute(session, {'appointment_id': appointment_id})
         session.commit()
+        table_changed('appointment')
         flash('Appointment deleted successfully!', 'success')
     except Exception as e:
         session.rollback()
@@ -1493,6 +2172,440 @@ def delete_appointment(appointment_id):
     return redirect(url_for('list_appointments'))
 
 
+# ============================================================================
+# SEARCH
+# ============================================================================
+
+# Search scopes: the matching query (filtered by :q against the GIN-indexed
+# search_vector) and its id column, used as the tie-breaker after rank.
+# House rules are matched as a phrase with the 'simple' config so that
+# "No pets" does not also find "Pets allowed".
+SEARCH_SCOPES = {
+    'jobs': ("""
+        SELECT j.job_id, j.required_caregiving_type, j.other_requirements, j.date_posted,
+               u.given_name || ' ' || u.surname AS member_name,
+               ROUND(CAST(ts_rank(j.search_vector, q) AS NUMERIC), 6) AS rank
+        FROM job j
+        JOIN "user" u ON j.member_user_id = u.user_id
+        CROSS JOIN websearch_to_tsquery('english', :q) AS q
+        WHERE j.search_vector @@ q
+    """, 'job_id'),
+    'members': ("""
+        SELECT m.member_user_id, m.house_rules, m.dependent_description,
+               u.given_name || ' ' || u.surname AS member_name, u.city,
+               ROUND(CAST(ts_rank(m.search_vector, q) AS NUMERIC), 6) AS rank
+        FROM member m
+        JOIN "user" u ON m.member_user_id = u.user_id
+        CROSS JOIN phraseto_tsquery('simple', :q) AS q
+        WHERE m.search_vector @@ q
+    """, 'member_user_id'),
+    'users': ("""
+        SELECT u.user_id, u.given_name || ' ' || u.surname AS name, u.email, u.city, u.profile_description,
+               ROUND(CAST(ts_rank(u.search_vector, q) AS NUMERIC), 6) AS rank
+        FROM "user" u
+        CROSS JOIN websearch_to_tsquery('english', :q) AS q
+        WHERE u.search_vector @@ q
+    """, 'user_id'),
+}
+
+
+def search_request():
+    """q, scope, and the query and seek keys of a /search request (query is None without q)"""
+    q = request.args.get('q', '').strip()
+    scope = request.args.get('scope', 'jobs')
+    if scope not in SEARCH_SCOPES:
+        scope = 'jobs'
+    if not q:
+        return q, scope, None, None
+
+    sql, id_column = SEARCH_SCOPES[scope]
+    query = f"SELECT * FROM ({sql}) AS results"
+    # The rank is rounded in SQL so the value in a page cursor compares exactly
+    keys = (
+        SeekKey('results.rank', 'rank', parse=float, descending=True),
+        SeekKey(f'results.{id_column}', id_column, descending=True),
+    )
+    return q, scope, query, keys
+
+
+@app.route('/search')
+@conditional('job', 'member', 'user')
+def search():
+    """Ranked full-text search over job requirements, house rules or user profiles"""
+    q, scope, query, keys = search_request()
+    if not query:
+        return render_template('search.html', q=q, scope=scope, results=[], page=None)
+
+    session = get_session(read_only=True)
+    try:
+        page = paginate(session, query, keys, params={'q': q})
+        return render_template('search.html', q=q, scope=scope, results=page.rows, page=page)
+    except Exception as e:
+        flash(f'Error: {e}', 'error')
+        return render_template('search.html', q=q, scope=scope, results=[], page=None)
+    finally:
+        session.close()
+
+
+# ============================================================================
+# JSON API
+# ============================================================================
+
+class ApiResource:
+    """A read-only JSON view of one table for /api/v1"""
+
+    def __init__(self, source, fields, keys, id_fields, default_exclude=()):
+        self.source = source                    # FROM clause
+        self.fields = fields                    # public field name -> SQL expression
+        self.keys = keys                        # seek keys for pagination
+        self.id_fields = id_fields              # fields that make up the id in /api/v1/<name>/<id>
+        self.default_exclude = default_exclude  # large fields left out unless asked for in ?fields=
+
+    def parse_id(self, value):
+        """'12' or, for composite ids, '12-7' -> tuple of ints"""
+        parts = value.split('-')
+        if len(parts) != len(self.id_fields) or not all(part.isdigit() for part in parts):
+            raise ValueError(f"Invalid id: {value}")
+        return tuple(int(part) for part in parts)
+
+    def select(self, names):
+        columns = ', '.join(f"{self.fields[name]} AS {name}" for name in names)
+        return f"SELECT {columns} FROM {self.source}"
+
+
+# Passwords are never exposed through the API
+API_RESOURCES = {
+    'users': ApiResource(
+        '"user" u',
+        {'user_id': 'u.user_id', 'email': 'u.email', 'given_name': 'u.given_name', 'surname': 'u.surname',
+         'city': 'u.city', 'phone_number': 'u.phone_number', 'profile_description': 'u.profile_description'},
+        (SeekKey('u.user_id', 'user_id'),), ('user_id',), ('profile_description',),
+    ),
+    'caregivers': ApiResource(
+        'caregiver c JOIN "user" u ON c.caregiver_user_id = u.user_id',
+        {'caregiver_user_id': 'c.caregiver_user_id', 'email': 'u.email', 'given_name': 'u.given_name',
+         'surname': 'u.surname', 'city': 'c.city', 'phone_number': 'u.phone_number',
+         'profile_description': 'u.profile_description', 'photo': 'c.photo', 'gender': 'c.gender',
+         'caregiving_type': 'c.caregiving_type', 'hourly_rate': 'c.hourly_rate'},
+        (SeekKey('c.caregiver_user_id', 'caregiver_user_id'),), ('caregiver_user_id',), ('profile_description',),
+    ),
+    'members': ApiResource(
+        'member m JOIN "user" u ON m.member_user_id = u.user_id',
+        {'member_user_id': 'm.member_user_id', 'email': 'u.email', 'given_name': 'u.given_name',
+         'surname': 'u.surname', 'city': 'u.city', 'phone_number': 'u.phone_number',
+         'profile_description': 'u.profile_description', 'house_rules': 'm.house_rules',
+         'dependent_description': 'm.dependent_description'},
+        (SeekKey('m.member_user_id', 'member_user_id'),), ('member_user_id',), ('profile_description',),
+    ),
+    'addresses': ApiResource(
+        'address a',
+        {'member_user_id': 'a.member_user_id', 'house_number': 'a.house_number', 'street': 'a.street',
+         'town': 'a.town'},
+        (SeekKey('a.member_user_id', 'member_user_id'),), ('member_user_id',),
+    ),
+    'jobs': ApiResource(
+        'job j',
+        {'job_id': 'j.job_id', 'member_user_id': 'j.member_user_id',
+         'required_caregiving_type': 'j.required_caregiving_type', 'other_requirements': 'j.other_requirements',
+         'city': 'j.city', 'date_posted': 'j.date_posted'},
+        (SeekKey('j.job_id', 'job_id'),), ('job_id',),
+    ),
+    'job_applications': ApiResource(
+        'job_application ja',
+        {'caregiver_user_id': 'ja.caregiver_user_id', 'job_id': 'ja.job_id', 'date_applied': 'ja.date_applied'},
+        (SeekKey('ja.caregiver_user_id', 'caregiver_user_id'), SeekKey('ja.job_id', 'job_id')),
+        ('caregiver_user_id', 'job_id'),
+    ),
+    'appointments': ApiResource(
+        'appointment a',
+        {'appointment_id': 'a.appointment_id', 'caregiver_user_id': 'a.caregiver_user_id',
+         'member_user_id': 'a.member_user_id', 'appointment_date': 'a.appointment_date',
+         'appointment_time': 'a.appointment_time', 'work_hours': 'a.work_hours', 'status': 'a.status'},
+        (SeekKey('a.appointment_id', 'appointment_id'),), ('appointment_id',),
+    ),
+}
+
+
+# Tables read by each resource, for conditional GET
+API_TABLES = {
+    'users': ('user',),
+    'caregivers': ('caregiver', 'user'),
+    'members': ('member', 'user'),
+    'addresses': ('address',),
+    'jobs': ('job',),
+    'job_applications': ('job_application',),
+    'appointments': ('appointment',),
+}
+
+
+def api_tables(name, **kwargs):
+    return API_TABLES.get(name, ())
+
+
+def _api_fields(resource):
+    """Fields requested with ?fields=a,b (default: all but the large ones)"""
+    requested = request.args.get('fields')
+    if not requested:
+        return [name for name in resource.fields if name not in resource.default_exclude]
+    names = [name.strip() for name in requested.split(',') if name.strip()]
+    unknown = [name for name in names if name not in resource.fields]
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(unknown)}")
+    return names
+
+
+def _api_value(value):
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def _api_row(row, names):
+    return {name: _api_value(row[name]) for name in names}
+
+
+def _id_condition(resource, ids):
+    """WHERE condition and params matching a list of parsed ids"""
+    params = {f'id_{i}': [value[i] for value in ids] for i in range(len(resource.id_fields))}
+    if len(resource.id_fields) == 1:
+        return f"{resource.fields[resource.id_fields[0]]} = ANY(:id_0)", params
+    columns = ', '.join(resource.fields[name] for name in resource.id_fields)
+    arrays = ', '.join(f"CAST(:id_{i} AS INTEGER[])" for i in range(len(resource.id_fields)))
+    return f"({columns}) IN (SELECT * FROM unnest({arrays}))", params
+
+
+@app.route('/api/v1/<name>')
+@conditional(api_tables)
+def api_list(name):
+    """
+    List a resource as JSON, one keyset page at a time, or fetch a batch with
+    ?ids=1,2,3 (composite ids as caregiver_user_id-job_id).
+    """
+    resource = API_RESOURCES.get(name)
+    if not resource:
+        return jsonify(error=f'Unknown resource: {name}'), 404
+    session = get_session(read_only=True)
+    try:
+        names = _api_fields(resource)
+        # Seek keys are always selected so cursors can be built, then dropped if not asked for
+        selected = names + [key.name for key in resource.keys if key.name not in names]
+        query = resource.select(selected)
+
+        if request.args.get('ids'):
+            ids = [resource.parse_id(value) for value in request.args['ids'].split(',') if value]
+            if len(ids) > MAX_PAGE_SIZE:
+                return jsonify(error=f'At most {MAX_PAGE_SIZE} ids per request'), 400
+            condition, params = _id_condition(resource, ids)
+            statement = statement_registry.adhoc('api_ids', _ordered_query(query, resource.keys, [condition]))
+            rows = statement.execute(session, params).mappings()
+            return jsonify(data=[_api_row(row, names) for row in rows])
+
+        page = paginate(session, query, resource.keys)
+        return jsonify(data=[_api_row(row, names) for row in page.rows], next=page.next_url, prev=page.prev_url)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    except Exception as e:
+        return jsonify(error=str(e)), 500
+    finally:
+        session.close()
+
+
+@app.route('/api/v1/<name>/<item_id>')
+@conditional(api_tables)
+def api_get(name, item_id):
+    """Fetch one row of a resource as JSON"""
+    resource = API_RESOURCES.get(name)
+    if not resource:
+        return jsonify(error=f'Unknown resource: {name}'), 404
+    session = get_session(read_only=True)
+    try:
+        names = _api_fields(resource)
+        condition, params = _id_condition(resource, [resource.parse_id(item_id)])
+        statement = statement_registry.adhoc('api_get', f"{resource.select(names)} WHERE {condition}")
+        row = statement.execute(session, params).mappings().first()
+        if not row:
+            return jsonify(error=f'{name} {item_id} not found'), 404
+        return jsonify(data=_api_row(row, names))
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    except Exception as e:
+        return jsonify(error=str(e)), 500
+    finally:
+        session.close()
+
+
+# ============================================================================
+# BULK IMPORT
+# ============================================================================
+
+# Tables written by each import kind, for table_changed()
+IMPORT_TABLES = {
+    'users': ('user',),
+    'caregivers': ('user', 'caregiver'),
+    'members': ('user', 'member'),
+}
+
+
+def run_import(kind, stream, fmt, batch_size=bulk_import.BATCH_SIZE):
+    """Import a binary CSV/NDJSON stream and return the summary"""
+    schema_readiness.ensure()
+    rows = bulk_import.read_rows(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''), fmt)
+    summary = bulk_import.import_rows(engine, kind, rows, batch_size)
+    if summary['inserted']:
+        table_changed(*IMPORT_TABLES[kind])
+    return summary
+
+
+@app.route('/import/<kind>', methods=['POST'])
+def import_data(kind):
+    """Bulk import users, caregivers or members from a CSV or NDJSON upload"""
+    if kind not in bulk_import.KINDS:
+        return jsonify(error=f'Unknown import kind: {kind}'), 404
+
+    upload = request.files.get('file')
+    if upload:
+        stream, filename, content_type = upload.stream, upload.filename, upload.content_type
+    else:
+        stream, filename, content_type = io.BufferedReader(request.stream), None, request.content_type
+    fmt = request.args.get('format') or bulk_import.detect_format(filename, content_type)
+    if fmt not in bulk_import.FORMATS:
+        return jsonify(error=f'Unsupported format: {fmt}'), 400
+
+    try:
+        return jsonify(run_import(kind, stream, fmt))
+    except Exception as e:
+        return jsonify(error=str(e)), 500
+
+
+@app.cli.command('import')
+@click.argument('kind', type=click.Choice(bulk_import.KINDS))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(bulk_import.FORMATS), help='Defaults to the file extension.')
+@click.option('--batch-size', default=bulk_import.BATCH_SIZE, show_default=True)
+def import_command(kind, path, fmt, batch_size):
+    """Bulk import users, caregivers or members from a CSV or NDJSON file"""
+    with open(path, 'rb') as f:
+        summary = run_import(kind, f, fmt or bulk_import.detect_format(path), batch_size)
+    for error in summary['errors']:
+        click.echo(f"line {error['line']} ({error['email']}): {error['error']}", err=True)
+    click.echo(f"Imported {summary['inserted']} of {summary['received']} {kind}, {len(summary['errors'])} errors")
+
+
+# ============================================================================
+# EXPORT
+# ============================================================================
+
+def export_source(name):
+    """SQL for an export: a JSON API table (users, appointments, ...) or a part2 report (report-6.2)"""
+    if name.startswith('report-'):
+        import part2_queries
+        report = part2_queries.REPORTS.get(name[len('report-'):])
+        return report[1].strip().rstrip(';') if report else None
+    resource = API_RESOURCES.get(name)
+    if not resource:
+        return None
+    return _ordered_query(resource.select(list(resource.fields)), resource.keys, [])
+
+
+def export_rows(sql, fmt):
+    """Yield the export of sql as bytes, read from a server-side cursor batch by batch"""
+    session = get_session(read_only=True)
+    try:
+        result = session.execute(text(sql), execution_options={'yield_per': export.BATCH_SIZE})
+        yield from export.export_result(result, fmt)
+    except Exception as e:
+        print(f"Error exporting: {e}")
+        raise
+    finally:
+        session.close()
+
+
+@app.route('/export/<name>')
+def export_data(name):
+    """Download a table or report as CSV, NDJSON or Parquet (?format=)"""
+    sql = export_source(name)
+    if sql is None:
+        return jsonify(error=f'Unknown table or report: {name}'), 404
+    fmt = request.args.get('format', 'csv')
+    try:
+        export.check_format(fmt)
+    except (ValueError, RuntimeError) as e:
+        return jsonify(error=str(e)), 400
+    return Response(
+        stream_with_context(export_rows(sql, fmt)),
+        mimetype=export.MIMETYPES[fmt],
+        headers={'Content-Disposition': f'attachment; filename="{name}.{fmt}"'},
+    )
+
+
+@app.cli.command('export')
+@click.argument('name')
+@click.argument('output', type=click.File('wb'))
+@click.option('--format', 'fmt', type=click.Choice(export.FORMATS), help='Defaults to the file extension.')
+def export_command(name, output, fmt):
+    """Export a table (users, appointments, ...) or a part2 report (report-6.2) to a file, or - for stdout"""
+    sql = export_source(name)
+    if sql is None:
+        raise click.BadParameter(f'Unknown table or report: {name}', param_hint='NAME')
+    fmt = fmt or export.detect_format(output.name)
+    written = 0
+    for chunk in export_rows(sql, fmt):
+        output.write(chunk)
+        written += len(chunk)
+    click.echo(f"Exported {name} as {fmt}, {written} bytes", err=True)
+
+
+# ============================================================================
+# EARNINGS REPORTS
+# ============================================================================
+
+@app.cli.command('rebuild-earnings')
+def rebuild_earnings_command():
+    """Recompute the caregiver_earnings running totals from the appointment table"""
+    with engine.begin() as conn:
+        # Block appointment writes while the totals are rebuilt so no trigger delta is lost
+        conn.execute(text("LOCK TABLE appointment, caregiver IN SHARE MODE"))
+        conn.execute(text("DELETE FROM caregiver_earnings"))
+        result = conn.execute(text("""
+            INSERT INTO caregiver_earnings (caregiver_user_id, confirmed_appointments, confirmed_hours, earnings)
+            SELECT a.caregiver_user_id, COUNT(*), SUM(a.work_hours), SUM(a.work_hours * c.hourly_rate)
+            FROM appointment a
+            JOIN caregiver c ON a.caregiver_user_id = c.caregiver_user_id
+            WHERE a.status = 'confirmed'
+            GROUP BY a.caregiver_user_id
+        """))
+    click.echo(f"Rebuilt earnings for {result.rowcount} caregivers")
+
+
+# ============================================================================
+# SCHEMA MIGRATIONS
+# ============================================================================
+
+@app.cli.command('migrate')
+@click.option('--target', type=int, help='Stop at this version instead of the newest one.')
+@click.option('--dry-run', is_flag=True, help='Only list the migrations that would be applied.')
+@click.option('--sample-data', is_flag=True, help='Load insert_data.sql afterwards if there are no users.')
+def migrate_command(target, dry_run, sample_data):
+    """Apply pending schema migrations (run once per deploy)"""
+    pending = migrate.migrate(engine, target=target, dry_run=dry_run)
+    if dry_run:
+        for migration in pending:
+            click.echo(f"Pending: {migration}")
+        click.echo(f"{len(pending)} pending migration(s)")
+        return
+    if pending:
+        click.echo(f"Applied {len(pending)} migration(s), schema is at version {pending[-1].version}")
+    else:
+        click.echo("Schema is already up to date")
+    if sample_data:
+        if migrate.load_sample_data(engine):
+            click.echo("Sample data inserted")
+        else:
+            click.echo("Database already has users, skipping sample data")
+
+
 if __name__ == '__main__':
     port = int(os.getenv('PORT', 5000))
     app.run(debug=False, host='0.0.0.0', port=port)
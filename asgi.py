@@ -0,0 +1,243 @@
+"""
+Async serving mode for the Online Caregivers Platform.
+
+An ASGI entry point that answers the read-heavy list and search pages on an
+async SQLAlchemy engine (psycopg 3), so one process keeps many requests in
+flight while they wait on PostgreSQL. The queries, pagination, conditional
+GET and templates are the ones defined in app.py; only the database calls
+are awaited here. Every other request (forms, writes, ?stream=1, the API)
+is handed to the regular Flask WSGI app, which runs in a thread pool.
+
+    uvicorn asgi:application --host 0.0.0.0 --port $PORT
+    gunicorn asgi:application -k uvicorn.workers.UvicornWorker
+"""
+
+import asyncio
+import os
+
+from asgiref.wsgi import WsgiToAsgi
+from flask import flash, jsonify, render_template, request
+from sqlalchemy import event, exc, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from werkzeug.datastructures import Headers
+from werkzeug.test import EnvironBuilder
+
+import app
+
+flask_app = app.app
+
+# Same database as the WSGI app, through psycopg 3's asyncio support
+ASYNC_DATABASE_URL = app.DATABASE_URL.replace('postgresql://', 'postgresql+psycopg://', 1)
+
+# Requests in flight per process are bounded by this pool rather than by worker count
+ASYNC_DB_POOL_SIZE = int(os.getenv('ASYNC_DB_POOL_SIZE', '20'))
+
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    echo=False,
+    pool_size=ASYNC_DB_POOL_SIZE,
+    max_overflow=app.DB_MAX_OVERFLOW,
+    pool_timeout=app.DB_POOL_TIMEOUT,
+    pool_recycle=app.DB_POOL_RECYCLE,
+    pool_pre_ping=app.DB_POOL_PRE_PING == 'always',
+)
+
+# Async engines for the replicas in app.replica_set, by replica index
+async_replica_engines = [
+    create_async_engine(
+        replica.engine.url.set(drivername='postgresql+psycopg'),
+        echo=False,
+        pool_size=ASYNC_DB_POOL_SIZE,
+        max_overflow=app.DB_MAX_OVERFLOW,
+        pool_timeout=app.DB_POOL_TIMEOUT,
+        pool_recycle=app.DB_POOL_RECYCLE,
+        pool_pre_ping=app.DB_POOL_PRE_PING != 'never',
+        connect_args={'connect_timeout': app.replicas.REPLICA_CONNECT_TIMEOUT},
+    )
+    for replica in app.replica_set.replicas
+]
+
+
+async def read_engine():
+    """Async engine for this request's reads, following app.read_replica()"""
+    if not app.replica_set:
+        return async_engine
+    # The lag check behind read_replica() is a blocking query that can wait
+    # REPLICA_CONNECT_TIMEOUT on an unreachable replica, so it runs in a
+    # thread (which sees this request's context) instead of on the event loop
+    replica = await asyncio.to_thread(app.read_replica)
+    return async_replica_engines[replica.index] if replica else async_engine
+
+
+# Per-route query counts and database time in /metrics cover async requests too
+event.listen(async_engine.sync_engine, 'before_cursor_execute', app._start_statement_timer)
+event.listen(async_engine.sync_engine, 'after_cursor_execute', app._record_statement_time)
+event.listen(async_engine.sync_engine, 'handle_error', app._discard_statement_timer)
+for replica_engine in async_replica_engines:
+    event.listen(replica_engine.sync_engine, 'before_cursor_execute', app._start_statement_timer)
+    event.listen(replica_engine.sync_engine, 'after_cursor_execute', app._record_statement_time)
+    event.listen(replica_engine.sync_engine, 'handle_error', app._discard_statement_timer)
+
+wsgi_application = WsgiToAsgi(flask_app)
+
+
+# ============================================================================
+# ASYNC VIEWS
+# ============================================================================
+
+async def paginate(conn, query, keys, where=None, params=None):
+    """Async counterpart of app.paginate()"""
+    page_request = app.PageRequest(query, keys, where, params)
+    result = await conn.execute(text(page_request.sql), page_request.params)
+    return page_request.page([dict(row._mapping) for row in result])
+
+
+def list_view(listing):
+    """Async view rendering one page of an app.ListPage"""
+    async def view():
+        try:
+            async with (await read_engine()).connect() as conn:
+                page = await paginate(conn, listing.query, listing.keys)
+        except Exception as e:
+            return listing.render_error(e)
+        return listing.render(page)
+    return view
+
+
+async def search_caregivers():
+    """Async /caregivers/search"""
+    try:
+        query, keys, conditions, params = app.caregiver_search_request()
+        async with (await read_engine()).connect() as conn:
+            page = await paginate(conn, query, keys, where=conditions, params=params)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    except Exception as e:
+        return jsonify(error=str(e)), 500
+    return jsonify(caregivers=page.rows, next=page.next_url, prev=page.prev_url)
+
+
+async def search():
+    """Async /search"""
+    q, scope, query, keys = app.search_request()
+    if not query:
+        return render_template('search.html', q=q, scope=scope, results=[], page=None)
+    try:
+        async with (await read_engine()).connect() as conn:
+            page = await paginate(conn, query, keys, params={'q': q})
+    except Exception as e:
+        flash(f'Error: {e}', 'error')
+        return render_template('search.html', q=q, scope=scope, results=[], page=None)
+    return render_template('search.html', q=q, scope=scope, results=page.rows, page=page)
+
+
+# Flask endpoint -> async view answering GETs of the same URLs
+ASYNC_VIEWS = {
+    'list_users': list_view(app.USER_LIST),
+    'list_caregivers': list_view(app.CAREGIVER_LIST),
+    'list_members': list_view(app.MEMBER_LIST),
+    'list_addresses': list_view(app.ADDRESS_LIST),
+    'list_jobs': list_view(app.JOB_LIST),
+    'list_job_applications': list_view(app.JOB_APPLICATION_LIST),
+    'list_appointments': list_view(app.APPOINTMENT_LIST),
+    'search_caregivers': search_caregivers,
+    'search': search,
+}
+
+
+async def conditional(view, view_args):
+    """Async counterpart of app.conditional(), using the tables declared on the WSGI view"""
+    tables = getattr(flask_app.view_functions[request.endpoint], 'cached_tables', None)
+    names = app.cached_tables(tables, view_args) if tables else ()
+    if not names:
+        return await view(**view_args)
+    try:
+        async with (await read_engine()).connect() as conn:
+            result = await conn.execute(text(app.TABLE_VERSIONS_QUERY), {'tables': names})
+            versions = {row.table_name: (row.version, row.modified_at) for row in result}
+    except exc.DBAPIError as e:
+        print(f"Error reading table versions: {e}")
+        return await view(**view_args)
+
+    etag, last_modified = app.cache_validators(versions)
+    response = app.not_modified(etag, last_modified)
+    if response is None:
+        response = app.add_validators(flask_app.make_response(await view(**view_args)), etag, last_modified)
+    return response
+
+
+# ============================================================================
+# ASGI APPLICATION
+# ============================================================================
+
+def _environ(scope):
+    """WSGI environ for an ASGI HTTP scope, so Flask's request context works unchanged"""
+    headers = Headers([(name.decode('latin-1'), value.decode('latin-1')) for name, value in scope['headers']])
+    host = headers.get('Host')
+    if not host and scope.get('server'):
+        host = '%s:%s' % scope['server']
+    builder = EnvironBuilder(
+        path=scope['path'],
+        base_url=f"{scope.get('scheme', 'http')}://{host or 'localhost'}{scope.get('root_path', '')}",
+        query_string=scope['query_string'].decode('latin-1'),
+        method=scope['method'],
+        headers=headers,
+    )
+    environ = builder.get_environ()
+    if scope.get('client'):
+        environ['REMOTE_ADDR'] = scope['client'][0]
+    return environ
+
+
+async def _dispatch(view):
+    """Run an async view the way Flask's full_dispatch_request runs a sync one"""
+    try:
+        try:
+            rv = flask_app.preprocess_request()
+            if rv is None:
+                rv = await conditional(view, request.view_args or {})
+        except Exception as e:
+            rv = flask_app.handle_user_exception(e)
+        return flask_app.finalize_request(rv)
+    except Exception as e:
+        return flask_app.handle_exception(e)
+
+
+async def _send(response, send, method):
+    headers = [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in response.headers.items()]
+    await send({'type': 'http.response.start', 'status': response.status_code, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': b'' if method == 'HEAD' else response.get_data()})
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            # Blocking, once per process, before any request is accepted
+            await asyncio.to_thread(app.schema_readiness.ensure)
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await async_engine.dispose()
+            for replica_engine in async_replica_engines:
+                await replica_engine.dispose()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    """ASGI entry point"""
+    if scope['type'] == 'lifespan':
+        await _lifespan(receive, send)
+        return
+
+    if scope['type'] == 'http' and scope['method'] in ('GET', 'HEAD'):
+        response = None
+        with flask_app.request_context(_environ(scope)):
+            view = ASYNC_VIEWS.get(request.endpoint)
+            if view and not app.wants_stream():
+                response = await _dispatch(view)
+        if response is not None:
+            await _send(response, send, scope['method'])
+            return
+
+    await wsgi_application(scope, receive, send)
@@ -0,0 +1,305 @@
+"""
+HTTP load benchmark for the Online Caregivers Platform.
+
+Boots the Flask app in-process (or targets an already running server with
+--url), optionally loads a generated dataset, then drives concurrent load at every
+list, form and create/update/delete route. Reports p50/p95/p99 latency and
+throughput per route so changes to app.py can be compared run to run.
+
+Usage:
+    python benchmark.py --generate-users 10000 --requests 200 --concurrency 8
+    python benchmark.py --url http://127.0.0.1:8000 --json bench.json
+"""
+
+import argparse
+import http.client
+import json
+import math
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from urllib.parse import urlencode, urlsplit
+
+from sqlalchemy import text
+
+import app as webapp
+import generate_data
+
+
+# Statuses that count as success; the write routes redirect on success and
+# re-render the form (200) when the database rejected the change
+GET_OK = (200,)
+POST_OK = (302,)
+
+
+class Client:
+    """Keep-alive HTTP connections, one per worker thread"""
+
+    def __init__(self, base_url):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self._local = threading.local()
+
+    def request(self, method, path, form=None):
+        body = urlencode(form) if form is not None else None
+        headers = {'Content-Type': 'application/x-www-form-urlencoded'} if body is not None else {}
+        for attempt in range(2):
+            conn = getattr(self._local, 'conn', None)
+            if conn is None:
+                conn = self._local.conn = http.client.HTTPConnection(self.host, self.port, timeout=60)
+            try:
+                start = time.perf_counter()
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                return response.status, time.perf_counter() - start
+            except (http.client.HTTPException, ConnectionError):
+                conn.close()
+                self._local.conn = None
+                if attempt:
+                    raise
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def run_route(client, label, calls, concurrency, expected):
+    """Issue every (method, path, form) call with `concurrency` workers and summarize"""
+    def issue(call):
+        try:
+            status, seconds = client.request(*call)
+            return seconds, status in expected
+        except Exception:
+            return 0.0, False
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(issue, calls))
+    wall = time.perf_counter() - start
+
+    latencies = sorted(seconds for seconds, ok in results if ok)
+    result = {
+        'route': label,
+        'requests': len(calls),
+        'errors': sum(1 for _, ok in results if not ok),
+        'throughput_rps': round(len(calls) / wall, 1) if wall else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+    }
+    print(f"{label:<48} {result['requests']:>6} {result['errors']:>6} {result['throughput_rps']:>9} "
+          f"{result['p50_ms']:>9} {result['p95_ms']:>9} {result['p99_ms']:>9}")
+    return result
+
+
+def fetch_ids(engine, sql, params):
+    with engine.connect() as conn:
+        return [row[0] for row in conn.execute(text(sql), params)]
+
+
+def user_form(tag, i, **extra):
+    form = {
+        'email': f'{tag}-{i}@bench.local', 'given_name': 'Bench', 'surname': f'{tag}-{i}',
+        'city': 'Astana', 'phone_number': '+77000000000', 'profile_description': 'Benchmark user',
+        'password': 'pass123',
+    }
+    form.update(extra)
+    return form
+
+
+def build_scenarios(engine, n, run_id):
+    """
+    Yield (label, calls, expected statuses) for every route.
+
+    Write scenarios create their own rows tagged with run_id, update them and
+    finally delete them, so repeated runs keep the data volume constant.
+    """
+    def ids(sql, **params):
+        return fetch_ids(engine, sql, params)
+
+    def tagged_users(kind):
+        """Ids of the users this run created, ordered by the index in their email"""
+        return ids("""
+            SELECT user_id FROM "user" WHERE email LIKE :pattern
+            ORDER BY CAST(split_part(split_part(email, '@', 1), '-', 3) AS INTEGER)
+        """, pattern=f'{run_id}-{kind}-%')
+
+    any_user = ids('SELECT user_id FROM "user" ORDER BY user_id LIMIT 1')
+    any_job = ids('SELECT job_id FROM job ORDER BY job_id LIMIT 1')
+    any_appointment = ids('SELECT appointment_id FROM appointment ORDER BY appointment_id LIMIT 1')
+    any_caregiver = ids('SELECT caregiver_user_id FROM caregiver ORDER BY caregiver_user_id LIMIT 1')
+    any_member = ids('SELECT member_user_id FROM member ORDER BY member_user_id LIMIT 1')
+    any_address = ids('SELECT member_user_id FROM address ORDER BY member_user_id LIMIT 1')
+
+    # Read-only pages
+    for path in ('/', '/users', '/caregivers', '/members', '/addresses', '/jobs',
+                 '/job_applications', '/appointments'):
+        yield f'GET {path}', [('GET', path, None)] * n, GET_OK
+    for path in ('/users/create', '/caregivers/create', '/members/create', '/addresses/create',
+                 '/jobs/create', '/job_applications/create', '/appointments/create'):
+        yield f'GET {path}', [('GET', path, None)] * n, GET_OK
+    for label, path, row in (
+        ('GET /users/<id>/update', '/users/{}/update', any_user),
+        ('GET /caregivers/<id>/update', '/caregivers/{}/update', any_caregiver),
+        ('GET /members/<id>/update', '/members/{}/update', any_member),
+        ('GET /addresses/<id>/update', '/addresses/{}/update', any_address),
+        ('GET /jobs/<id>/update', '/jobs/{}/update', any_job),
+        ('GET /appointments/<id>/update', '/appointments/{}/update', any_appointment),
+    ):
+        if row:
+            yield label, [('GET', path.format(row[0]), None)] * n, GET_OK
+
+    # Creates
+    yield 'POST /users/create', [
+        ('POST', '/users/create', user_form(f'{run_id}-user', i)) for i in range(n)
+    ], POST_OK
+    yield 'POST /caregivers/create', [
+        ('POST', '/caregivers/create', user_form(
+            f'{run_id}-caregiver', i, gender='Female', caregiving_type='babysitter', hourly_rate='15'
+        )) for i in range(n)
+    ], POST_OK
+    yield 'POST /members/create', [
+        ('POST', '/members/create', user_form(
+            f'{run_id}-member', i, house_rules='No pets.', dependent_description='Benchmark dependent'
+        )) for i in range(n)
+    ], POST_OK
+
+    users, caregivers, members = tagged_users('user'), tagged_users('caregiver'), tagged_users('member')
+    yield 'POST /addresses/create', [
+        ('POST', '/addresses/create', {'member_user_id': m, 'house_number': '1', 'street': 'Bench', 'town': 'Astana'})
+        for m in members
+    ], POST_OK
+    yield 'POST /jobs/create', [
+        ('POST', '/jobs/create', {'member_user_id': m, 'required_caregiving_type': 'babysitter',
+                                  'other_requirements': f'{run_id} benchmark job', 'date_posted': '2025-06-01'})
+        for m in members
+    ], POST_OK
+    jobs = ids('SELECT job_id FROM job WHERE other_requirements = :tag ORDER BY job_id', tag=f'{run_id} benchmark job')
+    yield 'POST /job_applications/create', [
+        ('POST', '/job_applications/create', {'caregiver_user_id': c, 'job_id': j, 'date_applied': '2025-06-02'})
+        for c, j in zip(caregivers, jobs)
+    ], POST_OK
+    # One appointment per caregiver on distinct days so no two bookings overlap
+    first_day = date(2030, 1, 1)
+    yield 'POST /appointments/create', [
+        ('POST', '/appointments/create', {
+            'caregiver_user_id': c, 'member_user_id': m, 'appointment_date': str(first_day + timedelta(days=i)),
+            'appointment_time': '09:00', 'work_hours': '2', 'status': 'pending'})
+        for i, (c, m) in enumerate(zip(caregivers, members))
+    ], POST_OK
+    # Day i belongs to caregivers[i], so date order lines each booking up with its own caregiver
+    appointments = ids('SELECT appointment_id FROM appointment WHERE caregiver_user_id = ANY(:ids) '
+                       'ORDER BY appointment_date', ids=caregivers)
+
+    # Updates
+    yield 'POST /users/<id>/update', [
+        ('POST', f'/users/{u}/update', user_form(f'{run_id}-user', i, city='Almaty')) for i, u in enumerate(users)
+    ], POST_OK
+    yield 'POST /caregivers/<id>/update', [
+        ('POST', f'/caregivers/{c}/update', user_form(
+            f'{run_id}-caregiver', i, gender='Female', caregiving_type='playmate', hourly_rate='16'
+        )) for i, c in enumerate(caregivers)
+    ], POST_OK
+    yield 'POST /members/<id>/update', [
+        ('POST', f'/members/{m}/update', user_form(
+            f'{run_id}-member', i, house_rules='Pets allowed.', dependent_description='Updated'
+        )) for i, m in enumerate(members)
+    ], POST_OK
+    yield 'POST /addresses/<id>/update', [
+        ('POST', f'/addresses/{m}/update', {'house_number': '2', 'street': 'Bench', 'town': 'Almaty'}) for m in members
+    ], POST_OK
+    yield 'POST /jobs/<id>/update', [
+        ('POST', f'/jobs/{j}/update', {'member_user_id': m, 'required_caregiving_type': 'playmate',
+                                       'other_requirements': f'{run_id} benchmark job', 'date_posted': '2025-06-03'})
+        for j, m in zip(jobs, members)
+    ], POST_OK
+    yield 'POST /appointments/<id>/update', [
+        ('POST', f'/appointments/{a}/update', {
+            'caregiver_user_id': c, 'member_user_id': m, 'appointment_date': str(first_day + timedelta(days=i)),
+            'appointment_time': '10:00', 'work_hours': '3', 'status': 'confirmed'})
+        for i, (a, c, m) in enumerate(zip(appointments, caregivers, members))
+    ], POST_OK
+
+    # Deletes, children first
+    yield 'POST /appointments/<id>/delete', [
+        ('POST', f'/appointments/{a}/delete', {}) for a in appointments
+    ], POST_OK
+    yield 'POST /job_applications/<id>/<id>/delete', [
+        ('POST', f'/job_applications/{c}/{j}/delete', {}) for c, j in zip(caregivers, jobs)
+    ], POST_OK
+    yield 'POST /jobs/<id>/delete', [('POST', f'/jobs/{j}/delete', {}) for j in jobs], POST_OK
+    yield 'POST /addresses/<id>/delete', [('POST', f'/addresses/{m}/delete', {}) for m in members], POST_OK
+    yield 'POST /members/<id>/delete', [('POST', f'/members/{m}/delete', {}) for m in members], POST_OK
+    yield 'POST /caregivers/<id>/delete', [('POST', f'/caregivers/{c}/delete', {}) for c in caregivers], POST_OK
+    yield 'POST /users/<id>/delete', [('POST', f'/users/{u}/delete', {}) for u in users], POST_OK
+
+
+def start_server(port):
+    """Serve the Flask app from a background thread"""
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server('127.0.0.1', port, webapp.app, threaded=True, request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_port}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='Benchmark a running server instead of booting the app in-process')
+    parser.add_argument('--port', type=int, default=0, help='Port for the in-process server (default: any free port)')
+    parser.add_argument('--generate-users', type=int, default=0,
+                        help='Replace all data with a generated dataset of this many users first')
+    parser.add_argument('--data-seed', type=int, default=341, help='Random seed for --generate-users')
+    parser.add_argument('--requests', type=int, default=100, help='Requests per route')
+    parser.add_argument('--concurrency', type=int, default=8, help='Concurrent clients')
+    parser.add_argument('--only', help='Only run routes whose label contains this text')
+    parser.add_argument('--json', help='Write the results to this file as JSON')
+    args = parser.parse_args()
+
+    if args.generate_users:
+        print(f"Generating {args.generate_users} users with seed {args.data_seed}...")
+        generate_data.generate(webapp.engine, args.generate_users, args.data_seed, truncate=True)
+
+    server = None
+    base_url = args.url
+    if not base_url:
+        server, base_url = start_server(args.port)
+    client = Client(base_url)
+    run_id = f'bench{uuid.uuid4().hex[:8]}'
+
+    print(f"Benchmarking {base_url}: {args.requests} requests per route, concurrency {args.concurrency}\n")
+    print(f"{'route':<48} {'reqs':>6} {'errors':>6} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    results = []
+    # Write scenarios depend on rows created by earlier ones, so --only skips
+    # the request but still walks the whole scenario list in order
+    for label, calls, expected in build_scenarios(webapp.engine, args.requests, run_id):
+        if args.only and args.only not in label:
+            if label.startswith('POST') and ('/create' in label or '/delete' in label):
+                for call in calls:
+                    client.request(*call)
+            continue
+        if calls:
+            results.append(run_route(client, label, calls, args.concurrency, expected))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'url': base_url, 'requests_per_route': args.requests,
+                       'concurrency': args.concurrency, 'results': results}, f, indent=2)
+    if server:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
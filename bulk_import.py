@@ -0,0 +1,228 @@
+"""
+Bulk import of users, caregivers and members.
+
+Rows are read from CSV or NDJSON, validated in Python, and loaded in batches
+with one multi-row INSERT ... RETURNING per batch. Caregiver and member rows
+are inserted together with their "user" row in the same statement. A row
+that fails validation or hits a duplicate email is reported with its line
+number, and the rest of the batch is still loaded.
+"""
+
+import csv
+import json
+from decimal import Decimal, InvalidOperation
+
+from sqlalchemy import text
+
+
+BATCH_SIZE = 1000
+
+KINDS = ('users', 'caregivers', 'members')
+FORMATS = ('csv', 'ndjson')
+CAREGIVING_TYPES = ('babysitter', 'elderly care', 'playmate')
+
+# (column, required, max length) for the "user" part of every row
+USER_FIELDS = (
+    ('email', True, 255),
+    ('given_name', True, 100),
+    ('surname', True, 100),
+    ('city', True, 100),
+    ('phone_number', True, 20),
+    ('profile_description', False, None),
+    ('password', True, 255),
+)
+
+INPUT_USERS = """
+    input AS (
+        SELECT *
+        FROM unnest(
+            CAST(:email AS TEXT[]), CAST(:given_name AS TEXT[]), CAST(:surname AS TEXT[]),
+            CAST(:city AS TEXT[]), CAST(:phone_number AS TEXT[]),
+            CAST(:profile_description AS TEXT[]), CAST(:password AS TEXT[]){extra_arrays}
+        ) AS t(email, given_name, surname, city, phone_number, profile_description, password{extra_columns})
+    ),
+    new_users AS (
+        INSERT INTO "user" (email, given_name, surname, city, phone_number, profile_description, password)
+        SELECT email, given_name, surname, city, phone_number, profile_description, password
+        FROM input
+        ON CONFLICT (email) DO NOTHING
+        RETURNING user_id, email
+    )
+"""
+
+STATEMENTS = {
+    'users': "WITH " + INPUT_USERS.format(extra_arrays='', extra_columns='') + """
+        SELECT email FROM new_users
+    """,
+    'caregivers': "WITH " + INPUT_USERS.format(
+        extra_arrays=(
+            ",\n            CAST(:photo AS TEXT[]), CAST(:gender AS TEXT[]),"
+            " CAST(:caregiving_type AS TEXT[]), CAST(:hourly_rate AS NUMERIC[])"
+        ),
+        extra_columns=', photo, gender, caregiving_type, hourly_rate'
+    ) + """,
+    new_caregivers AS (
+        INSERT INTO caregiver (caregiver_user_id, photo, gender, caregiving_type, hourly_rate)
+        SELECT nu.user_id, i.photo, i.gender, i.caregiving_type, i.hourly_rate
+        FROM new_users nu
+        JOIN input i ON i.email = nu.email
+    )
+    SELECT email FROM new_users
+    """,
+    'members': "WITH " + INPUT_USERS.format(
+        extra_arrays=",\n            CAST(:house_rules AS TEXT[]), CAST(:dependent_description AS TEXT[])",
+        extra_columns=', house_rules, dependent_description'
+    ) + """,
+    new_members AS (
+        INSERT INTO member (member_user_id, house_rules, dependent_description)
+        SELECT nu.user_id, i.house_rules, i.dependent_description
+        FROM new_users nu
+        JOIN input i ON i.email = nu.email
+    )
+    SELECT email FROM new_users
+    """,
+}
+
+
+class RowError(ValueError):
+    """A row that cannot be imported"""
+
+
+def detect_format(filename=None, content_type=None, default='csv'):
+    """Guess csv/ndjson from a file name or content type"""
+    name = (filename or '').lower()
+    if name.endswith(('.ndjson', '.jsonl')) or 'ndjson' in (content_type or ''):
+        return 'ndjson'
+    if name.endswith('.csv') or 'csv' in (content_type or ''):
+        return 'csv'
+    return default
+
+
+def read_rows(stream, fmt):
+    """Yield (line_number, row, error) for every record in a text stream"""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row, None
+    elif fmt == 'ndjson':
+        for line_number, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield line_number, None, f'Invalid JSON: {e}'
+                continue
+            if not isinstance(row, dict):
+                yield line_number, None, 'Expected a JSON object'
+                continue
+            yield line_number, row, None
+    else:
+        raise ValueError(f'Unsupported format: {fmt}')
+
+
+def _text(row, name, required, max_length):
+    value = row.get(name)
+    value = '' if value is None else str(value).strip()
+    if required and not value:
+        raise RowError(f'{name} is required')
+    if max_length and len(value) > max_length:
+        raise RowError(f'{name} is longer than {max_length} characters')
+    return value
+
+
+def validate(kind, row):
+    """Return the cleaned column values for one row or raise RowError"""
+    values = {name: _text(row, name, required, max_length) for name, required, max_length in USER_FIELDS}
+    if '@' not in values['email']:
+        raise RowError('email is not a valid address')
+
+    if kind == 'caregivers':
+        values['photo'] = _text(row, 'photo', False, 500)
+        values['gender'] = _text(row, 'gender', True, 20)
+        values['caregiving_type'] = _text(row, 'caregiving_type', True, 50)
+        if values['caregiving_type'] not in CAREGIVING_TYPES:
+            raise RowError(f"caregiving_type must be one of {', '.join(CAREGIVING_TYPES)}")
+        try:
+            rate = Decimal(_text(row, 'hourly_rate', True, None))
+        except InvalidOperation:
+            raise RowError('hourly_rate must be a number')
+        if not (0 < rate < Decimal('100000000')):
+            raise RowError('hourly_rate must be positive and below 100000000')
+        values['hourly_rate'] = rate.quantize(Decimal('0.01'))
+    elif kind == 'members':
+        values['house_rules'] = _text(row, 'house_rules', False, None)
+        values['dependent_description'] = _text(row, 'dependent_description', False, None)
+    return values
+
+
+def _insert(conn, kind, batch):
+    """Insert a batch of (line_number, values) and return the emails that were created"""
+    columns = {name: [values[name] for _, values in batch] for name in batch[0][1]}
+    return {row.email for row in conn.execute(text(STATEMENTS[kind]), columns)}
+
+
+def _load_batch(engine, kind, batch, summary):
+    failed = {}
+    try:
+        with engine.begin() as conn:
+            created = _insert(conn, kind, batch)
+    except Exception:
+        # Something the validation did not catch; isolate the offending rows
+        created = set()
+        with engine.begin() as conn:
+            for line_number, values in batch:
+                try:
+                    with conn.begin_nested():
+                        created |= _insert(conn, kind, [(line_number, values)])
+                except Exception as e:
+                    failed[line_number] = str(getattr(e, 'orig', e)).strip().splitlines()[0]
+
+    for line_number, values in batch:
+        if line_number in failed:
+            error = failed[line_number]
+        elif values['email'] in created:
+            summary['inserted'] += 1
+            continue
+        else:
+            error = 'email already exists'
+        summary['errors'].append({'line': line_number, 'email': values['email'], 'error': error})
+
+
+def import_rows(engine, kind, rows, batch_size=BATCH_SIZE):
+    """
+    Validate and load rows produced by read_rows().
+
+    Each batch is committed on its own, so an error in one batch never
+    rolls back rows that were already imported. Returns a summary dict with
+    the number of rows received and inserted and a list of per-row errors.
+    """
+    if kind not in KINDS:
+        raise ValueError(f'Unsupported kind: {kind}')
+
+    summary = {'kind': kind, 'received': 0, 'inserted': 0, 'errors': []}
+    batch = []
+    seen = set()
+    for line_number, row, error in rows:
+        summary['received'] += 1
+        try:
+            if error:
+                raise RowError(error)
+            values = validate(kind, row)
+            if values['email'] in seen:
+                raise RowError('duplicate email in this import')
+        except RowError as e:
+            summary['errors'].append({
+                'line': line_number, 'email': (row or {}).get('email'), 'error': str(e),
+            })
+            continue
+        seen.add(values['email'])
+        batch.append((line_number, values))
+        if len(batch) >= batch_size:
+            _load_batch(engine, kind, batch, summary)
+            batch = []
+    if batch:
+        _load_batch(engine, kind, batch, summary)
+
+    summary['errors'].sort(key=lambda error: error['line'])
+    return summary
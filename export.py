@@ -0,0 +1,211 @@
+"""
+Streaming export of query results as CSV, NDJSON or Parquet.
+
+Rows come from a server-side cursor in batches of BATCH_SIZE, and every
+batch is encoded and handed on before the next one is fetched. Exporting a
+table of any size therefore holds one batch in memory, whether the output
+goes to a file (flask export) or to an HTTP response (/export/<name>).
+Parquet needs pyarrow and writes one row group per batch, with the column
+types taken from the query's result description before the first row.
+"""
+
+import csv
+import io
+import json
+from datetime import date, time
+from decimal import Decimal
+
+
+BATCH_SIZE = 5000
+
+FORMATS = ('csv', 'ndjson', 'parquet')
+
+MIMETYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+
+def detect_format(filename=None, default='csv'):
+    """Guess the format from a file name's extension"""
+    name = (filename or '').lower()
+    if name.endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    if name.endswith('.parquet'):
+        return 'parquet'
+    if name.endswith('.csv'):
+        return 'csv'
+    return default
+
+
+def _json_value(value):
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def _csv_chunks(columns, batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for batch in batches:
+        writer.writerows(batch)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def _ndjson_chunks(columns, batches):
+    for batch in batches:
+        yield ''.join(
+            json.dumps({name: _json_value(value) for name, value in zip(columns, row)}) + '\n' for row in batch
+        ).encode('utf-8')
+
+
+class _Chunks:
+    """Write-only file object that gives back what was written since the last take()"""
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
+
+
+def _arrow_types(pa):
+    """PostgreSQL type OIDs (cursor.description type codes) stored as native Parquet types"""
+    return {
+        16: pa.bool_(), 20: pa.int64(), 21: pa.int16(), 23: pa.int32(), 26: pa.int64(),
+        700: pa.float32(), 701: pa.float64(),
+        1082: pa.date32(), 1083: pa.time64('us'), 1114: pa.timestamp('us'), 1184: pa.timestamp('us', tz='UTC'),
+        1186: pa.duration('us'), 17: pa.binary(),
+        19: pa.string(), 25: pa.string(), 1042: pa.string(), 1043: pa.string(),
+    }
+
+
+# Array type OID -> element type OID, for the arrays stored as Parquet lists
+ARRAY_ELEMENTS = {1000: 16, 1005: 21, 1007: 23, 1016: 20, 1021: 700, 1022: 701, 1009: 25, 1015: 1043, 1182: 1082}
+
+NUMERIC = 1700
+
+# Largest precision decimal128 holds
+MAX_DECIMAL_PRECISION = 38
+
+
+def _text(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, default=_json_value)
+    return str(value)
+
+
+def _parquet_column(pa, types, column):
+    """(Arrow type, converter for non-null values or None) of one cursor.description column"""
+    type_code = column[1]
+    if type_code == NUMERIC:
+        precision, scale = column[4], column[5]
+        if precision is not None and 0 < precision <= MAX_DECIMAL_PRECISION:
+            return pa.decimal128(precision, scale), None
+        # Unconstrained NUMERIC (sums, averages): no fixed scale to declare
+        return pa.float64(), float
+    if type_code in types:
+        return types[type_code], None
+    if ARRAY_ELEMENTS.get(type_code) in types:
+        return pa.list_(types[ARRAY_ELEMENTS[type_code]]), None
+    # JSON, UUID, enums and the rest are written as text
+    return pa.string(), _text
+
+
+def _parquet_columns(pa, columns, description):
+    """Schema and per-column converters, fixed before any row is read"""
+    types = _arrow_types(pa)
+    if description is None:
+        specs = [(pa.string(), _text) for _ in columns]
+    else:
+        specs = [_parquet_column(pa, types, column) for column in description]
+    schema = pa.schema([pa.field(name, kind) for name, (kind, _) in zip(columns, specs)])
+    return schema, [convert for _, convert in specs]
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError('Parquet export needs pyarrow (pip install pyarrow)')
+    return pyarrow, pyarrow.parquet
+
+
+def check_format(fmt):
+    """Raise ValueError for an unknown format and RuntimeError when its library is missing"""
+    if fmt not in FORMATS:
+        raise ValueError(f'Unsupported format: {fmt}')
+    if fmt == 'parquet':
+        _pyarrow()
+
+
+def _parquet_chunks(columns, batches, description=None):
+    pa, pq = _pyarrow()
+    schema, converters = _parquet_columns(pa, columns, description)
+    sink = _Chunks()
+    writer = pq.ParquetWriter(sink, schema)
+    for batch in batches:
+        arrays = []
+        for i, (field, convert) in enumerate(zip(schema, converters)):
+            values = [row[i] for row in batch]
+            if convert:
+                values = [None if value is None else convert(value) for value in values]
+            arrays.append(pa.array(values, type=field.type))
+        writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+        yield sink.take()
+    writer.close()
+    yield sink.take()
+
+
+def encode(fmt, columns, batches, description=None):
+    """
+    Yield the export of batches of row tuples as bytes.
+
+    description is the DBAPI cursor.description of the rows; Parquet takes
+    its column types from it (without one every column is written as text).
+    """
+    check_format(fmt)
+    if fmt == 'csv':
+        return _csv_chunks(columns, batches)
+    if fmt == 'ndjson':
+        return _ndjson_chunks(columns, batches)
+    return _parquet_chunks(columns, batches, description)
+
+
+def export_result(result, fmt, batch_size=BATCH_SIZE):
+    """
+    Yield the rows of an executed result as bytes in fmt.
+
+    result should come from a statement run with stream_results (or
+    yield_per) so the rows are fetched from a server-side cursor batch by
+    batch instead of all at once.
+    """
+    columns = list(result.keys())
+    return encode(fmt, columns, (list(batch) for batch in result.partitions(batch_size)), result.cursor.description)
@@ -0,0 +1,303 @@
+"""
+Synthetic data generator for the Online Caregivers Platform.
+
+Produces a consistent dataset at any scale (1k to 10M users) and loads it
+with PostgreSQL COPY. The same --seed and --users always produce the same
+rows, so benchmark runs against generated data are comparable.
+
+Shape of the data:
+    - about 40% of users are caregivers, the rest are members
+    - most members have an address and post 0-4 jobs
+    - jobs get applications, mostly from caregivers of the required type
+    - caregivers get non-overlapping appointments spread over two years,
+      mostly confirmed, some pending or declined
+
+Usage:
+    python generate_data.py --users 100000 --seed 341 --truncate
+"""
+
+import argparse
+import csv
+import io
+import random
+import time
+from array import array
+from datetime import date, timedelta
+
+from sqlalchemy import text
+
+
+CAREGIVING_TYPES = ('babysitter', 'elderly care', 'playmate')
+STATUSES = ('confirmed', 'pending', 'declined')
+STATUS_WEIGHTS = (65, 20, 15)
+
+GIVEN_NAMES = (
+    'Sarah', 'Michael', 'Emily', 'David', 'Lisa', 'James', 'Maria', 'Robert', 'Jennifer', 'William',
+    'Arman', 'Amina', 'Nurbol', 'Ayzhan', 'Daniyar', 'Madina', 'Bekzhan', 'Aigerim', 'Aslan', 'Zhuldyz',
+    'Nazira', 'Timur', 'Dana', 'Yerlan', 'Aruzhan', 'Olzhas', 'Saule', 'Dias', 'Kamila', 'Askar',
+)
+SURNAMES = (
+    'Johnson', 'Chen', 'Davis', 'Wilson', 'Anderson', 'Brown', 'Garcia', 'Martinez', 'Taylor', 'Thomas',
+    'Armanov', 'Aminova', 'Nurbolov', 'Ayzhanova', 'Daniyarov', 'Madinova', 'Bekzhanov', 'Aigerimova',
+    'Aslanov', 'Zhuldyzova', 'Nazirova', 'Sadykov', 'Omarova', 'Iskakov', 'Kassymova', 'Tulegenov',
+)
+CITIES = ('Astana', 'Almaty', 'Shymkent', 'Karaganda', 'Aktobe', 'Taraz', 'Pavlodar', 'Oskemen')
+CITY_WEIGHTS = (30, 30, 12, 8, 6, 5, 5, 4)
+STREETS = (
+    'Kabanbay Batyr', 'Abay Avenue', 'Nazarbayev Street', 'Turan Avenue', 'Satpayev Street',
+    'Bukhar Zhyrau Avenue', 'Raiymbek Avenue', 'Dostyk Avenue', 'Tole Bi Street', 'Kenesary Street',
+)
+GENDERS = ('Female', 'Male')
+
+PROFILE_PHRASES = {
+    'babysitter': ('Experienced babysitter', 'First aid certified', 'Available weekends',
+                   'Loves working with toddlers', 'Bilingual babysitter'),
+    'elderly care': ('Compassionate elderly caregiver', 'Medical background', 'Medication management',
+                     'Experience with dementia care', 'Patient and soft-spoken'),
+    'playmate': ('Creative playmate', 'Sports and outdoor games', 'Arts and crafts',
+                 'Fun and energetic', 'Homework help'),
+}
+MEMBER_PHRASES = ('Looking for a caregiver', 'Need help a few days a week', 'Seeking reliable support',
+                  'Flexible schedule', 'Long-term arrangement preferred')
+HOUSE_RULES = ('No pets.', 'Pets allowed.', 'No smoking.', 'Soft-spoken caregiver preferred.',
+               'Strict hygiene rules.', 'Quiet environment needed.', 'Shoes off indoors.')
+DEPENDENTS = {
+    'babysitter': ('{age}-year-old son', '{age}-year-old daughter', 'Twins, {age} years old'),
+    'elderly care': ('Mother, {old} years old', 'Father, {old} years old', 'Grandmother, {old} years old'),
+    'playmate': ('Active {age}-year-old boy', 'Curious {age}-year-old girl', 'Two kids aged {age} and {age2}'),
+}
+REQUIREMENTS = ('Must be soft-spoken and patient', 'Experience with medication management required',
+                'Creative activities preferred', 'Weekend availability essential',
+                'After-school hours', 'Medical background preferred', 'Must have first aid training',
+                'Light housekeeping', 'Non-smoker', 'Own transport preferred', 'Companionship and reading')
+
+FIRST_DAY = date(2024, 1, 1)
+DAYS = 731
+BATCH_ROWS = 5000
+
+
+class CopySource:
+    """File-like object that renders rows to CSV on demand for COPY ... FROM STDIN"""
+
+    def __init__(self, rows):
+        self._rows = iter(rows)
+        self._buffer = ''
+        self.count = 0
+
+    def _fill(self):
+        out = io.StringIO()
+        writer = csv.writer(out, lineterminator='\n')
+        for _ in range(BATCH_ROWS):
+            try:
+                writer.writerow(next(self._rows))
+            except StopIteration:
+                break
+            self.count += 1
+        return out.getvalue()
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            chunk = self._fill()
+            if not chunk:
+                break
+            self._buffer += chunk
+        if size < 0:
+            data, self._buffer = self._buffer, ''
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+def _rng(seed, table):
+    """Independent random stream per table, so one table's shape never shifts another's"""
+    return random.Random(f'{seed}:{table}')
+
+
+def _is_caregiver(user_id, share):
+    # Multiplicative hash spreads caregivers evenly through the id range
+    return ((user_id * 2654435761) % 4294967296) / 4294967296 < share
+
+
+class Dataset:
+    """Deterministic row generators for every table"""
+
+    def __init__(self, users, seed, caregiver_share=0.4):
+        self.users = users
+        self.seed = seed
+        self.caregiver_share = caregiver_share
+        self.caregiver_ids = {t: array('i') for t in CAREGIVING_TYPES}
+        self.member_ids = array('i')
+        for user_id in range(1, users + 1):
+            if _is_caregiver(user_id, caregiver_share):
+                self.caregiver_ids[CAREGIVING_TYPES[self._caregiver_type(user_id)]].append(user_id)
+            else:
+                self.member_ids.append(user_id)
+
+    def _caregiver_type(self, user_id):
+        """Index into CAREGIVING_TYPES, derived from the id so every table agrees on it"""
+        return (user_id * 40503) % 65536 % 3
+
+    def user_rows(self):
+        rng = _rng(self.seed, 'user')
+        for user_id in range(1, self.users + 1):
+            given, surname = rng.choice(GIVEN_NAMES), rng.choice(SURNAMES)
+            if _is_caregiver(user_id, self.caregiver_share):
+                phrases = PROFILE_PHRASES[CAREGIVING_TYPES[self._caregiver_type(user_id)]]
+            else:
+                phrases = MEMBER_PHRASES
+            description = '. '.join(rng.sample(phrases, 2))
+            yield (
+                user_id, f'{given.lower()}.{surname.lower()}.{user_id}@example.com', given, surname,
+                rng.choices(CITIES, CITY_WEIGHTS)[0], f'+7{rng.randrange(7000000000, 7999999999)}',
+                description, 'pass123',
+            )
+
+    def caregiver_rows(self):
+        rng = _rng(self.seed, 'caregiver')
+        for user_id in range(1, self.users + 1):
+            if not _is_caregiver(user_id, self.caregiver_share):
+                continue
+            caregiving_type = CAREGIVING_TYPES[self._caregiver_type(user_id)]
+            base = {'babysitter': 14, 'elderly care': 20, 'playmate': 11}[caregiving_type]
+            rate = round(max(5.0, rng.gauss(base, 4)), 2)
+            yield user_id, f'photo{user_id}.jpg', rng.choice(GENDERS), caregiving_type, f'{rate:.2f}'
+
+    def member_rows(self):
+        rng = _rng(self.seed, 'member')
+        for user_id in self.member_ids:
+            need = rng.choice(CAREGIVING_TYPES)
+            dependent = rng.choice(DEPENDENTS[need]).format(
+                age=rng.randint(2, 12), age2=rng.randint(2, 12), old=rng.randint(65, 95)
+            )
+            yield user_id, ' '.join(rng.sample(HOUSE_RULES, rng.randint(1, 3))), dependent
+
+    def address_rows(self):
+        rng = _rng(self.seed, 'address')
+        for user_id in self.member_ids:
+            if rng.random() < 0.95:
+                yield user_id, str(rng.randint(1, 250)), rng.choice(STREETS), rng.choices(CITIES, CITY_WEIGHTS)[0]
+
+    def _jobs(self):
+        """(job_id, member id, type index, requirements, date posted), the same on every call"""
+        rng = _rng(self.seed, 'job')
+        job_id = 0
+        for user_id in self.member_ids:
+            for _ in range(rng.choices((0, 1, 2, 3, 4), (25, 40, 20, 10, 5))[0]):
+                job_id += 1
+                type_index = rng.randrange(3)
+                requirements = ', '.join(rng.sample(REQUIREMENTS, rng.randint(1, 3)))
+                yield job_id, user_id, type_index, requirements, FIRST_DAY + timedelta(days=rng.randrange(DAYS))
+
+    def job_rows(self):
+        for job_id, user_id, type_index, requirements, date_posted in self._jobs():
+            yield job_id, user_id, CAREGIVING_TYPES[type_index], requirements, date_posted
+
+    def job_application_rows(self):
+        rng = _rng(self.seed, 'job_application')
+        all_types = [t for t in CAREGIVING_TYPES if self.caregiver_ids[t]]
+        if not all_types:
+            return
+        # Replays the job stream, so it does not depend on job_rows() running first
+        for job_id, _, type_index, _, _ in self._jobs():
+            matching = self.caregiver_ids[CAREGIVING_TYPES[type_index]]
+            applicants = set()
+            for _ in range(rng.choices((0, 1, 3, 5, 10), (10, 25, 35, 20, 10))[0]):
+                # Most applicants match the required type; a few apply anyway
+                pool = matching if matching and rng.random() < 0.85 else self.caregiver_ids[rng.choice(all_types)]
+                applicants.add(pool[rng.randrange(len(pool))])
+            for caregiver_id in sorted(applicants):
+                yield caregiver_id, job_id, FIRST_DAY + timedelta(days=rng.randrange(DAYS))
+
+    def appointment_rows(self):
+        rng = _rng(self.seed, 'appointment')
+        if not self.member_ids:
+            return
+        appointment_id = 0
+        caregivers = sorted(c for ids in self.caregiver_ids.values() for c in ids)
+        for caregiver_id in caregivers:
+            # At most one booking per day that ends by midnight, so none overlap
+            count = rng.choices((0, 1, 3, 6, 12), (15, 25, 30, 20, 10))[0]
+            for day in sorted(rng.sample(range(DAYS), count)):
+                appointment_id += 1
+                start_hour = rng.randint(7, 19)
+                hours = rng.choice((1, 1.5, 2, 2.5, 3, 4, 5, 6, 8))
+                member_id = self.member_ids[rng.randrange(len(self.member_ids))]
+                minute = rng.choice((0, 30))
+                hours = min(hours, 24 - start_hour - minute / 60)
+                yield (
+                    appointment_id, caregiver_id, member_id, FIRST_DAY + timedelta(days=day),
+                    f'{start_hour:02d}:{minute:02d}', f'{hours:.2f}', rng.choices(STATUSES, STATUS_WEIGHTS)[0],
+                )
+
+
+# (table, columns, generator method) in foreign key order
+TABLES = (
+    ('"user"', 'user_id, email, given_name, surname, city, phone_number, profile_description, password', 'user_rows'),
+    ('caregiver', 'caregiver_user_id, photo, gender, caregiving_type, hourly_rate', 'caregiver_rows'),
+    ('member', 'member_user_id, house_rules, dependent_description', 'member_rows'),
+    ('address', 'member_user_id, house_number, street, town', 'address_rows'),
+    ('job', 'job_id, member_user_id, required_caregiving_type, other_requirements, date_posted', 'job_rows'),
+    ('job_application', 'caregiver_user_id, job_id, date_applied', 'job_application_rows'),
+    ('appointment', 'appointment_id, caregiver_user_id, member_user_id, appointment_date, appointment_time, '
+                    'work_hours, status', 'appointment_rows'),
+)
+
+SEQUENCES = (('"user"', 'user_id'), ('job', 'job_id'), ('appointment', 'appointment_id'))
+
+
+def generate(engine, users, seed=341, caregiver_share=0.4, truncate=False):
+    """Load a generated dataset into the database behind engine and return row counts"""
+    with engine.begin() as conn:
+        if truncate:
+            conn.execute(text(
+                'TRUNCATE "user", caregiver, member, address, job, job_application, appointment '
+                'RESTART IDENTITY CASCADE'
+            ))
+        elif conn.execute(text('SELECT EXISTS (SELECT 1 FROM "user")')).scalar():
+            raise RuntimeError('The database already has users; pass truncate=True (--truncate) to replace them')
+
+    dataset = Dataset(users, seed, caregiver_share)
+    counts = {}
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        for table, columns, method in TABLES:
+            start = time.perf_counter()
+            source = CopySource(getattr(dataset, method)())
+            cursor.copy_expert(f'COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)', source)
+            counts[table.strip('"')] = source.count
+            print(f"  {table:<16} {source.count:>10} rows in {time.perf_counter() - start:.1f}s")
+        for table, column in SEQUENCES:
+            cursor.execute(
+                f"SELECT setval(pg_get_serial_sequence('{table}', '{column}'), "
+                f"COALESCE((SELECT MAX({column}) FROM {table}), 0) + 1, false)"
+            )
+        raw.commit()
+        cursor.execute('ANALYZE')
+        raw.commit()
+    except Exception:
+        raw.rollback()
+        raise
+    finally:
+        raw.close()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=1000, help='Number of users to generate')
+    parser.add_argument('--seed', type=int, default=341, help='Random seed; same seed, same data')
+    parser.add_argument('--caregiver-share', type=float, default=0.4, help='Fraction of users who are caregivers')
+    parser.add_argument('--truncate', action='store_true', help='Delete all existing rows first')
+    args = parser.parse_args()
+
+    from app import engine
+
+    print(f"Generating {args.users} users with seed {args.seed}...")
+    start = time.perf_counter()
+    generate(engine, args.users, args.seed, args.caregiver_share, args.truncate)
+    print(f"Done in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
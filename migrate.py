@@ -0,0 +1,132 @@
+"""
+Versioned schema migrations for the Online Caregivers Platform.
+
+Migrations are the numbered .sql files in migrations/ (0001_name.sql,
+0002_name.sql, ...). Pending ones are applied in order inside a single
+transaction that holds a PostgreSQL advisory lock, so two deploys running
+`flask migrate` at the same time cannot interleave and a failing migration
+leaves the schema exactly as it was. Each applied version is recorded in
+the schema_version table.
+
+Run once per deploy (the Procfile release phase does this on Heroku):
+    flask --app app migrate
+    flask --app app migrate --sample-data
+"""
+
+import os
+import re
+
+from sqlalchemy import text
+
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+SAMPLE_DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'insert_data.sql')
+
+# Arbitrary application-wide key for pg_advisory_xact_lock
+LOCK_KEY = 3410001
+
+FILENAME = re.compile(r'^(\d{4})_(\w+)\.sql$')
+
+
+class Migration:
+    """One numbered .sql file"""
+
+    def __init__(self, version, name, path):
+        self.version = version
+        self.name = name
+        self.path = path
+
+    def read(self):
+        with open(self.path, encoding='utf-8') as f:
+            return f.read()
+
+    def __repr__(self):
+        return f'{self.version:04d}_{self.name}'
+
+
+def discover(directory=MIGRATIONS_DIR):
+    """Return the migrations in directory ordered by version"""
+    migrations = {}
+    for filename in os.listdir(directory):
+        match = FILENAME.match(filename)
+        if not match:
+            continue
+        version = int(match.group(1))
+        if version in migrations:
+            raise ValueError(f'Duplicate migration version {version}: {migrations[version].path} and {filename}')
+        migrations[version] = Migration(version, match.group(2), os.path.join(directory, filename))
+    return [migrations[version] for version in sorted(migrations)]
+
+
+def latest_version(directory=MIGRATIONS_DIR):
+    """Schema version the code expects: the highest migration number"""
+    migrations = discover(directory)
+    return migrations[-1].version if migrations else 0
+
+
+def current_version(conn):
+    """Highest version recorded in schema_version, or 0 on a database that has none"""
+    if conn.execute(text("SELECT to_regclass('public.schema_version')")).scalar() is None:
+        return 0
+    return conn.execute(text("SELECT COALESCE(MAX(version), 0) FROM schema_version")).scalar()
+
+
+def _execute_script(conn, sql):
+    """Run a multi-statement SQL file in conn's transaction"""
+    # Straight to the DBAPI cursor without parameters, so neither ':name'
+    # (e.g. in '09:00') nor '%' in the file is taken for a placeholder
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute(sql)
+    finally:
+        cursor.close()
+
+
+def _ensure_version_table(conn):
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            applied_at TIMESTAMP NOT NULL DEFAULT NOW()
+        )
+    """))
+    conn.execute(text("ALTER TABLE schema_version ADD COLUMN IF NOT EXISTS name VARCHAR(200)"))
+
+
+def migrate(engine, target=None, dry_run=False, directory=MIGRATIONS_DIR):
+    """
+    Apply every migration newer than the database, up to target.
+
+    Returns the list of migrations that were applied (or would be, with
+    dry_run). Raises on the first failing migration, after rolling back
+    everything this call did.
+    """
+    migrations = discover(directory)
+    with engine.connect() as conn:
+        conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {'key': LOCK_KEY})
+        # Read the version only once the lock is held; another deploy may have just migrated
+        version = current_version(conn)
+        pending = [m for m in migrations if m.version > version and (target is None or m.version <= target)]
+        if dry_run or not pending:
+            # Closing the connection rolls back and releases the lock
+            return pending
+
+        _ensure_version_table(conn)
+        for migration in pending:
+            print(f"Applying migration {migration}...")
+            _execute_script(conn, migration.read())
+            conn.execute(text("""
+                INSERT INTO schema_version (version, name) VALUES (:version, :name)
+                ON CONFLICT (version) DO UPDATE SET name = EXCLUDED.name
+            """), {'version': migration.version, 'name': migration.name})
+        conn.commit()
+    return pending
+
+
+def load_sample_data(engine, path=SAMPLE_DATA):
+    """Insert the sample rows from insert_data.sql into an empty database; return whether it did"""
+    with engine.begin() as conn:
+        if conn.execute(text('SELECT EXISTS (SELECT 1 FROM "user")')).scalar():
+            return False
+        with open(path, encoding='utf-8') as f:
+            _execute_script(conn, f.read())
+    return True
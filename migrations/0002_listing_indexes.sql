@@ -0,0 +1,3 @@
+-- Indexes matching the keyset pagination order of the list pages
+CREATE INDEX IF NOT EXISTS idx_appointment_listing ON appointment(appointment_date DESC, appointment_time, appointment_id);
+CREATE INDEX IF NOT EXISTS idx_job_application_listing ON job_application(job_id, date_applied, caregiver_user_id);
@@ -0,0 +1,74 @@
+-- Per-caregiver running totals over confirmed appointments, kept up to date
+-- by triggers so the earnings reports read one row per caregiver instead of
+-- aggregating the whole appointment table.
+CREATE TABLE IF NOT EXISTS caregiver_earnings (
+    caregiver_user_id INTEGER PRIMARY KEY,
+    confirmed_appointments INTEGER NOT NULL DEFAULT 0,
+    confirmed_hours NUMERIC NOT NULL DEFAULT 0,
+    earnings NUMERIC NOT NULL DEFAULT 0,
+    FOREIGN KEY (caregiver_user_id) REFERENCES caregiver(caregiver_user_id) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS idx_caregiver_earnings_earnings ON caregiver_earnings(earnings DESC);
+
+-- Appointment inserts, updates and deletes move the totals by the
+-- difference between the old and the new confirmed row
+CREATE OR REPLACE FUNCTION caregiver_earnings_on_appointment() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.status = 'confirmed' THEN
+        -- Plain UPDATE: when the caregiver itself is being deleted its row is already gone
+        UPDATE caregiver_earnings ce
+        SET confirmed_appointments = ce.confirmed_appointments - 1,
+            confirmed_hours = ce.confirmed_hours - OLD.work_hours,
+            earnings = ce.earnings - OLD.work_hours * c.hourly_rate
+        FROM caregiver c
+        WHERE c.caregiver_user_id = OLD.caregiver_user_id
+          AND ce.caregiver_user_id = OLD.caregiver_user_id;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.status = 'confirmed' THEN
+        INSERT INTO caregiver_earnings AS ce (caregiver_user_id, confirmed_appointments, confirmed_hours, earnings)
+        SELECT c.caregiver_user_id, 1, NEW.work_hours, NEW.work_hours * c.hourly_rate
+        FROM caregiver c
+        WHERE c.caregiver_user_id = NEW.caregiver_user_id
+        ON CONFLICT (caregiver_user_id) DO UPDATE
+        SET confirmed_appointments = ce.confirmed_appointments + 1,
+            confirmed_hours = ce.confirmed_hours + EXCLUDED.confirmed_hours,
+            earnings = ce.earnings + EXCLUDED.earnings;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS appointment_caregiver_earnings ON appointment;
+CREATE TRIGGER appointment_caregiver_earnings
+AFTER INSERT OR DELETE OR UPDATE OF caregiver_user_id, work_hours, status ON appointment
+FOR EACH ROW EXECUTE FUNCTION caregiver_earnings_on_appointment();
+
+-- Earnings are priced at the caregiver's current rate, so a rate change
+-- reprices the caregiver's total from the hours already stored
+CREATE OR REPLACE FUNCTION caregiver_earnings_on_rate_change() RETURNS trigger AS $$
+BEGIN
+    UPDATE caregiver_earnings
+    SET earnings = confirmed_hours * NEW.hourly_rate
+    WHERE caregiver_user_id = NEW.caregiver_user_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS caregiver_rate_earnings ON caregiver;
+CREATE TRIGGER caregiver_rate_earnings
+AFTER UPDATE OF hourly_rate ON caregiver
+FOR EACH ROW WHEN (OLD.hourly_rate IS DISTINCT FROM NEW.hourly_rate)
+EXECUTE FUNCTION caregiver_earnings_on_rate_change();
+
+-- Backfill from the existing appointments
+INSERT INTO caregiver_earnings (caregiver_user_id, confirmed_appointments, confirmed_hours, earnings)
+SELECT a.caregiver_user_id, COUNT(*), SUM(a.work_hours), SUM(a.work_hours * c.hourly_rate)
+FROM appointment a
+JOIN caregiver c ON a.caregiver_user_id = c.caregiver_user_id
+WHERE a.status = 'confirmed'
+GROUP BY a.caregiver_user_id
+ON CONFLICT (caregiver_user_id) DO UPDATE
+SET confirmed_appointments = EXCLUDED.confirmed_appointments,
+    confirmed_hours = EXCLUDED.confirmed_hours,
+    earnings = EXCLUDED.earnings;
@@ -0,0 +1,17 @@
+-- Full-text search over the free-text columns. The tsvector columns are
+-- generated, so every write keeps them current without application code.
+
+-- Job requirements and profile descriptions are prose: stem with 'english'
+ALTER TABLE job ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (to_tsvector('english', COALESCE(other_requirements, ''))) STORED;
+ALTER TABLE "user" ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (to_tsvector('english', COALESCE(profile_description, ''))) STORED;
+
+-- House rules are short phrases where "no" matters ("No pets" vs "Pets
+-- allowed"), and 'english' drops it as a stop word, so use 'simple'
+ALTER TABLE member ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (to_tsvector('simple', COALESCE(house_rules, ''))) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_job_search ON job USING GIN (search_vector);
+CREATE INDEX IF NOT EXISTS idx_user_search ON "user" USING GIN (search_vector);
+CREATE INDEX IF NOT EXISTS idx_member_search ON member USING GIN (search_vector);
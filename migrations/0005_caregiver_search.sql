@@ -0,0 +1,50 @@
+-- Caregiver search filters on type, city, gender and a rate range and sorts
+-- by rate. City lives on "user", so it is copied onto caregiver (kept in
+-- sync by triggers) to let a single composite index serve the whole lookup.
+ALTER TABLE caregiver ADD COLUMN IF NOT EXISTS city VARCHAR(100);
+
+UPDATE caregiver c
+SET city = u.city
+FROM "user" u
+WHERE u.user_id = c.caregiver_user_id
+  AND c.city IS DISTINCT FROM u.city;
+
+ALTER TABLE caregiver ALTER COLUMN city SET NOT NULL;
+
+-- Inserts may pass the city themselves; otherwise copy it from "user"
+CREATE OR REPLACE FUNCTION caregiver_copy_city() RETURNS trigger AS $$
+BEGIN
+    IF NEW.city IS NULL OR TG_OP = 'UPDATE' THEN
+        SELECT city INTO NEW.city FROM "user" WHERE user_id = NEW.caregiver_user_id;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS caregiver_city ON caregiver;
+CREATE TRIGGER caregiver_city
+BEFORE INSERT OR UPDATE OF caregiver_user_id ON caregiver
+FOR EACH ROW EXECUTE FUNCTION caregiver_copy_city();
+
+CREATE OR REPLACE FUNCTION user_city_to_caregiver() RETURNS trigger AS $$
+BEGIN
+    UPDATE caregiver SET city = NEW.city WHERE caregiver_user_id = NEW.user_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS user_city_caregiver ON "user";
+CREATE TRIGGER user_city_caregiver
+AFTER UPDATE OF city ON "user"
+FOR EACH ROW WHEN (OLD.city IS DISTINCT FROM NEW.city)
+EXECUTE FUNCTION user_city_to_caregiver();
+
+-- Equality columns first, then the sort column; gender is optional and is
+-- filtered from the index entries without visiting the table
+CREATE INDEX IF NOT EXISTS idx_caregiver_search
+    ON caregiver(caregiving_type, city, hourly_rate, caregiver_user_id) INCLUDE (gender);
+-- Searches without a type or city still walk caregivers in rate order
+CREATE INDEX IF NOT EXISTS idx_caregiver_rate ON caregiver(hourly_rate, caregiver_user_id);
+
+-- idx_caregiver_search starts with caregiving_type, so this one is redundant
+DROP INDEX IF EXISTS idx_caregiver_type;
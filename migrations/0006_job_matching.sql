@@ -0,0 +1,43 @@
+-- Job matching looks for caregivers of the job's type in the member's city.
+-- The member's city is copied onto job (kept in sync by triggers), so a
+-- job's candidate set is one (caregiving_type, city) range of
+-- idx_caregiver_search, already ordered by rate.
+ALTER TABLE job ADD COLUMN IF NOT EXISTS city VARCHAR(100);
+
+UPDATE job j
+SET city = u.city
+FROM "user" u
+WHERE u.user_id = j.member_user_id
+  AND j.city IS DISTINCT FROM u.city;
+
+ALTER TABLE job ALTER COLUMN city SET NOT NULL;
+
+CREATE OR REPLACE FUNCTION job_copy_city() RETURNS trigger AS $$
+BEGIN
+    IF NEW.city IS NULL OR TG_OP = 'UPDATE' THEN
+        SELECT city INTO NEW.city FROM "user" WHERE user_id = NEW.member_user_id;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS job_city ON job;
+CREATE TRIGGER job_city
+BEFORE INSERT OR UPDATE OF member_user_id ON job
+FOR EACH ROW EXECUTE FUNCTION job_copy_city();
+
+CREATE OR REPLACE FUNCTION user_city_to_job() RETURNS trigger AS $$
+BEGIN
+    UPDATE job SET city = NEW.city WHERE member_user_id = NEW.user_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS user_city_job ON "user";
+CREATE TRIGGER user_city_job
+AFTER UPDATE OF city ON "user"
+FOR EACH ROW WHEN (OLD.city IS DISTINCT FROM NEW.city)
+EXECUTE FUNCTION user_city_to_job();
+
+-- The sync trigger above finds a member's jobs by member_user_id
+CREATE INDEX IF NOT EXISTS idx_job_member ON job(member_user_id);
@@ -0,0 +1,37 @@
+-- A caregiver cannot have two live (pending or confirmed) appointments whose
+-- time spans overlap. The span is stored as a generated tsrange and the rule
+-- is an exclusion constraint, so each insert or update is checked with one
+-- GiST index probe. caregiver_user_id is wrapped in a single-value int4range
+-- because plain integers have no GiST operator class without btree_gist.
+ALTER TABLE appointment ADD COLUMN IF NOT EXISTS booked_during tsrange
+    GENERATED ALWAYS AS (
+        tsrange(appointment_date + appointment_time,
+                appointment_date + appointment_time + work_hours * INTERVAL '1 hour')
+    ) STORED;
+
+-- Refuse to migrate over existing double bookings rather than hide them
+DO $$
+DECLARE
+    conflicts INTEGER;
+    example TEXT;
+BEGIN
+    SELECT COUNT(*), MIN(a.appointment_id || ' and ' || b.appointment_id)
+    INTO conflicts, example
+    FROM appointment a
+    JOIN appointment b
+      ON a.caregiver_user_id = b.caregiver_user_id
+     AND a.appointment_id < b.appointment_id
+     AND a.booked_during && b.booked_during
+    WHERE a.status <> 'declined' AND b.status <> 'declined';
+    IF conflicts > 0 THEN
+        RAISE EXCEPTION '% overlapping appointment pair(s), e.g. appointments %; resolve them before migrating',
+            conflicts, example;
+    END IF;
+END;
+$$;
+
+ALTER TABLE appointment DROP CONSTRAINT IF EXISTS appointment_no_overlap;
+ALTER TABLE appointment ADD CONSTRAINT appointment_no_overlap EXCLUDE USING gist (
+    int4range(caregiver_user_id, caregiver_user_id, '[]') WITH &&,
+    booked_during WITH &&
+) WHERE (status <> 'declined');
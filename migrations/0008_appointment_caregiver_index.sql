@@ -0,0 +1,3 @@
+-- Availability calendars read one caregiver's (or a group's) appointments
+-- over a date window; this also covers the caregiver foreign key
+CREATE INDEX IF NOT EXISTS idx_appointment_caregiver_date ON appointment(caregiver_user_id, appointment_date);
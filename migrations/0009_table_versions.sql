@@ -0,0 +1,50 @@
+-- Per-table change counters for conditional GET (ETag / Last-Modified).
+-- Statement-level triggers bump a table's row on every write, including the
+-- deletes PostgreSQL runs for ON DELETE CASCADE, so every worker sees the
+-- same versions and pages can be revalidated without reading the tables.
+CREATE TABLE IF NOT EXISTS table_version (
+    table_name VARCHAR(63) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0,
+    modified_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+INSERT INTO table_version (table_name)
+VALUES ('user'), ('caregiver'), ('member'), ('address'), ('job'), ('job_application'), ('appointment')
+ON CONFLICT (table_name) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION bump_table_version() RETURNS trigger AS $$
+BEGIN
+    UPDATE table_version
+    SET version = version + 1, modified_at = clock_timestamp()
+    WHERE table_name = TG_TABLE_NAME;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS user_version ON "user";
+CREATE TRIGGER user_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON "user"
+FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version();
+
+DROP TRIGGER IF EXISTS caregiver_version ON caregiver;
+CREATE TRIGGER caregiver_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON caregiver
+FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version();
+
+DROP TRIGGER IF EXISTS member_version ON member;
+CREATE TRIGGER member_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON member
+FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version();
+
+DROP TRIGGER IF EXISTS address_version ON address;
+CREATE TRIGGER address_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON address
+FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version();
+
+DROP TRIGGER IF EXISTS job_version ON job;
+CREATE TRIGGER job_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON job
+FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version();
+
+DROP TRIGGER IF EXISTS job_application_version ON job_application;
+CREATE TRIGGER job_application_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON job_application
+FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version();
+
+DROP TRIGGER IF EXISTS appointment_version ON appointment;
+CREATE TRIGGER appointment_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON appointment
+FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version();
@@ -0,0 +1,3 @@
+-- Deleting a member cascades to its appointments, and member-side lookups
+-- join appointment on member_user_id; without an index both scan the table
+CREATE INDEX IF NOT EXISTS idx_appointment_member ON appointment(member_user_id);
@@ -0,0 +1,47 @@
+-- Writes append to table_change instead of bumping the shared table_version
+-- row, which every writer of a table had to lock until commit: one slow
+-- transaction held up all others and multi-table writes could deadlock.
+-- Inserts into the log never wait on each other. A table's version is its
+-- table_version row plus the number of its committed log rows, so it grows
+-- by one with every committed write whatever order transactions commit in
+-- (a sequence value could be read before its data commits). Every 1000 log
+-- rows a writer folds the log into table_version, keeping the sum unchanged;
+-- the try-lock means it never waits, and only compaction ever touches
+-- table_version.
+CREATE TABLE IF NOT EXISTS table_change (
+    id BIGINT GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+    table_name VARCHAR(63) NOT NULL,
+    changed_at TIMESTAMPTZ NOT NULL DEFAULT clock_timestamp()
+);
+
+CREATE INDEX IF NOT EXISTS idx_table_change_table ON table_change(table_name, changed_at);
+
+CREATE OR REPLACE FUNCTION compact_table_changes() RETURNS void AS $$
+BEGIN
+    IF pg_try_advisory_xact_lock(hashtext('compact_table_changes')) THEN
+        WITH moved AS (
+            DELETE FROM table_change RETURNING table_name, changed_at
+        ), totals AS (
+            SELECT table_name, COUNT(*) AS changes, MAX(changed_at) AS changed_at
+            FROM moved
+            GROUP BY table_name
+        )
+        UPDATE table_version t
+        SET version = t.version + totals.changes, modified_at = GREATEST(t.modified_at, totals.changed_at)
+        FROM totals
+        WHERE t.table_name = totals.table_name;
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION bump_table_version() RETURNS trigger AS $$
+DECLARE
+    change_id BIGINT;
+BEGIN
+    INSERT INTO table_change (table_name) VALUES (TG_TABLE_NAME) RETURNING id INTO change_id;
+    IF change_id % 1000 = 0 THEN
+        PERFORM compact_table_changes();
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
@@ -2,6 +2,8 @@ from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker
 import os
 
+import replicas
+
 
 DB_USER = os.getenv('DB_USER', 'postgres')
 DB_PASSWORD = os.getenv('DB_PASSWORD', 'postgres')
@@ -15,6 +17,17 @@ engine = create_engine(DATABASE_URL, echo=False)
 Session = sessionmaker(bind=engine)
 session = Session()
 
+# The read-only reports run on a streaming replica when DB_REPLICA_HOST is set
+DB_REPLICA_HOST = os.getenv('DB_REPLICA_HOST')
+DB_REPLICA_PORT = os.getenv('DB_REPLICA_PORT', DB_PORT)
+replica_engine = None
+if DB_REPLICA_HOST:
+    replica_engine = create_engine(
+        f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_REPLICA_HOST}:{DB_REPLICA_PORT}/{DB_NAME}",
+        echo=False,
+        connect_args={'connect_timeout': replicas.REPLICA_CONNECT_TIMEOUT},
+    )
+
 
 def print_separator(title):
     print("\n" + "="*80)
@@ -22,10 +35,27 @@ def print_separator(title):
     print("="*80 + "\n")
 
 
-def execute_and_display(query, description):
+def report_session():
+    """
+    Session for the read-only reports: the replica once it has replayed
+    everything this script wrote so far, otherwise the primary.
+    """
+    if replica_engine is None:
+        return session
+    try:
+        if replicas.wait_for_lsn(replica_engine, replicas.current_lsn(session)):
+            print("Running reports on the read replica")
+            return Session(bind=replica_engine)
+        print("Replica is lagging, running reports on the primary")
+    except Exception as e:
+        print(f"Replica unavailable ({e}), running reports on the primary")
+    return session
+
+
+def execute_and_display(query, description, reader=None):
     print_separator(description)
     try:
-        result = session.execute(text(query))
+        result = (reader or session).execute(text(query))
         rows = result.fetchall()
         
         if rows:
@@ -42,6 +72,140 @@ def execute_and_display(query, description):
     print()
 
 
+# View queried by report 8
+CREATE_VIEW = """
+    CREATE OR REPLACE VIEW job_applications_view AS
+    SELECT 
+        ja.job_id,
+        j.required_caregiving_type,
+        j.other_requirements,
+        ja.date_applied,
+        ja.caregiver_user_id,
+        u.given_name || ' ' || u.surname AS applicant_name,
+        c.caregiving_type,
+        c.hourly_rate,
+        u.city AS applicant_city
+    FROM job_application ja
+    JOIN job j ON ja.job_id = j.job_id
+    JOIN caregiver c ON ja.caregiver_user_id = c.caregiver_user_id
+    JOIN "user" u ON c.caregiver_user_id = u.user_id;
+"""
+
+# Read-only reports: key -> (description, SQL). main() prints them in order;
+# report_runner.py runs them concurrently with timings and plans.
+REPORTS = {
+    # 5.1 Names for confirmed appointments
+    '5.1': ("5.1 Caregiver and Member Names for Confirmed Appointments", """
+    SELECT 
+        cg.given_name || ' ' || cg.surname AS caregiver_name,
+        m.given_name || ' ' || m.surname AS member_name
+    FROM appointment a
+    JOIN "user" cg ON a.caregiver_user_id = cg.user_id
+    JOIN "user" m ON a.member_user_id = m.user_id
+    WHERE a.status = 'confirmed';
+    """),
+    # 5.2 Jobs with 'soft-spoken' in requirements
+    '5.2': ("5.2 Jobs with 'soft-spoken' in Requirements", """
+    SELECT job_id, other_requirements
+    FROM job
+    WHERE search_vector @@ phraseto_tsquery('english', 'soft-spoken');
+    """),
+    # 5.3 Work hours for babysitters
+    '5.3': ("5.3 Work Hours for Babysitter Appointments", """
+    SELECT a.appointment_id, a.work_hours, a.appointment_date
+    FROM appointment a
+    JOIN caregiver c ON a.caregiver_user_id = c.caregiver_user_id
+    WHERE c.caregiving_type = 'babysitter';
+    """),
+    # 5.4 Members in Astana looking for elderly care with no pets rule
+    '5.4': ("5.4 Members in Astana Looking for Elderly Care with 'No pets' Rule", """
+    SELECT DISTINCT u.user_id, u.given_name, u.surname, u.city, m.house_rules
+    FROM "user" u
+    JOIN member m ON u.user_id = m.member_user_id
+    JOIN job j ON m.member_user_id = j.member_user_id
+    WHERE j.required_caregiving_type = 'elderly care'
+      AND u.city = 'Astana'
+      AND m.search_vector @@ phraseto_tsquery('simple', 'No pets');
+    """),
+    # 6.1 Count applicants per job
+    '6.1': ("6.1 Number of Applicants for Each Job", """
+    SELECT 
+        j.job_id,
+        u.given_name || ' ' || u.surname AS member_name,
+        COUNT(ja.caregiver_user_id) AS applicant_count
+    FROM job j
+    JOIN member m ON j.member_user_id = m.member_user_id
+    JOIN "user" u ON m.member_user_id = u.user_id
+    LEFT JOIN job_application ja ON j.job_id = ja.job_id
+    GROUP BY j.job_id, u.given_name, u.surname
+    ORDER BY j.job_id;
+    """),
+    # 6.2 Total hours by caregivers
+    # caregiver_earnings holds running totals over confirmed appointments,
+    # maintained by triggers (migrations/0003_caregiver_earnings.sql)
+    '6.2': ("6.2 Total Hours by Caregivers (Confirmed Appointments)", """
+    SELECT 
+        ce.caregiver_user_id,
+        u.given_name || ' ' || u.surname AS caregiver_name,
+        ce.confirmed_hours AS total_hours
+    FROM caregiver_earnings ce
+    JOIN "user" u ON ce.caregiver_user_id = u.user_id
+    WHERE ce.confirmed_appointments > 0
+    ORDER BY total_hours DESC;
+    """),
+    # 6.3 Average pay
+    '6.3': ("6.3 Average Pay for Caregivers", """
+    SELECT 
+        SUM(ce.earnings) / NULLIF(SUM(ce.confirmed_appointments), 0) AS average_pay
+    FROM caregiver_earnings ce;
+    """),
+    # 6.4 Caregivers earning above average
+    '6.4': ("6.4 Caregivers Earning Above Average", """
+    WITH avg_earnings AS (
+        SELECT SUM(earnings) / NULLIF(SUM(confirmed_appointments), 0) AS avg_pay
+        FROM caregiver_earnings
+    )
+    SELECT 
+        ce.caregiver_user_id,
+        u.given_name || ' ' || u.surname AS caregiver_name,
+        ce.earnings AS total_earnings
+    FROM caregiver_earnings ce
+    JOIN "user" u ON ce.caregiver_user_id = u.user_id
+    CROSS JOIN avg_earnings ae
+    WHERE ce.confirmed_appointments > 0
+      AND ce.earnings > ae.avg_pay
+    ORDER BY total_earnings DESC;
+    """),
+    # 7 Total cost per confirmed appointment
+    '7': ("7. Total Cost for Confirmed Appointments", """
+    SELECT 
+        a.appointment_id,
+        u.given_name || ' ' || u.surname AS caregiver_name,
+        m.given_name || ' ' || m.surname AS member_name,
+        a.appointment_date,
+        a.work_hours,
+        c.hourly_rate,
+        (c.hourly_rate * a.work_hours) AS total_cost
+    FROM appointment a
+    JOIN caregiver c ON a.caregiver_user_id = c.caregiver_user_id
+    JOIN "user" u ON c.caregiver_user_id = u.user_id
+    JOIN "user" m ON a.member_user_id = m.user_id
+    WHERE a.status = 'confirmed'
+    ORDER BY a.appointment_id;
+    """),
+    # 8 Query the view (created in section 8 of main())
+    '8': ("8. View: Job Applications and Applicants", """
+    SELECT * FROM job_applications_view
+    ORDER BY job_id, date_applied;
+    """),
+}
+
+
+def show_report(key, reader=None):
+    description, query = REPORTS[key]
+    execute_and_display(query, description, reader)
+
+
 def main():
     print("="*80)
     print("  CSCI 341 Assignment 3 - Part 2")
@@ -154,178 +318,43 @@ def main():
         session.rollback()
     
     # Simple queries
+    reader = report_session()
     print_separator("5. SIMPLE QUERIES")
-    
-    # 5.1 Names for confirmed appointments
-    query1 = """
-    SELECT 
-        cg.given_name || ' ' || cg.surname AS caregiver_name,
-        m.given_name || ' ' || m.surname AS member_name
-    FROM appointment a
-    JOIN "user" cg ON a.caregiver_user_id = cg.user_id
-    JOIN "user" m ON a.member_user_id = m.user_id
-    WHERE a.status = 'confirmed';
-    """
-    execute_and_display(query1, "5.1 Caregiver and Member Names for Confirmed Appointments")
-    
-    # 5.2 Jobs with 'soft-spoken' in requirements
-    query2 = """
-    SELECT job_id, other_requirements
-    FROM job
-    WHERE other_requirements LIKE '%soft-spoken%';
-    """
-    execute_and_display(query2, "5.2 Jobs with 'soft-spoken' in Requirements")
-    
-    # 5.3 Work hours for babysitters
-    query3 = """
-    SELECT a.appointment_id, a.work_hours, a.appointment_date
-    FROM appointment a
-    JOIN caregiver c ON a.caregiver_user_id = c.caregiver_user_id
-    WHERE c.caregiving_type = 'babysitter';
-    """
-    execute_and_display(query3, "5.3 Work Hours for Babysitter Appointments")
-    
-    # 5.4 Members in Astana looking for elderly care with no pets rule
-    query4 = """
-    SELECT DISTINCT u.user_id, u.given_name, u.surname, u.city, m.house_rules
-    FROM "user" u
-    JOIN member m ON u.user_id = m.member_user_id
-    JOIN job j ON m.member_user_id = j.member_user_id
-    WHERE j.required_caregiving_type = 'elderly care'
-      AND u.city = 'Astana'
-      AND m.house_rules LIKE '%No pets%';
-    """
-    execute_and_display(query4, "5.4 Members in Astana Looking for Elderly Care with 'No pets' Rule")
+    for key in ('5.1', '5.2', '5.3', '5.4'):
+        show_report(key, reader)
     
     # Complex queries
     print_separator("6. COMPLEX QUERIES")
-    
-    # 6.1 Count applicants per job
-    query5 = """
-    SELECT 
-        j.job_id,
-        u.given_name || ' ' || u.surname AS member_name,
-        COUNT(ja.caregiver_user_id) AS applicant_count
-    FROM job j
-    JOIN member m ON j.member_user_id = m.member_user_id
-    JOIN "user" u ON m.member_user_id = u.user_id
-    LEFT JOIN job_application ja ON j.job_id = ja.job_id
-    GROUP BY j.job_id, u.given_name, u.surname
-    ORDER BY j.job_id;
-    """
-    execute_and_display(query5, "6.1 Number of Applicants for Each Job")
-    
-    # 6.2 Total hours by caregivers
-    query6 = """
-    SELECT 
-        c.caregiver_user_id,
-        u.given_name || ' ' || u.surname AS caregiver_name,
-        SUM(a.work_hours) AS total_hours
-    FROM appointment a
-    JOIN caregiver c ON a.caregiver_user_id = c.caregiver_user_id
-    JOIN "user" u ON c.caregiver_user_id = u.user_id
-    WHERE a.status = 'confirmed'
-    GROUP BY c.caregiver_user_id, u.given_name, u.surname
-    ORDER BY total_hours DESC;
-    """
-    execute_and_display(query6, "6.2 Total Hours by Caregivers (Confirmed Appointments)")
-    
-    # 6.3 Average pay
-    query7 = """
-    SELECT 
-        AVG(c.hourly_rate * a.work_hours) AS average_pay
-    FROM appointment a
-    JOIN caregiver c ON a.caregiver_user_id = c.caregiver_user_id
-    WHERE a.status = 'confirmed';
-    """
-    execute_and_display(query7, "6.3 Average Pay for Caregivers")
-    
-    # 6.4 Caregivers earning above average
-    query8 = """
-    WITH avg_earnings AS (
-        SELECT AVG(c.hourly_rate * a.work_hours) AS avg_pay
-        FROM appointment a
-        JOIN caregiver c ON a.caregiver_user_id = c.caregiver_user_id
-        WHERE a.status = 'confirmed'
-    )
-    SELECT 
-        c.caregiver_user_id,
-        u.given_name || ' ' || u.surname AS caregiver_name,
-        SUM(c.hourly_rate * a.work_hours) AS total_earnings
-    FROM appointment a
-    JOIN caregiver c ON a.caregiver_user_id = c.caregiver_user_id
-    JOIN "user" u ON c.caregiver_user_id = u.user_id
-    CROSS JOIN avg_earnings ae
-    WHERE a.status = 'confirmed'
-    GROUP BY c.caregiver_user_id, u.given_name, u.surname, ae.avg_pay
-    HAVING SUM(c.hourly_rate * a.work_hours) > ae.avg_pay
-    ORDER BY total_earnings DESC;
-    """
-    execute_and_display(query8, "6.4 Caregivers Earning Above Average")
+    for key in ('6.1', '6.2', '6.3', '6.4'):
+        show_report(key, reader)
     
     # Derived attribute
     print_separator("7. QUERY WITH DERIVED ATTRIBUTE")
-    
-    # Calculate total cost
-    query9 = """
-    SELECT 
-        a.appointment_id,
-        u.given_name || ' ' || u.surname AS caregiver_name,
-        m.given_name || ' ' || m.surname AS member_name,
-        a.appointment_date,
-        a.work_hours,
-        c.hourly_rate,
-        (c.hourly_rate * a.work_hours) AS total_cost
-    FROM appointment a
-    JOIN caregiver c ON a.caregiver_user_id = c.caregiver_user_id
-    JOIN "user" u ON c.caregiver_user_id = u.user_id
-    JOIN "user" m ON a.member_user_id = m.user_id
-    WHERE a.status = 'confirmed'
-    ORDER BY a.appointment_id;
-    """
-    execute_and_display(query9, "7. Total Cost for Confirmed Appointments")
+    show_report('7', reader)
     
     # View operation
     print_separator("8. VIEW OPERATION")
     
-    # Create view
-    create_view = """
-    CREATE OR REPLACE VIEW job_applications_view AS
-    SELECT 
-        ja.job_id,
-        j.required_caregiving_type,
-        j.other_requirements,
-        ja.date_applied,
-        ja.caregiver_user_id,
-        u.given_name || ' ' || u.surname AS applicant_name,
-        c.caregiving_type,
-        c.hourly_rate,
-        u.city AS applicant_city
-    FROM job_application ja
-    JOIN job j ON ja.job_id = j.job_id
-    JOIN caregiver c ON ja.caregiver_user_id = c.caregiver_user_id
-    JOIN "user" u ON c.caregiver_user_id = u.user_id;
-    """
-    
     try:
-        session.execute(text(create_view))
+        session.execute(text(CREATE_VIEW))
         session.commit()
         print("View created successfully!\n")
     except Exception as e:
         print(f"Error creating view: {e}\n")
         session.rollback()
     
-    # Query the view
-    view_query = """
-    SELECT * FROM job_applications_view
-    ORDER BY job_id, date_applied;
-    """
-    execute_and_display(view_query, "8. View: Job Applications and Applicants")
+    # The view was just created on the primary
+    if reader is not session:
+        reader.close()
+        reader = report_session()
+    show_report('8', reader)
     
     print("\n" + "="*80)
     print("  All queries completed!")
     print("="*80 + "\n")
     
+    if reader is not session:
+        reader.close()
     session.close()
 
 
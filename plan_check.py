@@ -0,0 +1,437 @@
+"""
+Query-plan regression check for every SQL statement of the platform.
+
+Drives the Flask app in-process through every route (the benchmark
+scenarios plus searches, calendars, matches, the JSON API, exports and bulk
+imports, following page cursors), records each distinct statement the app
+sends together with the parameters it was sent with, adds the statements of
+part2_queries.py, and runs EXPLAIN on every one of them. Plans are flagged
+for:
+
+    seq_scan     a Seq Scan on a table estimated above --large-table rows
+    nested_loop  a Nested Loop whose outer side is estimated above --loop-rows
+                 rows (not under a LIMIT, which stops the loop early)
+    fk_index     a foreign key whose columns do not lead any index
+
+The results are compared with a committed baseline (plan_baseline.json):
+findings that are not in the baseline, and plans whose estimated cost grew
+by more than --threshold times, are regressions and make the exit status
+non-zero. Accepted plans are recorded with --update-baseline.
+
+The routes create and delete their own rows and --generate-users replaces
+all data, so run it against a scratch database:
+
+Usage:
+    DATABASE_URL=postgresql://.../plan_check flask --app app migrate
+    DATABASE_URL=postgresql://.../plan_check python plan_check.py --generate-users 20000
+    DATABASE_URL=postgresql://.../plan_check python plan_check.py --generate-users 20000 --update-baseline
+"""
+
+import argparse
+import ast
+import hashlib
+import html
+import io
+import json
+import os
+import re
+import sys
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from urllib.parse import urlsplit
+
+from sqlalchemy import event, text
+
+# The statements are recorded as the SQL the app registers, so they can be
+# explained with their parameters, rather than as EXECUTEs of prepared ones
+os.environ['DB_PREPARED_STATEMENTS'] = '0'
+
+import app as webapp
+import benchmark
+import generate_data
+import part2_queries
+import report_runner
+
+
+BASELINE_PATH = 'plan_baseline.json'
+
+# Data the committed baseline was recorded on
+DEFAULT_USERS = 20000
+DEFAULT_SEED = 341
+
+# Statements that can be explained; everything else (SET, LOCK, ...) is skipped
+EXPLAINABLE = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE', 'VALUES')
+
+# A plan only counts as regressed when its cost also grew by this many
+# planner units, so small statements do not flap
+MIN_COST_INCREASE = 100.0
+
+# Foreign keys without an index on their leading columns; ON DELETE CASCADE
+# and joins from the parent side have to scan the whole referencing table
+UNINDEXED_FOREIGN_KEYS = """
+    SELECT CAST(c.conrelid AS regclass) AS table_name, c.conname,
+           array_to_string(ARRAY(
+               SELECT a.attname
+               FROM unnest(c.conkey) WITH ORDINALITY AS k(attnum, n)
+               JOIN pg_attribute a ON a.attrelid = c.conrelid AND a.attnum = k.attnum
+               ORDER BY k.n
+           ), ', ') AS columns
+    FROM pg_constraint c
+    WHERE c.contype = 'f'
+      AND c.connamespace = CAST('public' AS regnamespace)
+      AND NOT EXISTS (
+          SELECT 1
+          FROM pg_index i
+          WHERE i.indrelid = c.conrelid
+            AND (CAST(i.indkey AS INT2[]))[0:cardinality(c.conkey) - 1] @> c.conkey
+            AND (CAST(i.indkey AS INT2[]))[0:cardinality(c.conkey) - 1] <@ c.conkey
+      )
+    ORDER BY 1, 2
+"""
+
+TABLE_ROWS = """
+    SELECT c.relname, c.reltuples
+    FROM pg_class c
+    WHERE c.relkind IN ('r', 'p', 'm') AND c.relnamespace = CAST('public' AS regnamespace)
+"""
+
+
+def normalize(sql):
+    return ' '.join(sql.split())
+
+
+def statement_key(sql):
+    return hashlib.sha1(normalize(sql).encode('utf-8')).hexdigest()[:12]
+
+
+def explainable(sql):
+    words = normalize(sql).split(' ', 1)
+    return words[0].upper() in EXPLAINABLE
+
+
+# ============================================================================
+# GATHERING STATEMENTS
+# ============================================================================
+
+class Recorder:
+    """Collects the distinct statements sent by the app, by the route that sent them"""
+
+    def __init__(self):
+        self.label = None
+        self.statements = {}  # key -> {'sql', 'parameters', 'routes'}
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        if self.label is None or not explainable(statement):
+            return
+        if executemany:
+            parameters = parameters[0] if parameters else None
+        entry = self.statements.setdefault(statement_key(statement), {
+            'sql': statement, 'parameters': parameters, 'routes': [],
+        })
+        if self.label not in entry['routes']:
+            entry['routes'].append(self.label)
+
+    @contextmanager
+    def recording(self, label):
+        """Record the statements sent inside the block under label"""
+        self.label = label
+        try:
+            yield
+        finally:
+            self.label = None
+
+    def listen(self, engines):
+        for engine in engines:
+            event.listen(engine, 'before_cursor_execute', self)
+
+
+def _next_links(response):
+    """Cursor links of a JSON or HTML page, next before prev"""
+    if response.is_json:
+        body = response.get_json(silent=True) or {}
+        return [body[name] for name in ('next', 'prev') if isinstance(body, dict) and body.get(name)]
+    links = re.findall(r'href="([^"]*[?&](?:after|before)=[^"]*)"', response.get_data(as_text=True))
+    return [html.unescape(link) for link in links]
+
+
+def _first_id(resource, row):
+    return '-'.join(str(row[name]) for name in resource.id_fields)
+
+
+def read_calls(engine):
+    """(label, path) for the reads the benchmark scenarios do not cover"""
+    def first(sql):
+        ids = benchmark.fetch_ids(engine, sql, {})
+        return ids[0] if ids else None
+
+    calls = []
+    for path in ('/users', '/caregivers', '/members', '/addresses', '/jobs', '/job_applications', '/appointments'):
+        calls.append((f'GET {path}?stream=1', f'{path}?stream=1'))
+    calls += [
+        ('GET /caregivers/search', '/caregivers/search?caregiving_type=babysitter&city=Astana&min_rate=10&max_rate=30'),
+        ('GET /caregivers/search', '/caregivers/search?city=Almaty&order=desc'),
+        ('GET /caregivers/availability', '/caregivers/availability?caregiving_type=babysitter&city=Astana'),
+    ]
+    caregiver = first('SELECT caregiver_user_id FROM caregiver ORDER BY caregiver_user_id LIMIT 1')
+    if caregiver:
+        calls.append(('GET /caregivers/<id>/availability', f'/caregivers/{caregiver}/availability'))
+    job = first('SELECT job_id FROM job ORDER BY job_id LIMIT 1')
+    if job:
+        calls.append(('GET /jobs/<id>/matches', f'/jobs/{job}/matches'))
+    for scope, q in (('jobs', 'pets'), ('members', 'no pets'), ('users', 'care')):
+        calls.append((f'GET /search?scope={scope}', f'/search?scope={scope}&q={q.replace(" ", "+")}'))
+    for name in webapp.API_RESOURCES:
+        calls.append((f'GET /api/v1/{name}', f'/api/v1/{name}'))
+    for name in webapp.API_RESOURCES:
+        calls.append((f'GET /export/{name}', f'/export/{name}?format=ndjson'))
+    for key in part2_queries.REPORTS:
+        calls.append((f'GET /export/report-{key}', f'/export/report-{key}?format=ndjson'))
+    return calls
+
+
+def gather_app_statements(recorder, engine):
+    """Run every route once and record what it sends"""
+    client = webapp.app.test_client()
+    run_id = f'plan{uuid.uuid4().hex[:8]}'
+
+    def get(label, path, follow=True):
+        with recorder.recording(label):
+            response = client.get(path)
+            response.get_data()
+        if response.status_code >= 400:
+            print(f"Warning: GET {path} answered {response.status_code}")
+        if follow:
+            # Following one page forward and back records the seek queries too
+            for link in _next_links(response)[:1]:
+                forward = get(f'{label} (next page)', link, follow=False)
+                prev = [link for link in _next_links(forward) if 'before=' in link]
+                if prev:
+                    get(f'{label} (previous page)', prev[0], follow=False)
+        return response
+
+    for label, calls, expected in benchmark.build_scenarios(engine, 1, run_id):
+        for method, path, form in calls:
+            if method == 'GET':
+                get(label, path)
+                continue
+            with recorder.recording(label):
+                response = client.post(path, data=form)
+            if response.status_code not in expected:
+                print(f"Warning: {method} {path} answered {response.status_code}")
+
+    for label, path in read_calls(engine):
+        response = get(label, path)
+        name = urlsplit(path).path.split('/')[-1]
+        resource = webapp.API_RESOURCES.get(name) if path.startswith('/api/v1/') else None
+        rows = (response.get_json(silent=True) or {}).get('data') if resource else None
+        if rows:
+            item = _first_id(resource, rows[0])
+            get(f'GET /api/v1/{name}/<id>', f'/api/v1/{name}/{item}')
+            get(f'GET /api/v1/{name}?ids=', f'/api/v1/{name}?ids={item}')
+
+    for kind in webapp.bulk_import.KINDS:
+        row = benchmark.user_form(f'{run_id}-import-{kind}', 0, gender='Female', caregiving_type='babysitter',
+                                  hourly_rate='15', house_rules='No pets.', dependent_description='Plan check')
+        with recorder.recording(f'POST /import/{kind}'):
+            client.post(f'/import/{kind}?format=ndjson', data=io.BytesIO(json.dumps(row).encode('utf-8')),
+                        content_type='application/x-ndjson')
+
+    with recorder.recording('flask rebuild-earnings'):
+        webapp.app.test_cli_runner().invoke(args=['rebuild-earnings'])
+
+    with engine.begin() as conn:
+        conn.execute(text('DELETE FROM "user" WHERE email LIKE :pattern'), {'pattern': f'{run_id}-import-%'})
+    webapp.table_changed(*webapp.IMPORT_TABLES['caregivers'], *webapp.IMPORT_TABLES['members'])
+
+
+def gather_part2_statements(statements):
+    """Add every SQL string literal of part2_queries.py, labelled with its report key or line"""
+    reports = {normalize(sql): key for key, (_, sql) in part2_queries.REPORTS.items()}
+    with open(part2_queries.__file__) as f:
+        tree = ast.parse(f.read())
+    for node in ast.walk(tree):
+        if not (isinstance(node, ast.Constant) and isinstance(node.value, str) and explainable(node.value)):
+            continue
+        sql = node.value.strip().rstrip(';')
+        key = reports.get(normalize(node.value))
+        label = f'part2_queries.py report {key}' if key else f'part2_queries.py:{node.lineno}'
+        entry = statements.setdefault(statement_key(sql), {'sql': sql, 'parameters': None, 'routes': []})
+        entry['routes'].append(label)
+
+
+# ============================================================================
+# CHECKING PLANS
+# ============================================================================
+
+def _walk(node, limited=False):
+    """Yield (node, under a Limit) for a plan node and all its children"""
+    yield node, limited
+    limited = limited or node['Node Type'] == 'Limit'
+    for child in node.get('Plans', []):
+        yield from _walk(child, limited)
+
+
+def plan_findings(plan, table_rows, large_table, loop_rows):
+    """Sorted, de-duplicated findings of one plan"""
+    findings = set()
+    for node, limited in _walk(plan):
+        if node['Node Type'] == 'Seq Scan':
+            table = node.get('Relation Name')
+            if table_rows.get(table, 0) > large_table:
+                findings.add(f'seq_scan {table}')
+        elif node['Node Type'] == 'Nested Loop' and not limited:
+            outer = node['Plans'][0]
+            if outer['Plan Rows'] > loop_rows:
+                tables = sorted({child.get('Relation Name') for child, _ in _walk(node) if child.get('Relation Name')})
+                findings.add(f"nested_loop {'/'.join(tables)}")
+    return sorted(findings)
+
+
+def explain(engine, entry):
+    """The JSON plan of one recorded statement, with its recorded parameters"""
+    conn = engine.raw_connection()
+    try:
+        cursor = conn.cursor()
+        sql = entry['sql']
+        if entry['parameters'] is None:
+            # The statement was not sent through the DBAPI, so its %s are literal
+            sql = sql.replace('%', '%%')
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, entry['parameters'] or {})
+        return cursor.fetchone()[0][0]['Plan']
+    finally:
+        conn.rollback()
+        conn.close()
+
+
+def check_statements(engine, statements, large_table, loop_rows):
+    with engine.connect() as conn:
+        table_rows = {row.relname: row.reltuples for row in conn.execute(text(TABLE_ROWS))}
+    results = {}
+    for key, entry in sorted(statements.items(), key=lambda item: item[1]['routes'][0]):
+        result = {'routes': entry['routes'], 'sql': normalize(entry['sql'])}
+        try:
+            plan = explain(engine, entry)
+            result['cost'] = plan['Total Cost']
+            result['findings'] = plan_findings(plan, table_rows, large_table, loop_rows)
+        except Exception as e:
+            result['error'] = str(e).strip().splitlines()[0]
+        results[key] = result
+    return results
+
+
+def check_foreign_keys(engine):
+    with engine.connect() as conn:
+        return [f'fk_index {row.table_name}({row.columns})' for row in conn.execute(text(UNINDEXED_FOREIGN_KEYS))]
+
+
+def compare(current, baseline, threshold):
+    """Regressions of the current results against the baseline, as printable lines"""
+    regressions = []
+    for finding in current['foreign_keys']:
+        if finding not in baseline.get('foreign_keys', []):
+            regressions.append(finding)
+    previous = baseline.get('statements', {})
+    for key, result in current['statements'].items():
+        before = previous.get(key, {})
+        where = f"{result['routes'][0]} [{key}]"
+        if 'error' in result:
+            regressions.append(f"{where}: EXPLAIN failed: {result['error']}")
+            continue
+        for finding in result['findings']:
+            if finding not in before.get('findings', []):
+                regressions.append(f"{where}: {finding}")
+        if ('cost' in before and result['cost'] > before['cost'] * threshold
+                and result['cost'] - before['cost'] >= MIN_COST_INCREASE):
+            regressions.append(f"{where}: cost {result['cost']}, was {before['cost']}")
+    return regressions
+
+
+def print_summary(current, baseline):
+    previous = baseline.get('statements', {})
+    print(f"{'statement':<14} {'cost':>12}  route / findings")
+    for key, result in current['statements'].items():
+        status = '' if key in previous else '  (new)'
+        cost = f"{result['cost']:.2f}" if 'cost' in result else 'ERROR'
+        print(f"{key:<14} {cost:>12}  {result['routes'][0]}{status}")
+        for finding in result.get('findings', []):
+            print(f"{'':<14} {'':>12}    {finding}")
+    for finding in current['foreign_keys']:
+        print(f"{'schema':<14} {'':>12}  {finding}")
+    gone = sorted(set(previous) - set(current['statements']))
+    for key in gone:
+        print(f"{key:<14} {'':>12}  {previous[key]['routes'][0]}  (no longer run)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--generate-users', type=int, default=0,
+                        help=f'Replace all data with a generated dataset of this many users first '
+                             f'(the baseline uses {DEFAULT_USERS})')
+    parser.add_argument('--data-seed', type=int, default=DEFAULT_SEED, help='Random seed for --generate-users')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='Baseline to compare with or update')
+    parser.add_argument('--update-baseline', action='store_true', help='Write the current plans as the baseline')
+    parser.add_argument('--large-table', type=int, default=10000,
+                        help='Tables estimated above this many rows must not be scanned sequentially')
+    parser.add_argument('--loop-rows', type=int, default=10000,
+                        help='Outer row estimate above which a nested loop is flagged')
+    parser.add_argument('--threshold', type=float, default=2.0,
+                        help='Cost growth factor over the baseline that counts as a regression')
+    parser.add_argument('--json', help='Write the results to this file as JSON')
+    args = parser.parse_args()
+
+    engine = webapp.engine
+    webapp.schema_readiness.ensure()
+    if args.generate_users:
+        print(f"Generating {args.generate_users} users with seed {args.data_seed}...")
+        generate_data.generate(engine, args.generate_users, args.data_seed, truncate=True)
+    report_runner.ensure_view(engine)
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        conn.execute(text('ANALYZE'))
+
+    recorder = Recorder()
+    recorder.listen([engine] + webapp.replica_engines)
+    gather_app_statements(recorder, engine)
+    statements = dict(recorder.statements)
+    gather_part2_statements(statements)
+
+    current = {
+        'recorded_at': datetime.now().isoformat(timespec='seconds'),
+        'users': args.generate_users or None,
+        'seed': args.data_seed if args.generate_users else None,
+        'statements': check_statements(engine, statements, args.large_table, args.loop_rows),
+        'foreign_keys': check_foreign_keys(engine),
+    }
+
+    try:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        baseline = {}
+    if baseline and (current['users'], current['seed']) != (baseline.get('users'), baseline.get('seed')):
+        print(f"Warning: the baseline was recorded on {baseline.get('users')} generated users "
+              f"(seed {baseline.get('seed')}), so costs may not be comparable")
+
+    print(f"Explained {len(current['statements'])} statements\n")
+    print_summary(current, baseline)
+    regressions = compare(current, baseline, args.threshold)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(current, f, indent=2)
+    if args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(current, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f"\nWrote {args.baseline}")
+        return
+
+    for regression in regressions:
+        print(f"Regression: {regression}")
+    if not regressions:
+        print("\nNo plan regressions")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Read replicas for the Online Caregivers Platform.
+
+Read-only work (list pages, searches, reports) can be sent to streaming
+replicas of the primary database. A replica is only used while its
+replication lag, checked at most every REPLICA_CHECK_INTERVAL seconds, stays
+under REPLICA_MAX_LAG; otherwise, or when it cannot be reached, callers fall
+back to the primary.
+
+    DATABASE_REPLICA_URLS=postgresql://...replica1,postgresql://...replica2
+"""
+
+import os
+import threading
+from time import monotonic, sleep
+
+from sqlalchemy import text
+
+
+# Seconds of replay lag after which a replica stops receiving reads
+REPLICA_MAX_LAG = float(os.getenv('REPLICA_MAX_LAG', '5'))
+
+# Seconds a lag measurement is reused before the replica is asked again
+REPLICA_CHECK_INTERVAL = float(os.getenv('REPLICA_CHECK_INTERVAL', '2'))
+
+# Seconds to wait for an unreachable replica, so the fallback is quick
+REPLICA_CONNECT_TIMEOUT = int(os.getenv('REPLICA_CONNECT_TIMEOUT', '2'))
+
+# Replay lag in seconds; 0 when everything received is replayed (an idle
+# primary writes nothing, so the last replay timestamp only grows older) or
+# when the server is not in recovery at all
+LAG_QUERY = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM clock_timestamp() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+
+def replica_urls():
+    """SQLAlchemy URLs from DATABASE_REPLICA_URLS"""
+    urls = []
+    for url in os.getenv('DATABASE_REPLICA_URLS', '').split(','):
+        url = url.strip()
+        if url.startswith('postgres://'):
+            url = url.replace('postgres://', 'postgresql://', 1)
+        if url:
+            urls.append(url)
+    return urls
+
+
+class Replica:
+    """One read engine and its last measured lag"""
+
+    def __init__(self, index, engine):
+        self.index = index
+        self.engine = engine
+        self.lag = None         # seconds, or None when the check failed
+        self.checked_at = None  # monotonic() of the last check
+        self.checking = False   # a thread is measuring the lag right now
+
+    @property
+    def healthy(self):
+        return self.lag is not None and self.lag <= REPLICA_MAX_LAG
+
+
+class ReplicaSet:
+    """Round-robin choice among the replicas whose lag is acceptable"""
+
+    def __init__(self, engines, check_interval=REPLICA_CHECK_INTERVAL):
+        self.replicas = [Replica(i, engine) for i, engine in enumerate(engines)]
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._next = 0
+
+    def __bool__(self):
+        return bool(self.replicas)
+
+    def check(self, replica):
+        """Measure the replica's lag now"""
+        # The query runs without the lock, so a slow or unreachable replica
+        # only holds up the thread checking it
+        lag = None
+        try:
+            with replica.engine.connect() as conn:
+                lag = float(conn.execute(text(LAG_QUERY)).scalar())
+        except Exception as e:
+            print(f"Error checking replica {replica.index}: {e}")
+        finally:
+            with self._lock:
+                was_healthy = replica.healthy
+                replica.lag = lag
+                replica.checked_at = monotonic()
+                replica.checking = False
+        if was_healthy and not replica.healthy:
+            print(f"Warning: replica {replica.index} lag is {replica.lag}, sending its reads to the primary")
+
+    def choose(self):
+        """A replica to read from, or None when the primary should be used"""
+        for _ in range(len(self.replicas)):
+            with self._lock:
+                replica = self.replicas[self._next]
+                self._next = (self._next + 1) % len(self.replicas)
+                # One thread checks a due replica; the others go on with its last lag
+                due = not replica.checking and (
+                    replica.checked_at is None or monotonic() - replica.checked_at >= self.check_interval
+                )
+                if due:
+                    replica.checking = True
+            if due:
+                self.check(replica)
+            if replica.healthy:
+                return replica
+        return None
+
+    def status(self):
+        return [
+            {'replica': replica.index, 'lag': replica.lag, 'healthy': replica.healthy}
+            for replica in self.replicas
+        ]
+
+
+def current_lsn(conn):
+    """The primary's current WAL position, for wait_for_lsn()"""
+    return conn.execute(text("SELECT CAST(pg_current_wal_lsn() AS TEXT)")).scalar()
+
+
+def wait_for_lsn(engine, lsn, timeout=REPLICA_MAX_LAG, interval=0.05):
+    """Wait until the replica behind engine has replayed the WAL up to lsn; return whether it did"""
+    deadline = monotonic() + timeout
+    with engine.connect() as conn:
+        while True:
+            caught_up = conn.execute(text("""
+                SELECT NOT pg_is_in_recovery() OR pg_last_wal_replay_lsn() >= CAST(:lsn AS pg_lsn)
+            """), {'lsn': lsn}).scalar()
+            if caught_up:
+                return True
+            if monotonic() >= deadline:
+                return False
+            sleep(interval)
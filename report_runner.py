@@ -0,0 +1,166 @@
+"""
+Concurrent runner for the read-only reports in part2_queries.py.
+
+Runs every report in REPORTS (or the ones picked with --only) at the same
+time over a connection pool, each in its own READ ONLY transaction, and
+records wall time, rows returned and the EXPLAIN (ANALYZE, BUFFERS) plan.
+The summary is printed as a table and can be written as JSON; given a
+previous summary with --baseline, reports that got slower by more than
+--threshold are flagged and the exit status is non-zero.
+
+Usage:
+    python report_runner.py --json reports.json
+    python report_runner.py --workers 8 --baseline last_night.json --json tonight.json
+    python report_runner.py --replica --only 6.
+"""
+
+import argparse
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from time import perf_counter
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
+
+import part2_queries
+
+
+# A report only counts as regressed when it is also this many ms slower, so
+# noise on millisecond-sized queries is not reported
+MIN_REGRESSION_MS = 5.0
+
+
+def _buffers(plan):
+    """Shared buffer hits and reads of the plan's top node (children included)"""
+    node = plan['Plan']
+    return {'shared_hit': node.get('Shared Hit Blocks', 0), 'shared_read': node.get('Shared Read Blocks', 0)}
+
+
+def ensure_view(engine):
+    """Create the view report 8 reads if part2_queries.py has not done so yet"""
+    with engine.begin() as conn:
+        if conn.execute(text("SELECT to_regclass('job_applications_view')")).scalar() is None:
+            print("Creating job_applications_view")
+            conn.execute(text(part2_queries.CREATE_VIEW))
+
+
+def run_report(engine, key, explain=True):
+    """Run one report and return its measurements"""
+    description, query = part2_queries.REPORTS[key]
+    query = query.strip().rstrip(';')
+    result = {'key': key, 'description': description}
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SET TRANSACTION READ ONLY"))
+            start = perf_counter()
+            rows = conn.execute(text(query)).fetchall()
+            result['wall_ms'] = round((perf_counter() - start) * 1000, 3)
+            result['rows'] = len(rows)
+            if explain:
+                # Runs the query a second time, so the plan sees a warm cache
+                plan = conn.execute(text(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {query}")).scalar()[0]
+                result['planning_ms'] = plan['Planning Time']
+                result['execution_ms'] = plan['Execution Time']
+                result['buffers'] = _buffers(plan)
+                result['plan'] = plan
+    except Exception as e:
+        result['error'] = str(e).strip().splitlines()[0]
+    return result
+
+
+def run_reports(engine, keys, workers, explain=True):
+    """Run the reports concurrently; results are in the order of keys"""
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(lambda key: run_report(engine, key, explain), keys))
+
+
+def find_regressions(results, baseline, threshold):
+    """Reports whose wall time grew by more than threshold times the baseline's"""
+    previous = {report['key']: report for report in baseline.get('reports', [])}
+    regressions = []
+    for result in results:
+        before = previous.get(result['key'])
+        if not before or 'wall_ms' not in before or 'wall_ms' not in result:
+            continue
+        if (result['wall_ms'] > before['wall_ms'] * threshold
+                and result['wall_ms'] - before['wall_ms'] >= MIN_REGRESSION_MS):
+            regressions.append({'key': result['key'], 'before_ms': before['wall_ms'], 'after_ms': result['wall_ms']})
+    return regressions
+
+
+def print_summary(results, regressions):
+    regressed = {regression['key'] for regression in regressions}
+    print(f"{'report':<8} {'rows':>7} {'wall ms':>10} {'exec ms':>10} {'hit':>8} {'read':>8}  description")
+    for result in results:
+        if 'error' in result:
+            print(f"{result['key']:<8} {'ERROR':>7}  {result['description']}: {result['error']}")
+            continue
+        buffers = result.get('buffers', {})
+        flag = '  REGRESSED' if result['key'] in regressed else ''
+        print(f"{result['key']:<8} {result['rows']:>7} {result['wall_ms']:>10.3f} "
+              f"{result.get('execution_ms', 0):>10.3f} {buffers.get('shared_hit', 0):>8} "
+              f"{buffers.get('shared_read', 0):>8}  {result['description']}{flag}")
+    for regression in regressions:
+        print(f"Regression: {regression['key']} took {regression['after_ms']} ms, was {regression['before_ms']} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default=part2_queries.DATABASE_URL,
+                        help='Database URL (default: the DB_* settings of part2_queries.py)')
+    parser.add_argument('--replica', action='store_true',
+                        help='Run on the DB_REPLICA_HOST replica configured for part2_queries.py')
+    parser.add_argument('--workers', type=int, default=4, help='Reports run at the same time')
+    parser.add_argument('--only', help='Only run reports whose key starts with this text')
+    parser.add_argument('--no-explain', action='store_true', help='Skip EXPLAIN (ANALYZE, BUFFERS)')
+    parser.add_argument('--json', help='Write the summary to this file as JSON')
+    parser.add_argument('--baseline', help='Previous --json summary to compare wall times against')
+    parser.add_argument('--threshold', type=float, default=1.5,
+                        help='Slowdown factor over the baseline that counts as a regression')
+    args = parser.parse_args()
+
+    if args.replica:
+        if part2_queries.replica_engine is None:
+            parser.error('--replica needs DB_REPLICA_HOST')
+        url = part2_queries.replica_engine.url
+    else:
+        url = make_url(args.url)
+    keys = [key for key in part2_queries.REPORTS if not args.only or key.startswith(args.only)]
+    engine = create_engine(url, echo=False, pool_size=args.workers, max_overflow=0)
+    if not args.replica:
+        ensure_view(engine)
+
+    started_at = datetime.now()
+    start = perf_counter()
+    results = run_reports(engine, keys, args.workers, explain=not args.no_explain)
+    wall_seconds = perf_counter() - start
+    engine.dispose()
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = find_regressions(results, json.load(f), args.threshold)
+
+    print(f"Ran {len(results)} reports on {url.render_as_string(hide_password=True)} "
+          f"with {args.workers} workers in {wall_seconds:.3f}s\n")
+    print_summary(results, regressions)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                'started_at': started_at.isoformat(timespec='seconds'),
+                'database': url.render_as_string(hide_password=True),
+                'workers': args.workers,
+                'wall_seconds': round(wall_seconds, 3),
+                'reports': results,
+                'regressions': regressions,
+            }, f, indent=2, default=str)
+
+    failed = any('error' in result for result in results)
+    sys.exit(1 if failed or regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
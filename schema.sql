@@ -1,7 +1,13 @@
 -- Database Schema for Online Caregivers Platform
 -- Part 1: Physical Database Construction
+-- The deployed schema is managed by the files in migrations/ (`flask --app app migrate`);
+-- keep this script in step with them.
 
 -- Drop tables if they exist (for clean setup)
+DROP TABLE IF EXISTS schema_version CASCADE;
+DROP TABLE IF EXISTS table_change CASCADE;
+DROP TABLE IF EXISTS table_version CASCADE;
+DROP TABLE IF EXISTS caregiver_earnings CASCADE;
 DROP TABLE IF EXISTS appointment CASCADE;
 DROP TABLE IF EXISTS job_application CASCADE;
 DROP TABLE IF EXISTS job CASCADE;
@@ -83,9 +89,344 @@ CREATE TABLE appointment (
 );
 
 -- Create indexes for better query performance
-CREATE INDEX idx_caregiver_type ON caregiver(caregiving_type);
 CREATE INDEX idx_job_type ON job(required_caregiving_type);
 CREATE INDEX idx_appointment_status ON appointment(status);
 CREATE INDEX idx_appointment_date ON appointment(appointment_date);
 CREATE INDEX idx_user_city ON "user"(city);
 
+-- Indexes matching the keyset pagination order of the list pages
+CREATE INDEX idx_appointment_listing ON appointment(appointment_date DESC, appointment_time, appointment_id);
+CREATE INDEX idx_job_application_listing ON job_application(job_id, date_applied, caregiver_user_id);
+
+-- Per-caregiver running totals over confirmed appointments, kept up to date
+-- by triggers so the earnings reports read one row per caregiver instead of
+-- aggregating the whole appointment table.
+CREATE TABLE IF NOT EXISTS caregiver_earnings (
+    caregiver_user_id INTEGER PRIMARY KEY,
+    confirmed_appointments INTEGER NOT NULL DEFAULT 0,
+    confirmed_hours NUMERIC NOT NULL DEFAULT 0,
+    earnings NUMERIC NOT NULL DEFAULT 0,
+    FOREIGN KEY (caregiver_user_id) REFERENCES caregiver(caregiver_user_id) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS idx_caregiver_earnings_earnings ON caregiver_earnings(earnings DESC);
+
+-- Appointment inserts, updates and deletes move the totals by the
+-- difference between the old and the new confirmed row
+CREATE OR REPLACE FUNCTION caregiver_earnings_on_appointment() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.status = 'confirmed' THEN
+        -- Plain UPDATE: when the caregiver itself is being deleted its row is already gone
+        UPDATE caregiver_earnings ce
+        SET confirmed_appointments = ce.confirmed_appointments - 1,
+            confirmed_hours = ce.confirmed_hours - OLD.work_hours,
+            earnings = ce.earnings - OLD.work_hours * c.hourly_rate
+        FROM caregiver c
+        WHERE c.caregiver_user_id = OLD.caregiver_user_id
+          AND ce.caregiver_user_id = OLD.caregiver_user_id;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.status = 'confirmed' THEN
+        INSERT INTO caregiver_earnings AS ce (caregiver_user_id, confirmed_appointments, confirmed_hours, earnings)
+        SELECT c.caregiver_user_id, 1, NEW.work_hours, NEW.work_hours * c.hourly_rate
+        FROM caregiver c
+        WHERE c.caregiver_user_id = NEW.caregiver_user_id
+        ON CONFLICT (caregiver_user_id) DO UPDATE
+        SET confirmed_appointments = ce.confirmed_appointments + 1,
+            confirmed_hours = ce.confirmed_hours + EXCLUDED.confirmed_hours,
+            earnings = ce.earnings + EXCLUDED.earnings;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS appointment_caregiver_earnings ON appointment;
+CREATE TRIGGER appointment_caregiver_earnings
+AFTER INSERT OR DELETE OR UPDATE OF caregiver_user_id, work_hours, status ON appointment
+FOR EACH ROW EXECUTE FUNCTION caregiver_earnings_on_appointment();
+
+-- Earnings are priced at the caregiver's current rate, so a rate change
+-- reprices the caregiver's total from the hours already stored
+CREATE OR REPLACE FUNCTION caregiver_earnings_on_rate_change() RETURNS trigger AS $$
+BEGIN
+    UPDATE caregiver_earnings
+    SET earnings = confirmed_hours * NEW.hourly_rate
+    WHERE caregiver_user_id = NEW.caregiver_user_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS caregiver_rate_earnings ON caregiver;
+CREATE TRIGGER caregiver_rate_earnings
+AFTER UPDATE OF hourly_rate ON caregiver
+FOR EACH ROW WHEN (OLD.hourly_rate IS DISTINCT FROM NEW.hourly_rate)
+EXECUTE FUNCTION caregiver_earnings_on_rate_change();
+
+-- Full-text search over the free-text columns. The tsvector columns are
+-- generated, so every write keeps them current without application code.
+
+-- Job requirements and profile descriptions are prose: stem with 'english'
+ALTER TABLE job ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (to_tsvector('english', COALESCE(other_requirements, ''))) STORED;
+ALTER TABLE "user" ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (to_tsvector('english', COALESCE(profile_description, ''))) STORED;
+
+-- House rules are short phrases where "no" matters ("No pets" vs "Pets
+-- allowed"), and 'english' drops it as a stop word, so use 'simple'
+ALTER TABLE member ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (to_tsvector('simple', COALESCE(house_rules, ''))) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_job_search ON job USING GIN (search_vector);
+CREATE INDEX IF NOT EXISTS idx_user_search ON "user" USING GIN (search_vector);
+CREATE INDEX IF NOT EXISTS idx_member_search ON member USING GIN (search_vector);
+
+-- Caregiver search filters on type, city, gender and a rate range and sorts
+-- by rate. City lives on "user", so it is copied onto caregiver (kept in
+-- sync by triggers) to let a single composite index serve the whole lookup.
+ALTER TABLE caregiver ADD COLUMN IF NOT EXISTS city VARCHAR(100);
+
+UPDATE caregiver c
+SET city = u.city
+FROM "user" u
+WHERE u.user_id = c.caregiver_user_id
+  AND c.city IS DISTINCT FROM u.city;
+
+ALTER TABLE caregiver ALTER COLUMN city SET NOT NULL;
+
+-- Inserts may pass the city themselves; otherwise copy it from "user"
+CREATE OR REPLACE FUNCTION caregiver_copy_city() RETURNS trigger AS $$
+BEGIN
+    IF NEW.city IS NULL OR TG_OP = 'UPDATE' THEN
+        SELECT city INTO NEW.city FROM "user" WHERE user_id = NEW.caregiver_user_id;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS caregiver_city ON caregiver;
+CREATE TRIGGER caregiver_city
+BEFORE INSERT OR UPDATE OF caregiver_user_id ON caregiver
+FOR EACH ROW EXECUTE FUNCTION caregiver_copy_city();
+
+CREATE OR REPLACE FUNCTION user_city_to_caregiver() RETURNS trigger AS $$
+BEGIN
+    UPDATE caregiver SET city = NEW.city WHERE caregiver_user_id = NEW.user_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS user_city_caregiver ON "user";
+CREATE TRIGGER user_city_caregiver
+AFTER UPDATE OF city ON "user"
+FOR EACH ROW WHEN (OLD.city IS DISTINCT FROM NEW.city)
+EXECUTE FUNCTION user_city_to_caregiver();
+
+-- Equality columns first, then the sort column; gender is optional and is
+-- filtered from the index entries without visiting the table
+CREATE INDEX IF NOT EXISTS idx_caregiver_search
+    ON caregiver(caregiving_type, city, hourly_rate, caregiver_user_id) INCLUDE (gender);
+-- Searches without a type or city still walk caregivers in rate order
+CREATE INDEX IF NOT EXISTS idx_caregiver_rate ON caregiver(hourly_rate, caregiver_user_id);
+
+-- Job matching looks for caregivers of the job's type in the member's city.
+-- The member's city is copied onto job (kept in sync by triggers), so a
+-- job's candidate set is one (caregiving_type, city) range of
+-- idx_caregiver_search, already ordered by rate.
+ALTER TABLE job ADD COLUMN IF NOT EXISTS city VARCHAR(100);
+
+UPDATE job j
+SET city = u.city
+FROM "user" u
+WHERE u.user_id = j.member_user_id
+  AND j.city IS DISTINCT FROM u.city;
+
+ALTER TABLE job ALTER COLUMN city SET NOT NULL;
+
+CREATE OR REPLACE FUNCTION job_copy_city() RETURNS trigger AS $$
+BEGIN
+    IF NEW.city IS NULL OR TG_OP = 'UPDATE' THEN
+        SELECT city INTO NEW.city FROM "user" WHERE user_id = NEW.member_user_id;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS job_city ON job;
+CREATE TRIGGER job_city
+BEFORE INSERT OR UPDATE OF member_user_id ON job
+FOR EACH ROW EXECUTE FUNCTION job_copy_city();
+
+CREATE OR REPLACE FUNCTION user_city_to_job() RETURNS trigger AS $$
+BEGIN
+    UPDATE job SET city = NEW.city WHERE member_user_id = NEW.user_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS user_city_job ON "user";
+CREATE TRIGGER user_city_job
+AFTER UPDATE OF city ON "user"
+FOR EACH ROW WHEN (OLD.city IS DISTINCT FROM NEW.city)
+EXECUTE FUNCTION user_city_to_job();
+
+-- The sync trigger above finds a member's jobs by member_user_id
+CREATE INDEX IF NOT EXISTS idx_job_member ON job(member_user_id);
+
+-- A caregiver cannot have two live (pending or confirmed) appointments whose
+-- time spans overlap. The span is stored as a generated tsrange and the rule
+-- is an exclusion constraint, so each insert or update is checked with one
+-- GiST index probe. caregiver_user_id is wrapped in a single-value int4range
+-- because plain integers have no GiST operator class without btree_gist.
+ALTER TABLE appointment ADD COLUMN IF NOT EXISTS booked_during tsrange
+    GENERATED ALWAYS AS (
+        tsrange(appointment_date + appointment_time,
+                appointment_date + appointment_time + work_hours * INTERVAL '1 hour')
+    ) STORED;
+
+-- Refuse to migrate over existing double bookings rather than hide them
+DO $$
+DECLARE
+    conflicts INTEGER;
+    example TEXT;
+BEGIN
+    SELECT COUNT(*), MIN(a.appointment_id || ' and ' || b.appointment_id)
+    INTO conflicts, example
+    FROM appointment a
+    JOIN appointment b
+      ON a.caregiver_user_id = b.caregiver_user_id
+     AND a.appointment_id < b.appointment_id
+     AND a.booked_during && b.booked_during
+    WHERE a.status <> 'declined' AND b.status <> 'declined';
+    IF conflicts > 0 THEN
+        RAISE EXCEPTION '% overlapping appointment pair(s), e.g. appointments %; resolve them before migrating',
+            conflicts, example;
+    END IF;
+END;
+$$;
+
+ALTER TABLE appointment DROP CONSTRAINT IF EXISTS appointment_no_overlap;
+ALTER TABLE appointment ADD CONSTRAINT appointment_no_overlap EXCLUDE USING gist (
+    int4range(caregiver_user_id, caregiver_user_id, '[]') WITH &&,
+    booked_during WITH &&
+) WHERE (status <> 'declined');
+
+-- Availability calendars read one caregiver's (or a group's) appointments
+-- over a date window; this also covers the caregiver foreign key
+CREATE INDEX IF NOT EXISTS idx_appointment_caregiver_date ON appointment(caregiver_user_id, appointment_date);
+
+-- Per-table change counters for conditional GET (ETag / Last-Modified).
+-- Statement-level triggers bump a table's row on every write, including the
+-- deletes PostgreSQL runs for ON DELETE CASCADE, so every worker sees the
+-- same versions and pages can be revalidated without reading the tables.
+CREATE TABLE IF NOT EXISTS table_version (
+    table_name VARCHAR(63) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0,
+    modified_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+INSERT INTO table_version (table_name)
+VALUES ('user'), ('caregiver'), ('member'), ('address'), ('job'), ('job_application'), ('appointment')
+ON CONFLICT (table_name) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION bump_table_version() RETURNS trigger AS $$
+BEGIN
+    UPDATE table_version
+    SET version = version + 1, modified_at = clock_timestamp()
+    WHERE table_name = TG_TABLE_NAME;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS user_version ON "user";
+CREATE TRIGGER user_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON "user"
+FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version();
+
+DROP TRIGGER IF EXISTS caregiver_version ON caregiver;
+CREATE TRIGGER caregiver_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON caregiver
+FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version();
+
+DROP TRIGGER IF EXISTS member_version ON member;
+CREATE TRIGGER member_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON member
+FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version();
+
+DROP TRIGGER IF EXISTS address_version ON address;
+CREATE TRIGGER address_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON address
+FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version();
+
+DROP TRIGGER IF EXISTS job_version ON job;
+CREATE TRIGGER job_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON job
+FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version();
+
+DROP TRIGGER IF EXISTS job_application_version ON job_application;
+CREATE TRIGGER job_application_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON job_application
+FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version();
+
+DROP TRIGGER IF EXISTS appointment_version ON appointment;
+CREATE TRIGGER appointment_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON appointment
+FOR EACH STATEMENT EXECUTE FUNCTION bump_table_version();
+
+-- Deleting a member cascades to its appointments, and member-side lookups
+-- join appointment on member_user_id; without an index both scan the table
+CREATE INDEX IF NOT EXISTS idx_appointment_member ON appointment(member_user_id);
+
+-- Writes append to table_change instead of bumping the shared table_version
+-- row, which every writer of a table had to lock until commit: one slow
+-- transaction held up all others and multi-table writes could deadlock.
+-- Inserts into the log never wait on each other. A table's version is its
+-- table_version row plus the number of its committed log rows, so it grows
+-- by one with every committed write whatever order transactions commit in
+-- (a sequence value could be read before its data commits). Every 1000 log
+-- rows a writer folds the log into table_version, keeping the sum unchanged;
+-- the try-lock means it never waits, and only compaction ever touches
+-- table_version.
+CREATE TABLE IF NOT EXISTS table_change (
+    id BIGINT GENERATED ALWAYS AS IDENTITY PRIMARY KEY,
+    table_name VARCHAR(63) NOT NULL,
+    changed_at TIMESTAMPTZ NOT NULL DEFAULT clock_timestamp()
+);
+
+CREATE INDEX IF NOT EXISTS idx_table_change_table ON table_change(table_name, changed_at);
+
+CREATE OR REPLACE FUNCTION compact_table_changes() RETURNS void AS $$
+BEGIN
+    IF pg_try_advisory_xact_lock(hashtext('compact_table_changes')) THEN
+        WITH moved AS (
+            DELETE FROM table_change RETURNING table_name, changed_at
+        ), totals AS (
+            SELECT table_name, COUNT(*) AS changes, MAX(changed_at) AS changed_at
+            FROM moved
+            GROUP BY table_name
+        )
+        UPDATE table_version t
+        SET version = t.version + totals.changes, modified_at = GREATEST(t.modified_at, totals.changed_at)
+        FROM totals
+        WHERE t.table_name = totals.table_name;
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION bump_table_version() RETURNS trigger AS $$
+DECLARE
+    change_id BIGINT;
+BEGIN
+    INSERT INTO table_change (table_name) VALUES (TG_TABLE_NAME) RETURNING id INTO change_id;
+    IF change_id % 1000 = 0 THEN
+        PERFORM compact_table_changes();
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Applied migrations, checked once per worker by the web application
+CREATE TABLE schema_version (
+    version INTEGER PRIMARY KEY,
+    applied_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    name VARCHAR(200)
+);
+INSERT INTO schema_version (version, name) VALUES (1, 'initial_schema'), (2, 'listing_indexes'), (3, 'caregiver_earnings'),
+    (4, 'full_text_search'), (5, 'caregiver_search'),
+    (6, 'job_matching'), (7, 'appointment_overlap'),
+    (8, 'appointment_caregiver_index'),
+    (9, 'table_versions'),
+    (10, 'appointment_member_index'),
+    (11, 'table_change_log');
+
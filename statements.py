@@ -0,0 +1,178 @@
+"""
+Registry of the named SQL statements run by the web application.
+
+Each statement is parsed into its text() construct once per process. On a
+pooled connection it is sent as PREPARE the first time it is used there, and
+after that as EXECUTE, so PostgreSQL parses and plans it once per connection
+rather than once per request. Calls, time, rows and errors are counted for
+each statement and served by /metrics.
+
+Behind a transaction-pooling proxy such as PgBouncer, a server connection is
+not tied to one client, so prepared statements cannot be kept. Set
+DB_PREPARED_STATEMENTS=0 there and the statements run as plain text() again.
+"""
+
+import hashlib
+import logging
+import os
+import re
+import threading
+from time import perf_counter
+
+from sqlalchemy import exc, text
+from sqlalchemy.orm import Session
+
+
+PREPARED_STATEMENTS = os.getenv('DB_PREPARED_STATEMENTS', '1').lower() not in ('0', 'false', 'no')
+
+# Statements built from request options (page cursors, filters, field lists)
+# kept per process; past this many, new ones run unprepared and uncounted
+MAX_ADHOC_STATEMENTS = int(os.getenv('DB_MAX_ADHOC_STATEMENTS', '200'))
+
+# Statements PostgreSQL can PREPARE
+PREPARABLE = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE', 'VALUES')
+
+# Bind parameters, matched the way text() matches them
+BIND_PARAM = re.compile(r'(?<![:\w\\]):(\w+)(?!:)')
+
+# SQLSTATEs meaning the connection's prepared statements are stale: the
+# statement is gone (the session was reset) or a table changed under its plan
+STALE_PREPARED = ('26000', '0A000')
+
+
+class Statement:
+    """One named SQL statement and its execution statistics"""
+
+    def __init__(self, name, sql, prepare=True, logger=None):
+        self.name = name
+        self.sql = sql
+        self.logger = logger or logging.getLogger(__name__)
+        self.clause = text(sql)
+        self.prepare = prepare and PREPARED_STATEMENTS and sql.split(None, 1)[0].upper() in PREPARABLE
+
+        # PREPARE takes $1, $2, ... in order of each parameter's first appearance
+        params = []
+        for param in BIND_PARAM.findall(sql):
+            if param not in params:
+                params.append(param)
+        positions = {param: i for i, param in enumerate(params, 1)}
+        self.prepare_clause = text(f"PREPARE {name} AS " + BIND_PARAM.sub(lambda m: f"${positions[m.group(1)]}", sql))
+        self.execute_clause = text(
+            f"EXECUTE {name}({', '.join(':' + param for param in params)})" if params else f"EXECUTE {name}"
+        )
+
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+        self.prepares = 0
+        self.prepare_failures = 0
+        self.rows = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+
+    def execute(self, target, params=None):
+        """Run the statement on a Session or Connection and return its result"""
+        conn = target.connection() if isinstance(target, Session) else target
+        start = perf_counter()
+        try:
+            if self.prepare:
+                result = self._execute_prepared(conn, params)
+            else:
+                result = conn.execute(self.clause, params or {})
+        except exc.DBAPIError as e:
+            self._record(perf_counter() - start, error=True)
+            if getattr(e.orig, 'pgcode', None) in STALE_PREPARED:
+                # A fresh connection starts without prepared statements
+                conn.invalidate()
+            raise
+        self._record(perf_counter() - start, rows=max(result.rowcount, 0))
+        return result
+
+    def _execute_prepared(self, conn, params):
+        # Prepared statements belong to the server session, so the names are
+        # remembered on the DBAPI connection and live as long as it does
+        prepared = conn.connection.info.setdefault('prepared_statements', set())
+        if self.name not in prepared:
+            try:
+                # In a savepoint, so a failed PREPARE leaves the transaction usable
+                with conn.begin_nested():
+                    conn.execute(self.prepare_clause)
+            except exc.DBAPIError as e:
+                # Logged and counted, since from here on the statement runs
+                # unprepared and nothing else shows it
+                self.logger.warning("Statement %s cannot be prepared, running it unprepared: %s",
+                                    self.name, str(e.orig).strip().splitlines()[0])
+                with self._lock:
+                    self.prepare = False
+                    self.prepare_failures += 1
+                return conn.execute(self.clause, params or {})
+            prepared.add(self.name)
+            with self._lock:
+                self.prepares += 1
+        return conn.execute(self.execute_clause, params or {})
+
+    def _record(self, seconds, rows=0, error=False):
+        with self._lock:
+            self.calls += 1
+            self.seconds += seconds
+            self.max_seconds = max(self.max_seconds, seconds)
+            self.rows += rows
+            if error:
+                self.errors += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'statement': self.name,
+                'prepared': self.prepare,
+                'calls': self.calls,
+                'errors': self.errors,
+                'prepares': self.prepares,
+                'prepare_failures': self.prepare_failures,
+                'rows': self.rows,
+                'total_ms': round(self.seconds * 1000, 3),
+                'mean_ms': round(self.seconds * 1000 / self.calls, 3) if self.calls else 0.0,
+                'max_ms': round(self.max_seconds * 1000, 3),
+            }
+
+
+class StatementRegistry:
+    """The process's statements: registered by name, or ad hoc for SQL built per request"""
+
+    def __init__(self, max_adhoc=MAX_ADHOC_STATEMENTS, logger=None):
+        self.max_adhoc = max_adhoc
+        self.logger = logger
+        self._lock = threading.Lock()
+        self._named = {}
+        self._adhoc = {}
+
+    def register(self, name, sql):
+        """Add a statement under a unique name and return it"""
+        with self._lock:
+            if name in self._named:
+                raise ValueError(f'Statement {name} is already registered')
+            statement = self._named[name] = Statement(name, sql, logger=self.logger)
+        return statement
+
+    def __getitem__(self, name):
+        return self._named[name]
+
+    def adhoc(self, prefix, sql):
+        """The statement for SQL assembled at request time, named prefix_<hash of sql>"""
+        statement = self._adhoc.get(sql)
+        if statement is not None:
+            return statement
+        name = f"{prefix}_{hashlib.sha1(sql.encode('utf-8')).hexdigest()[:12]}"
+        with self._lock:
+            statement = self._adhoc.get(sql)
+            if statement is None:
+                if len(self._adhoc) >= self.max_adhoc:
+                    return Statement(name, sql, prepare=False, logger=self.logger)
+                statement = self._adhoc[sql] = Statement(name, sql, logger=self.logger)
+        return statement
+
+    def stats(self):
+        """Statistics of every statement that has run, by name"""
+        with self._lock:
+            statements = list(self._named.values()) + list(self._adhoc.values())
+        return sorted((s.stats() for s in statements if s.calls), key=lambda stats: stats['statement'])